@@ -1,16 +1,136 @@
 #!/usr/bin/env python3
 
+import contextlib
 import logging
 import os
-import re
+import posixpath
+import shlex
 import shutil
+import socket
 import subprocess
-import time
-from typing import List, Optional, Union
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+)
+
+from .batch import (
+    BATCH_MAX_LENGTH,
+    ShellResult,
+    batch_scripts,
+    new_marker,
+    parse_batch_output,
+)
+from .channels import ProcessChannel, SocketChannel, read_output
+from .client import AdbServerClient
+from .commands import (
+    RUNTIME_PERMISSIONS_SDK_VERSION,
+    check_apk_path,
+    check_connect_output,
+    check_install_output,
+    check_pull_output,
+    check_push_output,
+    check_remount_output,
+    check_uninstall_output,
+    connect_command,
+    install_command,
+    install_flags,
+    install_write_command,
+    parse_devices,
+    parse_install_session,
+    parse_version,
+    pull_command,
+    push_command,
+    streamed_install_command,
+    validate_command,
+    validate_timeout,
+)
+from .features import (
+    AUTO_COMPRESSION,
+    NO_COMPRESSION,
+    FeatureCache,
+    choose_compression,
+)
+from .fleet import BulkConnector, ConnectReport, KeepAlive
+from .install import (
+    ApkInfo,
+    InstallCache,
+    InstallResult,
+    installed_apks_command,
+    parse_apk_manifest,
+    parse_installed_apks,
+)
+from .logcat import LogBuffer, LogcatCollector, LogFilter, LogWriter
+from .manifest import (
+    MANIFEST_MISSING,
+    MANIFEST_MISSING_EXIT_CODE,
+    DirectorySyncResult,
+    changed_files,
+    local_manifest,
+    parse_remote_manifest,
+    remote_manifest_command,
+)
+from .metrics import (
+    DISABLED_MEASUREMENT,
+    CommandMeasurement,
+    MetricsRegistry,
+)
+from .packages import PackageIndex
+from .properties import PropertyCache
+from .protocol import DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT, AdbProtocolError
+from .query_cache import QueryCache
+from .settle import PollUntil, SettlePolicy, WaitForExit, device_offline, device_online
+from .shell_session import ShellSession
+from .stream import CommandStream
+from .sync import SYNC_DATA_MAX, ProgressCallback, SyncClient, transfer_summary
+from .tracker import DeviceTracker
+from .transfer import (
+    ParallelTransfer,
+    TransferReport,
+    local_transfers,
+    remote_transfers,
+)
+from .tree import (
+    ChannelReader,
+    ChannelWriter,
+    create_tree,
+    extract_tree,
+    pull_tree_command,
+    push_tree_command,
+)
+from .walk import (
+    WALK_MISSING_EXIT_CODE,
+    RemoteEntry,
+    RemoteIndex,
+    parse_walk_output,
+    walk_command,
+)
+
+T = TypeVar("T")
 
 
 class ADB:
-    def __init__(self, device: Optional[str] = None, debug: bool = False):
+    def __init__(
+        self,
+        device: Optional[str] = None,
+        debug: bool = False,
+        backend: str = "subprocess",
+        server_host: Optional[str] = None,
+        server_port: Optional[int] = None,
+        settle_policy: Optional[SettlePolicy] = None,
+        property_ttl: float = 5.0,
+        install_cache: Optional[str] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        query_cache: Optional[QueryCache] = None,
+    ):
         """
         Android Debug Bridge (adb) object constructor.
 
@@ -19,6 +139,37 @@ class ADB:
                        Android device connected to adb.
         :param debug: When set to True, more debug messages will be shown for each
                       executed operation.
+        :param backend: How adb commands are executed: "subprocess" (default) runs
+                        the adb executable for every command, "native" talks
+                        directly with the adb server through its socket protocol
+                        (commands not supported natively, e.g., app installation,
+                        still use the adb executable).
+        :param server_host: The host of the adb server used by the native backend
+                            (default 127.0.0.1).
+        :param server_port: The port of the adb server used by the native backend
+                            (default ANDROID_ADB_SERVER_PORT environment variable
+                            or 5037).
+        :param settle_policy: What to wait for after each adb command returned,
+                              before continuing the execution (see adb/settle.py).
+                              By default, only the termination of the adb process
+                              is awaited.
+        :param property_ttl: How many seconds the values of the mutable device
+                             properties are cached (the read-only ro.* properties
+                             are cached until the device is rebooted or remounted).
+                             With 0, the mutable properties are never cached.
+        :param install_cache: The json file where the information about the apk
+                              files installed on the devices is saved, to skip the
+                              installation of identical apk files in the next
+                              executions (see install_app). If None, the information
+                              is kept only in memory.
+        :param metrics: The registry where the latency, the bytes and the errors of
+                        every executed command are recorded (see adb/metrics.py).
+                        If None (default), nothing is measured.
+        :param query_cache: The cache of the results of the query methods (e.g.,
+                            get_version, get_setting), invalidated when a method
+                            changing the state of a device runs (see
+                            adb/query_cache.py). If None (default), the results are
+                            never cached.
         """
 
         self.logger = logging.getLogger(
@@ -27,6 +178,24 @@ class ADB:
 
         self._device = device
 
+        self.settle_policy: SettlePolicy = settle_policy or WaitForExit()
+
+        self.properties = PropertyCache(self, property_ttl)
+
+        self.features = FeatureCache(self)
+
+        self.install_cache = InstallCache(install_cache)
+
+        self.packages = PackageIndex(self)
+
+        self.metrics = metrics
+
+        self.query_cache = query_cache
+
+        # When running, the devices are waited for and listed from its registry.
+        self.tracker: Optional[DeviceTracker] = None
+        self._tracker_lock = threading.Lock()
+
         if debug:
             self.logger.setLevel(logging.DEBUG)
 
@@ -38,7 +207,27 @@ class ADB:
         # compatibility).
         self.adb_path = shutil.which(self.adb_path)  # type: ignore
 
-        if not self.is_available():
+        if backend not in ("subprocess", "native"):
+            raise ValueError(
+                "Invalid backend '{0}', use 'subprocess' or 'native'".format(backend)
+            )
+        self.backend = backend
+
+        self._server_address = (
+            server_host or DEFAULT_SERVER_HOST,
+            server_port
+            or int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_SERVER_PORT)),
+        )
+        self._server_client: Optional[AdbServerClient] = None
+        # Avoid starting the adb server more than once when many threads find it
+        # not running at the same time.
+        self._start_server_lock = threading.Lock()
+        if backend == "native":
+            self._server_client = AdbServerClient(*self._server_address)
+
+        # The native backend doesn't need the adb executable if the adb server is
+        # already running.
+        if backend == "subprocess" and not self.is_available():
             raise FileNotFoundError(
                 "Adb executable is not available! Make sure to have adb (Android "
                 "Debug Bridge) installed and added to the PATH variable, or specify "
@@ -53,6 +242,29 @@ class ADB:
     def target_device(self, new_device: str):
         self._device = new_device
 
+    def _adb_command(self, command: List[str], device: Optional[str]) -> List[str]:
+        # Build the full command for the adb executable, without modifying the
+        # original command (that could be shared with other threads).
+        full_command = [self.adb_path]
+        if device:
+            full_command.extend(["-s", device])
+        return full_command + command
+
+    def _cached(
+        self,
+        method: str,
+        device: Optional[str],
+        arguments: List[str],
+        load: Callable[[], T],
+    ) -> T:
+        if self.query_cache is None:
+            return load()
+        return self.query_cache.get(method, device, arguments, load)
+
+    def _invalidate_queries(self, device: Optional[str] = None) -> None:
+        if self.query_cache is not None:
+            self.query_cache.invalidate(device)
+
     def is_available(self) -> bool:
         """
         Check if adb executable is available.
@@ -63,10 +275,17 @@ class ADB:
         return self.adb_path is not None
 
     def execute(
-        self, command: List[str], is_async: bool = False, timeout: Optional[int] = None
+        self,
+        command: List[str],
+        is_async: bool = False,
+        timeout: Optional[int] = None,
+        settle_policy: Optional[SettlePolicy] = None,
+        device: Optional[str] = None,
     ) -> Optional[str]:
         """
         Execute an adb command and return the output of the command as a string.
+        The command list is never modified, so the same ADB instance (and the same
+        command) can be used at the same time by multiple threads.
 
         :param command: The command to execute, formatted as a list of strings.
         :param is_async: When set to True, the adb command will run in background and
@@ -74,88 +293,207 @@ class ADB:
                          the program will wait until the adb command returns a result.
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param settle_policy: What to wait for after the command returned (when not
+                              running in background). If not specified, the policy
+                              of this ADB instance is used.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: The (string) output of the command. If the method is called with the
                  parameter is_async = True, None will be returned.
         """
 
-        if not isinstance(command, list) or any(
-            not isinstance(command_token, str) for command_token in command
-        ):
-            raise TypeError(
-                "The command to execute should be passed as a list of strings"
+        validate_command(command)
+        validate_timeout(timeout, is_async)
+
+        # Use the specified Android device serial number (if any).
+        device = device or self.target_device
+
+        if self._server_client is not None and self._server_client.supports(command):
+            return self._execute_native(
+                command, is_async, timeout, settle_policy, device
             )
 
-        if timeout is not None and (not isinstance(timeout, int) or timeout <= 0):
-            raise ValueError("If a timeout is provided, it must be a positive integer")
+        measurement = self._measure(command, device)
+        command = self._adb_command(command, device)
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
+        with measurement:
+            try:
+                if debug:
+                    self.logger.debug(
+                        "Running command `{0}` (async={1}, timeout={2})".format(
+                            " ".join(command), is_async, timeout
+                        )
+                    )
 
-        if is_async and timeout:
-            raise RuntimeError(
-                "The timeout cannot be used when executing the program in background"
+                if is_async:
+                    # Adb command will run in background, nothing to return.
+                    subprocess.Popen(command)
+                    measurement.mark("spawn")
+                    return None
+                else:
+                    process = subprocess.Popen(
+                        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+                    )
+                    measurement.mark("spawn")
+                    raw_output = process.communicate(timeout=timeout)[0]
+                    measurement.mark("run")
+                    measurement.received(len(raw_output))
+                    output = raw_output.strip().decode(errors="backslashreplace")
+                    measurement.mark("decode")
+                    if process.returncode != 0:
+                        raise subprocess.CalledProcessError(
+                            process.returncode, command, output.encode()
+                        )
+                    if debug:
+                        self.logger.debug(
+                            "Command `{0}` successfully returned: {1}".format(
+                                " ".join(command), output
+                            )
+                        )
+
+                    # Make sure the effects of the adb command are settled before
+                    # continuing the execution.
+                    (settle_policy or self.settle_policy).settle(
+                        self, command, process, device, timeout
+                    )
+                    measurement.mark("settle")
+
+                    return output
+            except subprocess.TimeoutExpired as e:
+                self.logger.error(
+                    "Command `{0}` timed out: {1}".format(
+                        " ".join(command),
+                        e.output.decode(errors="backslashreplace") if e.output else e,
+                    )
+                )
+                raise
+            except subprocess.CalledProcessError as e:
+                self.logger.error(
+                    "Command `{0}` exited with error: {1}".format(
+                        " ".join(command),
+                        e.output.decode(errors="backslashreplace") if e.output else e,
+                    )
+                )
+                raise
+            except Exception as e:
+                self.logger.error(
+                    "Generic error during `{0}` command execution: {1}".format(
+                        " ".join(command), e
+                    )
+                )
+                raise
+
+    def _measure(self, command: List[str], device: Optional[str]) -> CommandMeasurement:
+        # Nothing is measured (and almost no time is spent) without a registry.
+        if self.metrics is None:
+            return DISABLED_MEASUREMENT
+        return self.metrics.measure(command, device)
+
+    def _start_server(self, timeout: Optional[int]) -> None:
+        """
+        Start the adb server with the adb executable, after a connection to the adb
+        server was refused (the adb executable does the same).
+        """
+
+        with self._start_server_lock:
+            subprocess.run(
+                [self.adb_path, "start-server"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                check=True,
             )
 
-        try:
-            # Use the specified Android device serial number (if any).
-            if self.target_device:
-                command[0:0] = ["-s", self.target_device]
+    def _execute_native(
+        self,
+        command: List[str],
+        is_async: bool,
+        timeout: Optional[int],
+        settle_policy: Optional[SettlePolicy] = None,
+        device: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Execute an adb command through the adb server socket protocol, with the same
+        results (and the same exceptions) as the adb executable.
+        """
 
-            command.insert(0, self.adb_path)
+        client: AdbServerClient = self._server_client  # type: ignore[assignment]
+
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
             self.logger.debug(
-                "Running command `{0}` (async={1}, timeout={2})".format(
-                    " ".join(command), is_async, timeout
-                )
+                "Running native command `{0}` (device={1}, async={2}, "
+                "timeout={3})".format(" ".join(command), device, is_async, timeout)
             )
 
-            if is_async:
-                # Adb command will run in background, nothing to return.
-                subprocess.Popen(command)
-                return None
-            else:
-                process = subprocess.Popen(
-                    command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-                )
-                output = (
-                    process.communicate(timeout=timeout)[0]
-                    .strip()
-                    .decode(errors="backslashreplace")
-                )
-                if process.returncode != 0:
+        if is_async:
+
+            def run_in_background():
+                try:
+                    self._execute_native(command, False, None, settle_policy, device)
+                except Exception:
+                    # Already logged, there is nobody waiting for the result.
+                    pass
+
+            # Adb command will run in background, nothing to return.
+            threading.Thread(target=run_in_background, daemon=True).start()
+            return None
+
+        with self._measure(command, device) as measurement:
+            try:
+                try:
+                    raw_output, return_code = client.execute(device, command, timeout)
+                except ConnectionRefusedError:
+                    # Same behavior as the adb executable: start the adb server if
+                    # it's not already running (if killing the server, there is
+                    # nothing to do).
+                    if command == ["kill-server"] or not self.is_available():
+                        raise
+                    self._start_server(timeout)
+                    raw_output, return_code = client.execute(device, command, timeout)
+                measurement.mark("run")
+                measurement.received(len(raw_output))
+
+                output = raw_output.strip().decode(errors="backslashreplace")
+                measurement.mark("decode")
+                if return_code != 0:
                     raise subprocess.CalledProcessError(
-                        process.returncode, command, output.encode()
+                        return_code, command, output.encode()
                     )
-                self.logger.debug(
-                    "Command `{0}` successfully returned: {1}".format(
-                        " ".join(command), output
+                if debug:
+                    self.logger.debug(
+                        "Native command `{0}` successfully returned: {1}".format(
+                            " ".join(command), output
+                        )
                     )
-                )
 
-                # This is needed to make sure the adb command actually terminated
-                # before continuing the execution.
-                time.sleep(1)
+                (settle_policy or self.settle_policy).settle(
+                    self, command, None, device, timeout
+                )
+                measurement.mark("settle")
 
                 return output
-        except subprocess.TimeoutExpired as e:
-            self.logger.error(
-                "Command `{0}` timed out: {1}".format(
-                    " ".join(command),
-                    e.output.decode(errors="backslashreplace") if e.output else e,
+            except socket.timeout:
+                self.logger.error(
+                    "Native command `{0}` timed out".format(" ".join(command))
                 )
-            )
-            raise
-        except subprocess.CalledProcessError as e:
-            self.logger.error(
-                "Command `{0}` exited with error: {1}".format(
-                    " ".join(command),
-                    e.output.decode(errors="backslashreplace") if e.output else e,
+                raise subprocess.TimeoutExpired(command, timeout)  # type: ignore[arg-type]
+            except subprocess.CalledProcessError as e:
+                self.logger.error(
+                    "Native command `{0}` exited with error: {1}".format(
+                        " ".join(command),
+                        e.output.decode(errors="backslashreplace") if e.output else e,
+                    )
                 )
-            )
-            raise
-        except Exception as e:
-            self.logger.error(
-                "Generic error during `{0}` command execution: {1}".format(
-                    " ".join(command), e
+                raise
+            except Exception as e:
+                self.logger.error(
+                    "Generic error during `{0}` native command execution: {1}".format(
+                        " ".join(command), e
+                    )
                 )
-            )
-            raise
+                raise
 
     def get_version(self, timeout: Optional[int] = None) -> str:
         """
@@ -166,13 +504,11 @@ class ADB:
         :return: A string containing the version of the installed adb.
         """
 
-        output: str = self.execute(["version"], timeout=timeout)  # type: ignore[assignment]
+        def load() -> str:
+            output: str = self.execute(["version"], timeout=timeout)  # type: ignore[assignment]
+            return parse_version(output)
 
-        match = re.search(r"version\s(\S+)", output)
-        if match:
-            return match.group(1)
-        else:
-            raise RuntimeError("Unable to determine adb version")
+        return self._cached("get_version", None, [], load)
 
     def get_available_devices(self, timeout: Optional[int] = None) -> List[str]:
         """
@@ -183,18 +519,26 @@ class ADB:
         :return: A list of strings, each string is a device serial number.
         """
 
-        output: str = self.execute(["devices"], timeout=timeout)  # type: ignore[assignment]
+        tracker = self.tracker
+        if tracker is not None and tracker.running:
+            return [
+                serial
+                for serial, info in tracker.devices().items()
+                if info.state == "device"
+            ]
+
+        def load() -> List[str]:
+            output: str = self.execute(["devices"], timeout=timeout)  # type: ignore[assignment]
+            return parse_devices(output)
 
-        devices = []
-        for line in output.splitlines():
-            tokens = line.strip().split()
-            if len(tokens) == 2 and tokens[1] == "device":
-                # Add to the list the name / ip and port of the device.
-                devices.append(tokens[0])
-        return devices
+        return list(self._cached("get_available_devices", None, [], load))
 
     def shell(
-        self, command: List[str], is_async: bool = False, timeout: Optional[int] = None
+        self,
+        command: List[str],
+        is_async: bool = False,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
     ) -> Optional[str]:
         """
         Execute an adb shell command on the Android device connected through adb and
@@ -208,56 +552,608 @@ class ADB:
                          scripts on the Android device.
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: The (string) output of the command. If the method is called with the
                  parameter is_async = True, None will be returned.
         """
 
-        if not isinstance(command, list) or any(
-            not isinstance(command_token, str) for command_token in command
+        validate_command(command)
+
+        return self.execute(
+            ["shell"] + command, is_async=is_async, timeout=timeout, device=device
+        )
+
+    def shell_batch(
+        self,
+        commands: List[List[str]],
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        max_length: int = BATCH_MAX_LENGTH,
+    ) -> List[ShellResult]:
+        """
+        Execute many adb shell commands with a single shell invocation (instead of
+        one round trip for each command) and return the result of every command.
+        Each command runs in its own shell, so a failing command doesn't stop the
+        next commands.
+
+        :param commands: The commands to execute, each one formatted as a list of
+                         strings (as for shell method).
+        :param timeout: How many seconds to wait for all the commands to finish
+                        execution before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param max_length: The maximum length of a single shell invocation, when
+                           exceeded the commands are split into more invocations.
+        :return: The output, the exit code and the duration of every command (in
+                 the same order as the commands).
+        """
+
+        for command in commands:
+            validate_command(command)
+
+        marker = new_marker()
+        # The output of each invocation is stripped, so the marker lines are
+        # separated again.
+        output = "\n".join(
+            self.shell([script], timeout=timeout, device=device) or ""
+            for script in batch_scripts(commands, marker, max_length)
+        )
+
+        results = parse_batch_output(output, commands, marker)
+        if len(results) != len(commands):
+            raise RuntimeError(
+                "Only {0} of the {1} commands in the batch were executed".format(
+                    len(results), len(commands)
+                )
+            )
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Executed {0} commands in a batch ({1} failed)".format(
+                    len(results), sum(not result.ok for result in results)
+                )
+            )
+
+        return results
+
+    def stream(
+        self,
+        command: List[str],
+        raw: bool = False,
+        chunk_size: int = 65536,
+        device: Optional[str] = None,
+    ) -> CommandStream:
+        """
+        Execute an adb command and iterate over its output while the command is
+        running, instead of waiting for the command to finish. This is needed for
+        the commands with a large or endless output (e.g., logcat).
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param raw: When set to True, chunks of bytes are returned, otherwise
+                    (default) decoded lines are returned.
+        :param chunk_size: The maximum size (in bytes) of the chunks read from the
+                           command output.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The stream with the output of the command (use it in a with
+                 statement, or call its close method, to stop the command).
+        """
+
+        validate_command(command)
+
+        device = device or self.target_device
+        channel: Union[ProcessChannel, SocketChannel]
+        client = self._server_client
+        if (
+            client is not None
+            and command[:1] in (["shell"], ["exec-out"])
+            and client.supports(command)
         ):
-            raise TypeError(
-                "The command to execute should be passed as a list of strings"
+            if command[0] == "shell":
+                connection, shell_v2 = client.open_shell(device, " ".join(command[1:]))
+            else:
+                connection, shell_v2 = (
+                    client.open_service(
+                        device, "exec:{0}".format(" ".join(command[1:]))
+                    ),
+                    False,
+                )
+            channel = SocketChannel(connection, shell_v2)
+        else:
+            channel = ProcessChannel(self._adb_command(command, device))
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Streaming command `{0}`".format(" ".join(command)))
+
+        return CommandStream(channel, command, raw, chunk_size, self.logger)
+
+    def shell_stream(
+        self,
+        command: List[str],
+        raw: bool = False,
+        chunk_size: int = 65536,
+        device: Optional[str] = None,
+    ) -> CommandStream:
+        """
+        Execute an adb shell command on the Android device connected through adb and
+        iterate over its output while the command is running (e.g., logcat, top).
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param raw: When set to True, chunks of bytes are returned, otherwise
+                    (default) decoded lines are returned.
+        :param chunk_size: The maximum size (in bytes) of the chunks read from the
+                           command output.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The stream with the output of the command (use it in a with
+                 statement, or call its close method, to stop the command).
+        """
+
+        validate_command(command)
+
+        return self.stream(
+            ["shell"] + command, raw=raw, chunk_size=chunk_size, device=device
+        )
+
+    def logcat(
+        self,
+        binary: bool = False,
+        tags: Optional[List[str]] = None,
+        min_priority: str = "V",
+        pids: Optional[List[int]] = None,
+        buffer_size: int = 10000,
+        output: Optional[str] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        backup_count: int = 5,
+        args: Optional[List[str]] = None,
+        device: Optional[str] = None,
+    ) -> LogcatCollector:
+        """
+        Start collecting the logcat of the Android device in background: the log
+        entries are parsed into records, filtered, kept in a ring buffer with the
+        most recent entries and (optionally) written to rotating jsonl files.
+
+        :param binary: When set to True, logcat sends the entries in its binary
+                       format (logcat -B, less work on the device), otherwise
+                       (default) in the threadtime format.
+        :param tags: Keep only the entries with these tags. If None, all the tags.
+        :param min_priority: Keep only the entries with this priority or higher
+                             (V, D, I, W, E or F).
+        :param pids: Keep only the entries of these processes. If None, all the
+                     processes.
+        :param buffer_size: The maximum number of entries kept in memory.
+        :param output: The jsonl file where the entries are written. If None, the
+                       entries are only kept in memory.
+        :param max_bytes: The maximum size of the jsonl file before it's rotated.
+        :param backup_count: The number of rotated jsonl files kept.
+        :param args: Other arguments for logcat (e.g., ["-b", "all"] or ["-d"]).
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The running collector (use it in a with statement, or call its
+                 close method, to stop logcat).
+        """
+
+        log_filter = (
+            LogFilter(tags, min_priority, pids)
+            if tags is not None or min_priority != "V" or pids is not None
+            else None
+        )
+        command = ["exec-out", "logcat"] + (["-B"] if binary else ["-v", "threadtime"])
+        stream = self.stream(command + (args or []), raw=True, device=device)
+        return LogcatCollector(
+            stream,
+            binary,
+            log_filter,
+            LogBuffer(buffer_size),
+            LogWriter(output, max_bytes, backup_count) if output else None,
+        ).start()
+
+    def exec_out(
+        self,
+        command: List[str],
+        output: Any = None,
+        timeout: Optional[int] = None,
+        chunk_size: int = 1024 * 1024,
+        device: Optional[str] = None,
+    ) -> Union[bytes, int]:
+        """
+        Execute a command on the Android device connected through adb (with adb
+        exec-out) and get its binary output, without any decoding or conversion
+        (e.g., for screencap -p or for copying a file with cat). The stderr of the
+        adb process is kept separate from the output (with the native backend, the
+        device merges the stderr of the command with its output).
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param output: Where to store the output: if None (default), the output is
+                       returned as bytes. If it's an object with a write method
+                       (e.g., a file opened in binary mode), the output is written
+                       into it in chunks. Any other writable buffer (e.g.,
+                       bytearray, memoryview) is filled directly with the output.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :param chunk_size: The size (in bytes) of the chunks written into output.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The output of the command as bytes if output is None, otherwise the
+                 number of bytes stored into output.
+        """
+
+        validate_command(command)
+        validate_timeout(timeout)
+
+        with self._exec_channel(command, timeout, device) as channel:
+            return read_output(channel, output, chunk_size)
+
+    @contextlib.contextmanager
+    def _exec_channel(
+        self,
+        command: List[str],
+        timeout: Optional[int],
+        device: Optional[str],
+        stdin: bool = False,
+    ) -> Iterator[Union[ProcessChannel, SocketChannel]]:
+        """
+        Run a command on the device with a raw binary channel (adb exec-out, or adb
+        exec-in when stdin is True), with the same exceptions as the other commands.
+        When the with statement ends, the command is awaited and its exit code is
+        checked.
+        """
+
+        device = device or self.target_device
+        exec_cmd = ["exec-in" if stdin else "exec-out"] + command
+        timer = None
+        # Set only when the timer kills the command (Timer.cancel sets its finished
+        # event too, so that can't tell whether the command timed out).
+        timed_out = threading.Event()
+        channel: Union[ProcessChannel, SocketChannel]
+
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug(
+                "Running binary command `{0}` (timeout={1})".format(
+                    " ".join(exec_cmd), timeout
+                )
+            )
+
+        try:
+            client = self._server_client
+            if client is not None and client.supports(["exec-out"] + command):
+                connection, shell_v2 = None, False
+                if stdin:
+                    # The shell protocol can signal the end of the input without
+                    # closing the connection.
+                    connection, shell_v2 = client.open_shell(
+                        device, " ".join(command), timeout
+                    )
+                    if not shell_v2:
+                        connection.close()
+                if not shell_v2:
+                    connection = client.open_service(
+                        device, "exec:{0}".format(" ".join(command)), timeout
+                    )
+                channel = SocketChannel(connection, shell_v2)  # type: ignore[arg-type]
+            else:
+                channel = ProcessChannel(
+                    self._adb_command(exec_cmd, device), stdin=stdin, merge_stderr=False
+                )
+                if timeout:
+                    process = channel.process
+
+                    def kill() -> None:
+                        timed_out.set()
+                        process.kill()
+
+                    timer = threading.Timer(timeout, kill)
+                    timer.start()
+
+            try:
+                yield channel
+                channel.wait()
+            finally:
+                if timer:
+                    timer.cancel()
+                channel.close()
+
+            if timed_out.is_set() and channel.returncode != 0:
+                raise subprocess.TimeoutExpired(
+                    exec_cmd,
+                    timeout,  # type: ignore[arg-type]
+                    stderr=channel.stderr,
+                )
+            if channel.returncode:
+                raise subprocess.CalledProcessError(
+                    channel.returncode, exec_cmd, stderr=channel.stderr
+                )
+            if debug and channel.stderr:
+                self.logger.debug(
+                    "Binary command `{0}` stderr: {1}".format(
+                        " ".join(exec_cmd),
+                        channel.stderr.decode(errors="backslashreplace"),
+                    )
+                )
+        except socket.timeout:
+            self.logger.error(
+                "Binary command `{0}` timed out".format(" ".join(exec_cmd))
+            )
+            raise subprocess.TimeoutExpired(exec_cmd, timeout)  # type: ignore[arg-type]
+        except AdbProtocolError as e:
+            self.logger.error(
+                "Binary command `{0}` exited with error: {1}".format(
+                    " ".join(exec_cmd), e
+                )
             )
+            raise subprocess.CalledProcessError(
+                1, exec_cmd, stderr="error: {0}".format(e).encode()
+            )
+        except subprocess.SubprocessError as e:
+            self.logger.error(
+                "Binary command `{0}` exited with error: {1}".format(
+                    " ".join(exec_cmd),
+                    e.stderr.decode(errors="backslashreplace") if e.stderr else e,  # type: ignore[attr-defined]
+                )
+            )
+            raise
 
-        command.insert(0, "shell")
+    def shell_session(self, device: Optional[str] = None) -> ShellSession:
+        """
+        Get a persistent shell session on the Android device connected through adb.
+        The session keeps a single remote shell open and runs the commands one after
+        the other, which is much faster than calling shell method when running many
+        small commands.
+
+        :param device: The serial number of the device. If None, the target device
+                       of this ADB instance is used.
+        :return: The shell session (the remote shell is opened on the first command,
+                 use close method or a with statement to close it).
+        """
+
+        if self._server_client is None and not self.is_available():
+            raise FileNotFoundError("Adb executable is not available")
 
-        return self.execute(command, is_async=is_async, timeout=timeout)
+        return ShellSession(self, device)
 
-    def get_property(self, property_name: str, timeout: Optional[int] = None) -> str:
+    def get_property(
+        self,
+        property_name: str,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> str:
         """
-        Get the value of a property on the Android device connected through adb.
+        Get the value of a property on the Android device connected through adb. The
+        value is served from the property cache when possible (see properties).
 
         :param property_name: The name of the property.
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: The value of the property.
         """
 
-        property: str = self.shell(["getprop", property_name], timeout=timeout)  # type: ignore[assignment]
-        return property
+        return self.properties.get(property_name, device=device, timeout=timeout)
+
+    def get_properties(
+        self,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        refresh: bool = False,
+    ) -> Dict[str, str]:
+        """
+        Get all the properties of the Android device connected through adb, with a
+        single getprop command.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param refresh: When set to True, the properties are always loaded again from
+                        the device, instead of using the property cache.
+        :return: A dictionary with the name and the value of each property.
+        """
+
+        return self.properties.snapshot(device=device, timeout=timeout, refresh=refresh)
 
-    def get_device_sdk_version(self, timeout: Optional[int] = None) -> int:
+    def get_features(
+        self,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        refresh: bool = False,
+    ) -> List[str]:
+        """
+        Get the features supported by both the adb server and the Android device
+        connected through adb (e.g., shell_v2, sendrecv_v2_zstd). The features are
+        loaded only once for each device (see features).
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param refresh: When set to True, the features are always loaded again.
+        :return: The sorted list of the features.
+        """
+
+        return self.features.get(device=device, timeout=timeout, refresh=refresh)
+
+    def get_device_sdk_version(
+        self, timeout: Optional[int] = None, device: Optional[str] = None
+    ) -> int:
         """
         Get the version of the SDK installed on the Android device (e.g., 23 for
         Android Marshmallow).
 
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: An int with the version number.
         """
 
-        return int(self.get_property("ro.build.version.sdk", timeout=timeout))
+        return self._cached(
+            "get_device_sdk_version",
+            device or self.target_device,
+            [],
+            lambda: int(
+                self.get_property(
+                    "ro.build.version.sdk", timeout=timeout, device=device
+                )
+            ),
+        )
 
-    def wait_for_device(self, timeout: Optional[int] = None) -> None:
+    def get_package_path(
+        self,
+        package_name: str,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Get the paths of the apk files of an application installed on the Android
+        device (pm path).
+
+        :param package_name: The package name of the application.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The paths of the base apk and of the split apks (if any), an empty
+                 list if the application is not installed.
+        """
+
+        def load() -> List[str]:
+            output: str = self.shell(
+                ["pm", "path", shlex.quote(package_name), "2>/dev/null", "||", "true"],
+                timeout=timeout,
+                device=device,
+            )  # type: ignore[assignment]
+            return [
+                line.strip()[len("package:") :]
+                for line in output.splitlines()
+                if line.strip().startswith("package:")
+            ]
+
+        return list(
+            self._cached(
+                "get_package_path", device or self.target_device, [package_name], load
+            )
+        )
+
+    def get_setting(
+        self,
+        namespace: str,
+        key: str,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> str:
+        """
+        Get the value of a setting of the Android device (settings get).
+
+        :param namespace: The namespace of the setting: system, secure or global.
+        :param key: The name of the setting.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The value of the setting ("null" if the setting is not set, same
+                 as settings get).
+        """
+
+        if namespace not in ("system", "secure", "global"):
+            raise ValueError("Invalid settings namespace '{0}'".format(namespace))
+
+        def load() -> str:
+            output: str = self.shell(
+                ["settings", "get", namespace, shlex.quote(key)],
+                timeout=timeout,
+                device=device,
+            )  # type: ignore[assignment]
+            return output
+
+        return self._cached(
+            "get_setting", device or self.target_device, [namespace, key], load
+        )
+
+    def get_state(
+        self, timeout: Optional[float] = None, device: Optional[str] = None
+    ) -> str:
+        """
+        Get the state of the Android device (e.g., device, offline, recovery). This
+        method is used to poll the device (e.g., while it reboots), so the failures
+        are expected and not logged as errors.
+
+        :param timeout: How many seconds to wait for the state before considering
+                        the device not available.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The state of the device, an empty string if the device is not
+                 available.
+        """
+
+        device = device or self.target_device
+
+        try:
+            if self._server_client is not None:
+                return self._server_client.get_state(device, timeout).strip()
+            process = subprocess.run(
+                self._adb_command(["get-state"], device),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+        except (AdbProtocolError, OSError, subprocess.TimeoutExpired) as e:
+            self.logger.debug("Device state not available: {0}".format(e))
+            return ""
+        if process.returncode != 0:
+            return ""
+        return process.stdout.strip().decode(errors="backslashreplace")
+
+    def wait_for_device(
+        self, timeout: Optional[int] = None, device: Optional[str] = None
+    ) -> None:
         """
         Wait until the Android device connected through adb is ready to receive
         commands.
 
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        """
+
+        tracker = self.tracker
+        if tracker is not None and tracker.running:
+            try:
+                tracker.wait_for(device or self.target_device, timeout=timeout)
+            except socket.timeout:
+                self.logger.error("Timed out while waiting for the device")
+                raise subprocess.TimeoutExpired(["wait-for-device"], timeout)  # type: ignore[arg-type]
+            return
+
+        self.execute(["wait-for-device"], timeout=timeout, device=device)
+
+    def track_devices(self, timeout: Optional[int] = None) -> DeviceTracker:
+        """
+        Start tracking the devices connected to adb with a single long-lived
+        connection with the adb server (see adb/tracker.py). While the tracker is
+        running, get_available_devices and wait_for_device use its registry instead
+        of running new adb commands.
+
+        :param timeout: How many seconds to wait for the adb server and for the
+                        first list of devices before throwing an exception.
+        :return: The device tracker (the same one if already running). Use its
+                 close method to stop it.
         """
 
-        self.execute(["wait-for-device"], timeout=timeout)
+        with self._tracker_lock:
+            if self.tracker is None or not self.tracker.running:
+                # Make sure the adb server is running.
+                self.execute(["start-server"], timeout=timeout)
+                self.tracker = DeviceTracker(*self._server_address)
+                try:
+                    self.tracker.start(timeout)
+                except socket.timeout:
+                    self.tracker.close()
+                    raise subprocess.TimeoutExpired(["track-devices"], timeout)  # type: ignore[arg-type]
+            return self.tracker
 
     def kill_server(self, timeout: Optional[int] = None) -> None:
         """
@@ -268,6 +1164,7 @@ class ADB:
         """
 
         self.execute(["kill-server"], timeout=timeout)
+        self._invalidate_queries()
 
     def connect(self, host: Optional[str] = None, timeout: Optional[int] = None) -> str:
         """
@@ -282,65 +1179,265 @@ class ADB:
         :return: The string with the result of the connect operation.
         """
 
-        if host:
-            connect_cmd = ["connect", host]
-        else:
-            connect_cmd = ["start-server"]
-
-        output: str = self.execute(connect_cmd, timeout=timeout)  # type: ignore[assignment]
-
-        # Make sure the connect operation ended successfully.
-        if output and any(
-            error in output.lower()
-            for error in [
-                "unable to connect",
-                "cannot connect",
-                "cannot resolve",
-                "failed to",
-            ]
-        ):
-            raise RuntimeError(
-                "Something went wrong during the connect operation: {0}".format(output)
-            )
-        else:
-            return output
+        output: str = self.execute(connect_command(host), timeout=timeout)  # type: ignore[assignment]
+        # The list of the available devices could be different.
+        self._invalidate_queries()
+
+        return check_connect_output(output)
+
+    def connect_many(
+        self,
+        hosts: List[str],
+        max_workers: int = 16,
+        retries: int = 2,
+        backoff: float = 0.5,
+        timeout: Optional[int] = None,
+    ) -> ConnectReport:
+        """
+        Connect many Android devices over TCP/IP at the same time (see
+        adb/fleet.py). A host that fails (the output of adb connect contains an
+        error, or the attempt times out) doesn't stop the others, and it's retried
+        after a jittered exponential backoff.
+
+        :param hosts: The host addresses of the Android devices (in host[:port]
+                      format).
+        :param max_workers: The maximum number of connections in progress at the
+                            same time.
+        :param retries: How many times to connect again a host that failed.
+        :param backoff: How many seconds to wait (on average) before the first retry,
+                        the delay doubles after every retry.
+        :param timeout: How many seconds each connection attempt can take before
+                        failing.
+        :return: The report with the outcome of each host.
+        """
+
+        connector = BulkConnector(
+            self.connect,
+            max_workers=max_workers,
+            retries=retries,
+            backoff=backoff,
+            timeout=timeout,
+            logger=self.logger,
+        )
+        return connector.run(hosts)
 
-    def remount(self, timeout: Optional[int] = None) -> str:
+    def keep_alive(
+        self,
+        hosts: List[str],
+        interval: float = 10.0,
+        max_workers: int = 16,
+        retries: int = 2,
+        backoff: float = 0.5,
+        timeout: Optional[int] = None,
+    ) -> KeepAlive:
+        """
+        Keep many Android devices connected over TCP/IP: a background thread checks
+        the connected devices every interval seconds (and as soon as a device drops,
+        while the device tracker is running, see track_devices) and connects again
+        the ones missing, like connect_many. The monitor should be closed when no
+        longer needed.
+
+        :param hosts: The host addresses of the Android devices (in host[:port]
+                      format).
+        :param interval: How many seconds between two checks.
+        :param max_workers: The maximum number of connections in progress at the
+                            same time.
+        :param retries: How many times to connect again a host that failed (during
+                        the same check).
+        :param backoff: How many seconds to wait (on average) before the first retry,
+                        the delay doubles after every retry.
+        :param timeout: How many seconds each command can take before failing.
+        :return: The running monitor, with the number of reconnections of each host.
+        """
+
+        connector = BulkConnector(
+            self.connect,
+            max_workers=max_workers,
+            retries=retries,
+            backoff=backoff,
+            timeout=timeout,
+            logger=self.logger,
+        )
+        return KeepAlive(self, hosts, connector, interval, timeout).start()
+
+    def remount(
+        self,
+        timeout: Optional[int] = None,
+        settle_policy: Optional[SettlePolicy] = None,
+        device: Optional[str] = None,
+    ) -> str:
         """
         Remount system partitions in writable mode (system partitions are read-only by
         default). This command needs adb with root privileges.
 
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param settle_policy: What to wait for after the remount command returned.
+                              By default, the device is polled until it's ready to
+                              receive commands again.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: The string with the result of the remount operation.
         """
 
-        output = self.execute(["remount"], timeout=timeout)
+        output = self.execute(
+            ["remount"],
+            timeout=timeout,
+            settle_policy=settle_policy or PollUntil(device_online),
+            device=device,
+        )
+        self.properties.invalidate(device or self.target_device)
+        self._invalidate_queries(device or self.target_device)
 
-        # Make sure the remount operation ended successfully.
-        if output and "remount succeeded" in output.lower():
-            return output
-        else:
-            raise RuntimeError(
-                "Something went wrong during the remount operation: {0}".format(output)
-            )
+        return check_remount_output(output)
 
-    def reboot(self, timeout: Optional[int] = None) -> str:
+    def reboot(
+        self,
+        timeout: Optional[int] = None,
+        settle_policy: Optional[SettlePolicy] = None,
+        device: Optional[str] = None,
+    ) -> str:
         """
         Reboot the Android device connected through adb.
 
         :param timeout: How many seconds to wait for the command to finish execution
                         before throwing an exception.
+        :param settle_policy: What to wait for after the reboot command returned. By
+                              default, the device is polled until it goes offline,
+                              so that a following wait_for_device doesn't return
+                              before the reboot actually started.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        """
+
+        output: str = self.execute(
+            ["reboot"],
+            timeout=timeout,
+            settle_policy=settle_policy or PollUntil(device_offline),
+            device=device,
+        )  # type: ignore[assignment]
+        self.properties.invalidate(device or self.target_device)
+        # The device could be updated during the reboot.
+        self.features.invalidate(device or self.target_device)
+        self._invalidate_queries(device or self.target_device)
+        return output
+
+    def sync(
+        self, timeout: Optional[int] = None, device: Optional[str] = None
+    ) -> SyncClient:
+        """
+        Open a file sync session with the Android device, to copy files directly
+        through the adb server (without the adb executable), with progress
+        information and a result for each copied file.
+
+        :param timeout: How many seconds the session can be used before throwing an
+                        exception.
+        :param device: The serial number of the device for this session only. If
+                       None, the target device of this ADB instance is used.
+        :return: The sync session (use it in a with statement, or call its close
+                 method, to end the session).
+        """
+
+        validate_timeout(timeout)
+
+        client = self._server_client or AdbServerClient(*self._server_address)
+        device = device or self.target_device
+        try:
+            connection = client.open_service(device, "sync:", timeout)
+        except ConnectionRefusedError:
+            # Start the adb server if it's not already running, as the commands do.
+            if not self.is_available():
+                raise
+            self._start_server(timeout)
+            connection = client.open_service(device, "sync:", timeout)
+        return SyncClient(connection)
+
+    def _sync_copy(
+        self,
+        command: List[str],
+        timeout: Optional[int],
+        device: Optional[str],
+        progress: Optional[ProgressCallback],
+    ) -> str:
+        """
+        Execute a push or pull command with the file sync protocol, with the same
+        output (and the same exceptions) as the adb executable.
         """
 
-        output: str = self.execute(["reboot"], timeout=timeout)  # type: ignore[assignment]
+        operation, sources, destination = command[0], command[1:-1], command[-1]
+
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug(
+                "Running sync command `{0}` (device={1}, timeout={2})".format(
+                    " ".join(command), device or self.target_device, timeout
+                )
+            )
+
+        try:
+            results = []
+            with self.sync(timeout=timeout, device=device) as sync:
+                copy = sync.push if operation == "push" else sync.pull
+                for source in sources:
+                    results.extend(copy(source, destination, progress))
+        except socket.timeout:
+            self.logger.error("Sync command `{0}` timed out".format(" ".join(command)))
+            raise subprocess.TimeoutExpired(command, timeout)  # type: ignore[arg-type]
+        except AdbProtocolError as e:
+            self.logger.error(
+                "Sync command `{0}` exited with error: {1}".format(" ".join(command), e)
+            )
+            raise subprocess.CalledProcessError(
+                1, command, "adb: error: {0}".format(e).encode()
+            )
+
+        output = transfer_summary(results, operation + "ed")
+        if debug:
+            self.logger.debug(
+                "Sync command `{0}` successfully returned: {1}".format(
+                    " ".join(command), output
+                )
+            )
         return output
 
+    def _transfer_compression(
+        self,
+        paths: List[str],
+        compression: Optional[str],
+        progress: Optional[ProgressCallback],
+        timeout: Optional[int],
+        device: Optional[str],
+    ) -> Optional[str]:
+        """
+        Choose the compression of a push or pull operation (see choose_compression).
+        The file sync protocol of this library doesn't compress the data, so the
+        adb executable is used when an algorithm is chosen.
+        """
+
+        if compression is None or progress is not None:
+            # Not requested (the transfer is done as usual), or only the file sync
+            # protocol reports the progress.
+            return None
+        features = (
+            self.get_features(timeout=timeout, device=device)
+            if compression == AUTO_COMPRESSION
+            else []
+        )
+        algorithm = choose_compression(paths, features, compression)
+        if algorithm is not None and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Compression for {0}: {1}".format(", ".join(paths), algorithm)
+            )
+        return algorithm
+
     def push_file(
         self,
         host_path: Union[str, List[str]],
         device_path: str,
         timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        compression: Optional[str] = None,
     ) -> str:
         """
         Copy a file (or a list of files) from the computer to the Android device
@@ -353,46 +1450,52 @@ class ADB:
                             be copied.
         :param timeout: How many seconds to wait for the file copy operation before
                         throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param progress: Function called with the path of the file being copied, the
+                         bytes copied so far and the size of the file, after every
+                         chunk copied. When specified (or with the native backend),
+                         the files are copied with the file sync protocol instead of
+                         the adb executable.
+        :param compression: None (default) copies the files as usual, "auto"
+                            compresses the files that are worth compressing (e.g.,
+                            logs and databases, but not apk, jpg or zip files) with
+                            the best algorithm supported by both the adb server and
+                            the device, "none" disables the compression, zstd, lz4
+                            or brotli force an algorithm. Ignored when a progress
+                            function is specified.
         :return: The string with the result of the copy operation.
         """
 
-        # Make sure the files to copy exist on the host computer.
-        if isinstance(host_path, list):
-            for p in host_path:
-                if not os.path.exists(p):
-                    raise FileNotFoundError(
-                        "Cannot copy '{0}' to the Android device: no such file or "
-                        "directory".format(p)
-                    )
+        push_cmd = push_command(host_path, device_path)
+        algorithm = self._transfer_compression(
+            push_cmd[1:-1], compression, progress, timeout, device
+        )
 
-        if isinstance(host_path, str) and not os.path.exists(host_path):
-            raise FileNotFoundError(
-                "Cannot copy '{0}' to the Android device: no such file or "
-                "directory".format(host_path)
+        if progress is not None or (
+            self._server_client is not None
+            and (algorithm in (None, NO_COMPRESSION) or not self.is_available())
+        ):
+            return check_push_output(
+                self._sync_copy(push_cmd, timeout, device, progress)
             )
 
-        push_cmd = ["push"]
-        if isinstance(host_path, list):
-            push_cmd.extend(host_path)
-        else:
-            push_cmd.append(host_path)
-
-        push_cmd.append(device_path)
+        output: str = self.execute(
+            push_command(host_path, device_path, algorithm),
+            timeout=timeout,
+            device=device,
+        )  # type: ignore[assignment]
 
-        output: str = self.execute(push_cmd, timeout=timeout)  # type: ignore[assignment]
-
-        # Make sure the push operation ended successfully.
-        match = re.search(r"\d+ files? pushed[.,]", output.splitlines()[-1])
-        if match:
-            return output
-        else:
-            raise RuntimeError("Something went wrong during the file push operation")
+        return check_push_output(output)
 
     def pull_file(
         self,
         device_path: Union[str, List[str]],
         host_path: str,
         timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        compression: Optional[str] = None,
     ) -> str:
         """
         Copy a file (or a list of files) from the Android device to the computer
@@ -406,45 +1509,707 @@ class ADB:
                           path should refer to an existing directory on the host.
         :param timeout: How many seconds to wait for the file copy operation before
                         throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param progress: Function called with the path of the file being copied, the
+                         bytes copied so far and the size of the file, after every
+                         chunk copied. When specified (or with the native backend),
+                         the files are copied with the file sync protocol instead of
+                         the adb executable.
+        :param compression: None (default) copies the files as usual, "auto"
+                            compresses the files that are worth compressing with the
+                            best algorithm supported by both the adb server and the
+                            device, "none" disables the compression, zstd, lz4 or
+                            brotli force an algorithm. Ignored when a progress
+                            function is specified.
         :return: The string with the result of the copy operation.
         """
 
-        # When copying multiple files at the same time, make sure the host path refers
-        # to an existing directory.
-        if isinstance(device_path, list) and not os.path.isdir(host_path):
+        pull_cmd = pull_command(device_path, host_path)
+        algorithm = self._transfer_compression(
+            pull_cmd[1:-1], compression, progress, timeout, device
+        )
+
+        if progress is not None or (
+            self._server_client is not None
+            and (algorithm in (None, NO_COMPRESSION) or not self.is_available())
+        ):
+            return check_pull_output(
+                self._sync_copy(pull_cmd, timeout, device, progress)
+            )
+
+        output: str = self.execute(
+            pull_command(device_path, host_path, algorithm),
+            timeout=timeout,
+            device=device,
+        )  # type: ignore[assignment]
+
+        return check_pull_output(output)
+
+    def push_files(
+        self,
+        host_paths: List[str],
+        device_dir: str,
+        width: int = 4,
+        retries: int = 1,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> TransferReport:
+        """
+        Copy many files (and directories) from the computer to the Android device,
+        using more transfer channels at the same time. The files are split into
+        shards of similar total size, one for each channel, and a failing file
+        doesn't stop the others (it's retried on its own).
+
+        :param host_paths: The paths of the files and directories on the host
+                           computer.
+        :param device_dir: The directory on the Android device where the files and
+                           directories should be copied.
+        :param width: How many transfer channels to use at the same time.
+        :param retries: How many times to copy again a file that failed.
+        :param timeout: How many seconds each transfer channel can be used before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param progress: Function called with the path of the file being copied, the
+                         bytes copied so far and the size of the file, after every
+                         chunk copied (from more threads at the same time).
+        :return: The report with the status of each file copied.
+        """
+
+        transfer = ParallelTransfer(
+            lambda: self.sync(timeout=timeout, device=device),
+            push=True,
+            width=width,
+            retries=retries,
+            progress=progress,
+            logger=self.logger,
+        )
+        return transfer.run(local_transfers(host_paths, device_dir))
+
+    def pull_files(
+        self,
+        device_paths: List[str],
+        host_dir: str,
+        width: int = 4,
+        retries: int = 1,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> TransferReport:
+        """
+        Copy many files (and directories) from the Android device to the computer,
+        using more transfer channels at the same time. The files are split into
+        shards of similar total size, one for each channel, and a failing file
+        doesn't stop the others (it's retried on its own).
+
+        :param device_paths: The paths of the files and directories on the Android
+                             device.
+        :param host_dir: The existing directory on the host computer where the files
+                         and directories should be copied.
+        :param width: How many transfer channels to use at the same time.
+        :param retries: How many times to copy again a file that failed.
+        :param timeout: How many seconds each transfer channel can be used before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param progress: Function called with the path of the file being copied, the
+                         bytes copied so far and the size of the file, after every
+                         chunk copied (from more threads at the same time).
+        :return: The report with the status of each file copied.
+        """
+
+        if not os.path.isdir(host_dir):
             raise NotADirectoryError(
-                "When copying multiple files, the destination host path should be an "
-                "existing directory: '{0}' directory was not found".format(host_path)
+                "The destination host directory '{0}' was not found".format(host_dir)
             )
 
-        # Make sure the destination directory on the host exists (adb won't create the
-        # missing directories specified on the host path). For example, if test/
-        # directory exists on host, it can be used, but test/nested/ can be used only
-        # if it already exists on the host, otherwise adb won't create the nested/
-        # directory.
-        if not os.path.isdir(os.path.dirname(host_path)):
+        transfer = ParallelTransfer(
+            lambda: self.sync(timeout=timeout, device=device),
+            push=False,
+            width=width,
+            retries=retries,
+            progress=progress,
+            logger=self.logger,
+        )
+        with self.sync(timeout=timeout, device=device) as sync:
+            transfers = remote_transfers(sync, device_paths, host_dir)
+        return transfer.run(transfers)
+
+    def sync_dir(
+        self,
+        host_dir: str,
+        device_dir: str,
+        direction: str = "push",
+        delete: bool = False,
+        checksum: bool = False,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> DirectorySyncResult:
+        """
+        Synchronize a directory between the computer and the Android device, copying
+        only the new or changed files (compared by size and modification time, or by
+        md5 hash). The content of the directory on the device is read with a single
+        shell command. Empty directories are not copied.
+
+        :param host_dir: The directory on the host computer.
+        :param device_dir: The directory on the Android device.
+        :param direction: "push" (default) to update device_dir with the content of
+                          host_dir, "pull" to update host_dir with the content of
+                          device_dir.
+        :param delete: When set to True, the files that don't exist in the source
+                       directory are deleted from the destination directory.
+        :param checksum: When set to True, the files are compared by md5 hash
+                         instead of modification time (slower, but reliable when
+                         the modification times are not preserved).
+        :param timeout: How many seconds to wait for each step of the operation
+                        before throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param progress: Function called with the path of the file being copied, the
+                         bytes copied so far and the size of the file, after every
+                         chunk copied.
+        :return: The files copied, the files already up to date and the files
+                 deleted.
+        """
+
+        if direction not in ("push", "pull"):
+            raise ValueError(
+                "Invalid direction '{0}', use 'push' or 'pull'".format(direction)
+            )
+        if direction == "push" and not os.path.isdir(host_dir):
             raise NotADirectoryError(
-                "The destination host directory '{0}' was not found".format(
-                    os.path.dirname(host_path)
+                "The source host directory '{0}' was not found".format(host_dir)
+            )
+
+        try:
+            output: str = self.shell(
+                [remote_manifest_command(device_dir, checksum)],
+                timeout=timeout,
+                device=device,
+            )  # type: ignore[assignment]
+        except subprocess.CalledProcessError as e:
+            if e.returncode != MANIFEST_MISSING_EXIT_CODE:
+                raise
+            output = MANIFEST_MISSING
+        if output.strip() == MANIFEST_MISSING:
+            if direction == "pull":
+                # Never compare with an empty directory, the files of the host
+                # directory would be deleted.
+                raise FileNotFoundError(
+                    "The source device directory '{0}' was not found".format(device_dir)
                 )
+            output = ""
+        device_manifest = parse_remote_manifest(output)
+        host_manifest = local_manifest(host_dir, checksum)
+
+        if direction == "push":
+            source, destination = host_manifest, device_manifest
+        else:
+            source, destination = device_manifest, host_manifest
+
+        changed = changed_files(source, destination)
+        unchanged = sorted(set(source) - set(changed))
+        deleted = sorted(set(destination) - set(source)) if delete else []
+
+        self.logger.debug(
+            "Synchronizing `{0}` and `{1}` ({2}): {3} files to copy, {4} unchanged, "
+            "{5} to delete".format(
+                host_dir,
+                device_dir,
+                direction,
+                len(changed),
+                len(unchanged),
+                len(deleted),
             )
+        )
 
-        pull_cmd = ["pull"]
-        if isinstance(device_path, list):
-            pull_cmd.extend(device_path)
+        transferred = []
+        if changed:
+            with self.sync(timeout=timeout, device=device) as sync:
+                for path in changed:
+                    host_path = os.path.join(host_dir, *path.split("/"))
+                    device_path = posixpath.join(device_dir, path)
+                    if direction == "push":
+                        transferred.append(
+                            sync.push_file(host_path, device_path, progress)
+                        )
+                    else:
+                        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+                        transferred.append(
+                            sync.pull_file(device_path, host_path, progress)
+                        )
+                        # Keep the modification time of the device, so the file
+                        # won't be copied again the next time.
+                        os.utime(host_path, (source[path].mtime, source[path].mtime))
+
+        if direction == "push":
+            # Delete the files in batches, to avoid too long command lines.
+            for index in range(0, len(deleted), 100):
+                self.shell(
+                    ["rm", "-f", "--"]
+                    + [
+                        shlex.quote(posixpath.join(device_dir, path))
+                        for path in deleted[index : index + 100]
+                    ],
+                    timeout=timeout,
+                    device=device,
+                )
         else:
-            pull_cmd.append(device_path)
+            for path in deleted:
+                os.remove(os.path.join(host_dir, *path.split("/")))
+
+        return DirectorySyncResult(transferred, unchanged, deleted)
 
-        pull_cmd.append(host_path)
+    def pull_tree(
+        self,
+        device_dir: str,
+        host_dir: str,
+        compress: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Copy the content of a directory from the Android device to the computer as a
+        single tar stream (much faster than pull_file for many small files). The
+        stream is extracted while it's received, nothing is stored on the device or
+        kept in memory.
+
+        :param device_dir: The directory on the Android device.
+        :param host_dir: The directory on the host computer where the content of
+                         device_dir should be copied (created if missing).
+        :param compress: When set to True, the stream is compressed (gzip) on the
+                         device (useful with slow connections).
+        :param include: If specified, only the files matching one of these patterns
+                        (e.g., *.jpg) are copied. A pattern matches the relative path
+                        or the name of a file.
+        :param exclude: The files and directories matching one of these patterns are
+                        not copied.
+        :param timeout: How many seconds to wait for the copy operation before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The relative paths of the files copied.
+        """
 
-        output: str = self.execute(pull_cmd, timeout=timeout)  # type: ignore[assignment]
+        validate_timeout(timeout)
 
-        # Make sure the pull operation ended successfully.
-        match = re.search(r"\d+ files? pulled[.,]", output.splitlines()[-1])
-        if match:
-            return output
+        os.makedirs(host_dir, exist_ok=True)
+        command = pull_tree_command(device_dir, compress, exclude)
+        with self._exec_channel(command, timeout, device) as channel:
+            extracted = extract_tree(ChannelReader(channel), host_dir, include, exclude)
+            # Read the end of the stream (and the exit code, if available).
+            read_output(channel)
+        return extracted
+
+    def push_tree(
+        self,
+        host_dir: str,
+        device_dir: str,
+        compress: bool = False,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Copy the content of a directory from the computer to the Android device as a
+        single tar stream, extracted on the device while it's received.
+
+        :param host_dir: The directory on the host computer.
+        :param device_dir: The directory on the Android device where the content of
+                           host_dir should be copied (created if missing).
+        :param compress: When set to True, the stream is compressed (gzip) on the
+                         computer.
+        :param include: If specified, only the files matching one of these patterns
+                        (e.g., *.jpg) are copied. A pattern matches the relative path
+                        or the name of a file.
+        :param exclude: The files and directories matching one of these patterns are
+                        not copied.
+        :param timeout: How many seconds to wait for the copy operation before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The relative paths of the files copied.
+        """
+
+        validate_timeout(timeout)
+
+        if not os.path.isdir(host_dir):
+            raise NotADirectoryError(
+                "The source host directory '{0}' was not found".format(host_dir)
+            )
+
+        command = push_tree_command(device_dir, compress)
+        with self._exec_channel(command, timeout, device, stdin=True) as channel:
+            added = create_tree(
+                ChannelWriter(channel), host_dir, compress, include, exclude
+            )
+            channel.close_stdin()
+            output = read_output(channel)
+            if output and self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "Tree extraction output: {0}".format(
+                        output.decode(errors="backslashreplace")  # type: ignore[union-attr]
+                    )
+                )
+        return added
+
+    def walk(
+        self,
+        device_path: str,
+        max_depth: Optional[int] = None,
+        device: Optional[str] = None,
+    ) -> Generator[RemoteEntry, None, None]:
+        """
+        Iterate over all the entries (files, directories and links) under a directory
+        of the Android device, with their modes, sizes and modification times. The
+        whole tree is listed by a single command, and the entries are returned while
+        they are received (a parent directory always comes before its content).
+
+        :param device_path: The directory on the Android device.
+        :param max_depth: If specified, the entries deeper than this level are not
+                          listed (1 for the content of the directory only).
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: An iterator over the entries (stopping the iteration stops the
+                 command).
+        """
+
+        with self.shell_stream(
+            [walk_command(device_path, max_depth)], device=device
+        ) as stream:
+            try:
+                yield from parse_walk_output(stream, device_path)
+            except subprocess.CalledProcessError as e:
+                if e.returncode == WALK_MISSING_EXIT_CODE:
+                    raise FileNotFoundError(
+                        "'{0}' was not found on the device".format(device_path)
+                    )
+                raise
+
+    def listdir(
+        self, device_path: str, device: Optional[str] = None
+    ) -> List[RemoteEntry]:
+        """
+        List the content of a directory of the Android device (not recursively).
+
+        :param device_path: The directory on the Android device.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The entries in the directory, with their modes, sizes and
+                 modification times.
+        """
+
+        return list(self.walk(device_path, max_depth=1, device=device))
+
+    def index(self, device_path: str, device: Optional[str] = None) -> RemoteIndex:
+        """
+        Index all the entries under a directory of the Android device, to be reused
+        later (e.g., to choose the files to pull, or to find the files changed since
+        a previous index) without listing the directory again.
+
+        :param device_path: The directory on the Android device.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :return: The index of the directory.
+        """
+
+        return RemoteIndex(device_path, self.walk(device_path, device=device))
+
+    def _identical_packages(
+        self,
+        groups: List[List[ApkInfo]],
+        timeout: Optional[int],
+        device: Optional[str],
+    ) -> Set[str]:
+        """
+        Get the packages already installed on the device with the same apk files
+        (each group contains the base apk and the split apks of a package). The
+        installed files are hashed on the device only when they changed since the
+        last time they were found identical.
+        """
+
+        key = device or self.target_device or ""
+
+        output: str = self.shell(
+            [installed_apks_command([apks[0].package for apks in groups])],
+            timeout=timeout,
+            device=device,
+        )  # type: ignore[assignment]
+        installed = parse_installed_apks(output)
+
+        identical = set()
+        to_check = []
+        for apks in groups:
+            files = installed.get(apks[0].package, [])
+            if sorted(f.size for f in files) != sorted(apk.size for apk in apks):
+                continue
+            if self.install_cache.is_known(key, apks, files):
+                identical.add(apks[0].package)
+            else:
+                to_check.append((apks, files))
+
+        if to_check:
+            output = self.shell(
+                ["md5sum"]
+                + [shlex.quote(f.path) for _, files in to_check for f in files]
+                + ["2>/dev/null", "||", "true"],
+                timeout=timeout,
+                device=device,
+            )  # type: ignore[assignment]
+            hashes = {}
+            for line in output.splitlines():
+                tokens = line.split(None, 1)
+                if len(tokens) == 2:
+                    hashes[tokens[1].strip()] = tokens[0]
+            for apks, files in to_check:
+                if sorted(hashes.get(f.path, "") for f in files) == sorted(
+                    apk.md5 for apk in apks
+                ):
+                    identical.add(apks[0].package)
+                    self.install_cache.remember(key, apks, files)
+
+        return identical
+
+    def _stream_apk(
+        self,
+        command: List[str],
+        apk_path: str,
+        timeout: Optional[int],
+        device: Optional[str],
+        progress: Optional[ProgressCallback],
+    ) -> str:
+        """
+        Run a package manager command reading an apk file from its standard input,
+        and send the content of the file directly from the host computer.
+        """
+
+        size = os.path.getsize(apk_path)
+        with self._exec_channel(command, timeout, device, stdin=True) as channel:
+            transferred = 0
+            with open(apk_path, "rb") as apk_file:
+                for chunk in iter(lambda: apk_file.read(SYNC_DATA_MAX), b""):
+                    channel.write(chunk)
+                    transferred += len(chunk)
+                    if progress:
+                        progress(apk_path, transferred, size)
+            channel.close_stdin()
+            output: bytes = read_output(channel)  # type: ignore[assignment]
+        return output.strip().decode(errors="backslashreplace")
+
+    def _stream_install(
+        self,
+        apk_paths: List[str],
+        flags: List[str],
+        timeout: Optional[int],
+        device: Optional[str],
+        progress: Optional[ProgressCallback],
+    ) -> str:
+        """
+        Install the apk files of a package by writing them directly into an install
+        session of the package manager, without copying them on the device first.
+        """
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Streaming installation of {0}".format(", ".join(apk_paths))
+            )
+
+        if len(apk_paths) == 1:
+            return self._stream_apk(
+                streamed_install_command(os.path.getsize(apk_paths[0]), flags),
+                apk_paths[0],
+                timeout,
+                device,
+                progress,
+            )
+
+        # Split apks: all the files are written into the same session.
+        total_size = sum(os.path.getsize(apk_path) for apk_path in apk_paths)
+        output: str = self.shell(
+            ["cmd", "package", "install-create"] + flags + ["-S", str(total_size)],
+            timeout=timeout,
+            device=device,
+        )  # type: ignore[assignment]
+        session_id = parse_install_session(output)
+        try:
+            for index, apk_path in enumerate(apk_paths):
+                output = self._stream_apk(
+                    install_write_command(
+                        session_id,
+                        os.path.getsize(apk_path),
+                        "{0}_{1}".format(index, os.path.basename(apk_path)),
+                    ),
+                    apk_path,
+                    timeout,
+                    device,
+                    progress,
+                )
+                check_install_output(output)
+            return self.shell(
+                ["cmd", "package", "install-commit", session_id],
+                timeout=timeout,
+                device=device,
+            )  # type: ignore[return-value]
+        except BaseException:
+            try:
+                self.shell(
+                    ["cmd", "package", "install-abandon", session_id],
+                    timeout=timeout,
+                    device=device,
+                )
+            except Exception:
+                # The original error is more interesting.
+                pass
+            raise
+
+    def _install(
+        self,
+        groups: List[List[str]],
+        replace_existing: bool,
+        grant_permissions: bool,
+        timeout: Optional[int],
+        device: Optional[str],
+        skip_identical: bool,
+        streamed: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        parse_manifests: bool = True,
+    ) -> List[InstallResult]:
+        """
+        Install one or more packages (each group contains the base apk and the split
+        apks of a package) with a single install command. The manifests of the apk
+        files are parsed only with skip_identical or parse_manifests (to report
+        the package names), otherwise the packages are unknown.
+        """
+
+        infos = []
+        for group in groups:
+            apks = []
+            for apk_path in group:
+                check_apk_path(apk_path)
+                try:
+                    if skip_identical:
+                        apks.append(self.install_cache.apk_info(apk_path))
+                    elif parse_manifests:
+                        apks.append(
+                            ApkInfo(
+                                apk_path,
+                                *parse_apk_manifest(apk_path),
+                                os.path.getsize(apk_path),
+                                "",
+                            )
+                        )
+                    else:
+                        apks.append(ApkInfo(apk_path, "", 0, -1, ""))
+                except ValueError as e:
+                    # Let adb report the invalid apk file (the package is unknown,
+                    # so it's always installed).
+                    if skip_identical:
+                        self.logger.warning(str(e))
+                    else:
+                        self.logger.debug(str(e))
+                    apks.append(ApkInfo(apk_path, "", 0, -1, ""))
+            infos.append(apks)
+
+        known = [apks for apks in infos if all(apk.package for apk in apks)]
+        identical = (
+            self._identical_packages(known, timeout, device)
+            if skip_identical and known
+            else set()
+        )
+
+        results = [
+            InstallResult(apks[0].package, apks[0].version_code, True, "")
+            for apks in infos
+            if apks[0].package in identical
+        ]
+        remaining = [
+            (group, apks)
+            for group, apks in zip(groups, infos)
+            if apks[0].package not in identical
+        ]
+        for result in results:
+            self.logger.debug(
+                "Skipping the installation of {0} (version code {1}), already "
+                "installed".format(result.package, result.version_code)
+            )
+        if not remaining:
+            return results
+
+        apk_paths = [path for group, _ in remaining for path in group]
+        grant_permissions = (
+            grant_permissions
+            and self.get_device_sdk_version(device=device)
+            >= RUNTIME_PERMISSIONS_SDK_VERSION
+        )
+
+        # The package manager command is available since Android 7 (cmd feature).
+        # More packages still use adb install-multi-package, the only way to
+        # install them atomically.
+        if (
+            streamed
+            and len(remaining) == 1
+            and "cmd" in self.get_features(timeout=timeout, device=device)
+        ):
+            output = self._stream_install(
+                apk_paths,
+                install_flags(replace_existing, grant_permissions),
+                timeout,
+                device,
+                progress,
+            )
         else:
-            raise RuntimeError("Something went wrong during the file pull operation")
+            if streamed:
+                self.logger.debug(
+                    "Streamed installation not available, using adb install"
+                )
+            install_cmd = install_command(
+                apk_paths if len(apk_paths) > 1 else apk_paths[0],
+                replace_existing=replace_existing,
+                grant_permissions=grant_permissions,
+                multi_package=len(remaining) > 1,
+            )
+            output = self.execute(install_cmd, timeout=timeout, device=device)  # type: ignore[assignment]
+        check_install_output(output)
+
+        # Keep the package index (if loaded) up to date.
+        names = [apks[0].package for _, apks in remaining]
+        if all(names):
+            self.packages.refresh(names, device, timeout)
+        else:
+            self.packages.invalidate(device or self.target_device)
+        self._invalidate_queries(device or self.target_device)
+
+        if skip_identical:
+            # Remember the installed files, so that the next time they are not
+            # hashed again on the device.
+            installed = parse_installed_apks(
+                self.shell(
+                    [
+                        installed_apks_command(
+                            [apks[0].package for _, apks in remaining]
+                        )
+                    ],
+                    timeout=timeout,
+                    device=device,
+                )  # type: ignore[arg-type]
+            )
+            for _, apks in remaining:
+                files = installed.get(apks[0].package, [])
+                if sorted(f.size for f in files) == sorted(apk.size for apk in apks):
+                    self.install_cache.remember(
+                        device or self.target_device or "", apks, files
+                    )
+
+        return results + [
+            InstallResult(apks[0].package, apks[0].version_code, False, output)
+            for _, apks in remaining
+        ]
 
     def install_app(
         self,
@@ -452,6 +2217,10 @@ class ADB:
         replace_existing: bool = False,
         grant_permissions: bool = False,
         timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        skip_identical: bool = False,
+        streamed: bool = False,
+        progress: Optional[ProgressCallback] = None,
     ):
         """
         Install an application into the Android device.
@@ -465,58 +2234,170 @@ class ADB:
                                   application will be granted.
         :param timeout: How many seconds to wait for the installation operation before
                         throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param skip_identical: When set to True, the application is not installed
+                               if the device already has exactly the same apk file
+                               (compared by md5 hash, see install_cache).
+        :param streamed: When set to True (and if supported by the device), the apk
+                         file is written directly into the package manager (cmd
+                         package install -S), without copying it on the device
+                         first. Otherwise, adb install is used.
+        :param progress: Function called with the path of the apk file, the bytes
+                         sent so far and the size of the file, after every chunk
+                         sent (only for streamed installations).
         :return: The string with the result of the installation operation.
         """
 
-        # Make sure the application to install is an existing file on the host computer.
-        if not os.path.isfile(apk_path):
-            raise FileNotFoundError("'{0}' apk file was not found".format(apk_path))
+        # The package name is only needed to skip the identical apk files, or to
+        # keep the package index up to date.
+        result = self._install(
+            [[apk_path]],
+            replace_existing,
+            grant_permissions,
+            timeout,
+            device,
+            skip_identical,
+            streamed,
+            progress,
+            parse_manifests=self.packages.is_loaded(device),
+        )[0]
+        if result.skipped:
+            return "Skipped: {0} (version code {1}) is already installed".format(
+                result.package, result.version_code
+            )
+        return result.output
 
-        install_cmd = ["install"]
+    def install_multiple(
+        self,
+        apk_paths: List[str],
+        replace_existing: bool = False,
+        grant_permissions: bool = False,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        skip_identical: bool = False,
+        streamed: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> InstallResult:
+        """
+        Install an application made of more apk files (the base apk and its split
+        apks) into the Android device, with a single installation session.
 
-        # Additional installation flags.
-        if replace_existing:
-            install_cmd.append("-r")
-        if grant_permissions and self.get_device_sdk_version() >= 23:
-            # Runtime permissions exist since SDK version 23 (Android Marshmallow).
-            install_cmd.append("-g")
+        :param apk_paths: The paths on the host computer of the apk files of the
+                          application (the base apk first).
+        :param replace_existing: When set to True, any old version of the application
+                                 installed on the Android device will be replaced by
+                                 the new application being installed.
+        :param grant_permissions: When set to True, all the runtime permissions of the
+                                  application will be granted.
+        :param timeout: How many seconds to wait for the installation operation before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param skip_identical: When set to True, the application is not installed
+                               if the device already has exactly the same apk files.
+        :param streamed: When set to True (and if supported by the device), the apk
+                         files are written directly into an install session of the
+                         package manager, without copying them on the device first.
+                         Otherwise, adb install-multiple is used.
+        :param progress: Function called with the path of the apk file, the bytes
+                         sent so far and the size of the file, after every chunk
+                         sent (only for streamed installations).
+        :return: The result of the installation.
+        """
 
-        install_cmd.append(apk_path)
+        if not apk_paths:
+            raise ValueError("At least one apk file is needed")
+
+        return self._install(
+            [list(apk_paths)],
+            replace_existing,
+            grant_permissions,
+            timeout,
+            device,
+            skip_identical,
+            streamed,
+            progress,
+        )[0]
+
+    def install_packages(
+        self,
+        apk_paths: List[str],
+        replace_existing: bool = False,
+        grant_permissions: bool = False,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+        skip_identical: bool = False,
+        streamed: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[InstallResult]:
+        """
+        Install more applications (e.g., an application and its test application)
+        into the Android device atomically, with a single installation session: if
+        an application fails, none of them is installed.
 
-        output: str = self.execute(install_cmd, timeout=timeout)  # type: ignore[assignment]
+        :param apk_paths: The paths on the host computer of the apk files (one for
+                          each application).
+        :param replace_existing: When set to True, any old version of the applications
+                                 installed on the Android device will be replaced by
+                                 the new applications being installed.
+        :param grant_permissions: When set to True, all the runtime permissions of the
+                                  applications will be granted.
+        :param timeout: How many seconds to wait for the installation operation before
+                        throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
+        :param skip_identical: When set to True, the applications already installed
+                               with exactly the same apk file are skipped (the other
+                               ones are still installed together).
+        :param streamed: When set to True (and if supported by the device), a single
+                         application left to install is written directly into the
+                         package manager. More applications are always installed with
+                         adb install-multi-package (to keep the installation atomic).
+        :param progress: Function called with the path of the apk file, the bytes
+                         sent so far and the size of the file, after every chunk
+                         sent (only for streamed installations).
+        :return: The result of the installation of each application (the skipped
+                 applications first).
+        """
 
-        # Make sure the installation operation ended successfully.
-        # Complete list of error messages:
-        # https://android.googlesource.com/platform/frameworks/base/+/lollipop-release/core/java/android/content/pm/PackageManager.java
-        match = re.search(r"Failure \[.+?\]", output, flags=re.IGNORECASE)
-        if not match:
-            return output
-        else:
-            raise RuntimeError(
-                "Application installation failed: {0}".format(match.group())
-            )
+        if not apk_paths:
+            raise ValueError("At least one apk file is needed")
+
+        return self._install(
+            [[apk_path] for apk_path in apk_paths],
+            replace_existing,
+            grant_permissions,
+            timeout,
+            device,
+            skip_identical,
+            streamed,
+            progress,
+        )
 
-    def uninstall_app(self, package_name: str, timeout: Optional[int] = None):
+    def uninstall_app(
+        self,
+        package_name: str,
+        timeout: Optional[int] = None,
+        device: Optional[str] = None,
+    ):
         """
         Uninstall an application from the Android device.
 
         :param package_name: The package name of the application to uninstall.
         :param timeout: How many seconds to wait for the uninstallation operation before
                         throwing an exception.
+        :param device: The serial number of the device for this command only. If
+                       None, the target device of this ADB instance is used.
         :return: The string with the result of the uninstallation operation.
         """
 
         uninstall_cmd = ["uninstall", package_name]
 
-        output: str = self.execute(uninstall_cmd, timeout=timeout)  # type: ignore[assignment]
+        output: str = self.execute(uninstall_cmd, timeout=timeout, device=device)  # type: ignore[assignment]
 
-        # Make sure the uninstallation operation ended successfully.
-        # Complete list of error messages:
-        # https://android.googlesource.com/platform/frameworks/base/+/lollipop-release/core/java/android/content/pm/PackageManager.java
-        match = re.search(
-            r"(Failure \[.+?\])|(Unknown package: .+?)", output, flags=re.IGNORECASE
-        )
-        if not match:
-            return output
-        else:
-            raise RuntimeError("Application removal failed: {0}".format(match.group()))
+        check_uninstall_output(output)
+        self.packages.remove(package_name, device)
+        self._invalidate_queries(device or self.target_device)
+
+        return output
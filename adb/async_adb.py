@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import subprocess
+from typing import Callable, List, Optional, Set, Union
+
+from .commands import (
+    RUNTIME_PERMISSIONS_SDK_VERSION,
+    check_apk_path,
+    check_connect_output,
+    check_install_output,
+    check_pull_output,
+    check_push_output,
+    check_remount_output,
+    check_uninstall_output,
+    connect_command,
+    install_command,
+    parse_devices,
+    parse_version,
+    pull_command,
+    push_command,
+    validate_command,
+    validate_timeout,
+)
+from .settle import (
+    STATE_QUERY_TIMEOUT,
+    PollDeadline,
+    is_offline,
+    is_online,
+    settle_timeout,
+)
+
+
+class AsyncADB:
+    def __init__(self, device: Optional[str] = None, debug: bool = False):
+        """
+        Asynchronous (asyncio) Android Debug Bridge (adb) object constructor. The
+        methods of this class are coroutines with the same parameters and results as
+        the corresponding methods of ADB class. When a command times out or the
+        coroutine is cancelled, the adb process is killed.
+
+        :param device: The name of the Android device (serial number) for which to
+                       execute adb commands. Can be omitted if there is only one
+                       Android device connected to adb.
+        :param debug: When set to True, more debug messages will be shown for each
+                      executed operation.
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self._device = device
+
+        # Keep a reference to the tasks reaping the processes running in background.
+        self._background_tasks: Set[asyncio.Future] = set()
+
+        if debug:
+            self.logger.setLevel(logging.DEBUG)
+
+        # If adb executable is not added to PATH variable, it can be specified by
+        # using the ADB_PATH environment variable.
+        self.adb_path: str = os.environ.get("ADB_PATH", "adb")
+
+        # Make sure to use the full path of the executable (needed for cross-platform
+        # compatibility).
+        self.adb_path = shutil.which(self.adb_path)  # type: ignore
+
+        if not self.is_available():
+            raise FileNotFoundError(
+                "Adb executable is not available! Make sure to have adb (Android "
+                "Debug Bridge) installed and added to the PATH variable, or specify "
+                "the adb path by using the ADB_PATH environment variable."
+            )
+
+    @property
+    def target_device(self) -> Optional[str]:
+        return self._device
+
+    @target_device.setter
+    def target_device(self, new_device: str):
+        self._device = new_device
+
+    def is_available(self) -> bool:
+        """
+        Check if adb executable is available.
+
+        :return: True if abd executable is available for usage, False otherwise.
+        """
+
+        return self.adb_path is not None
+
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process) -> None:
+        if process.returncode is None:
+            try:
+                if os.name == "posix":
+                    # Kill also the processes started by adb (if any), otherwise
+                    # they would keep the output pipe open.
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    async def execute(
+        self, command: List[str], is_async: bool = False, timeout: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Execute an adb command and return the output of the command as a string.
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param is_async: When set to True, the adb command will run in background and
+                         the coroutine will return immediately. If False (default),
+                         the coroutine will wait until the adb command returns a
+                         result.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before killing the adb process and throwing an exception.
+        :return: The (string) output of the command. If the method is called with the
+                 parameter is_async = True, None will be returned.
+        """
+
+        validate_command(command)
+        validate_timeout(timeout, is_async)
+
+        # Use the specified Android device serial number (if any).
+        full_command = [self.adb_path]
+        if self.target_device:
+            full_command.extend(["-s", self.target_device])
+        full_command.extend(command)
+
+        try:
+            self.logger.debug(
+                "Running command `{0}` (async={1}, timeout={2})".format(
+                    " ".join(full_command), is_async, timeout
+                )
+            )
+
+            if is_async:
+                # Adb command will run in background, nothing to return.
+                background = await asyncio.create_subprocess_exec(*full_command)
+                task = asyncio.ensure_future(background.wait())
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+                return None
+
+            process = await asyncio.create_subprocess_exec(
+                *full_command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=os.name == "posix",
+            )
+            try:
+                raw_output, _ = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(process)
+                raise subprocess.TimeoutExpired(full_command, timeout)  # type: ignore[arg-type]
+            except asyncio.CancelledError:
+                await self._kill(process)
+                raise
+
+            output = raw_output.strip().decode(errors="backslashreplace")
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    process.returncode,  # type: ignore[arg-type]
+                    full_command,
+                    output.encode(),
+                )
+            self.logger.debug(
+                "Command `{0}` successfully returned: {1}".format(
+                    " ".join(full_command), output
+                )
+            )
+
+            return output
+        except subprocess.TimeoutExpired as e:
+            self.logger.error(
+                "Command `{0}` timed out: {1}".format(" ".join(full_command), e)
+            )
+            raise
+        except subprocess.CalledProcessError as e:
+            self.logger.error(
+                "Command `{0}` exited with error: {1}".format(
+                    " ".join(full_command),
+                    e.output.decode(errors="backslashreplace") if e.output else e,
+                )
+            )
+            raise
+        except asyncio.CancelledError:
+            self.logger.debug("Command `{0}` cancelled".format(" ".join(full_command)))
+            raise
+        except Exception as e:
+            self.logger.error(
+                "Generic error during `{0}` command execution: {1}".format(
+                    " ".join(full_command), e
+                )
+            )
+            raise
+
+    async def get_state(self, timeout: Optional[float] = None) -> str:
+        """
+        Get the state of the Android device (e.g., device, offline, recovery). This
+        coroutine is used to poll the device (e.g., while it reboots), so the
+        failures are expected and not logged as errors.
+
+        :param timeout: How many seconds to wait for the state before considering
+                        the device not available.
+        :return: The state of the device, an empty string if the device is not
+                 available.
+        """
+
+        full_command = [self.adb_path]
+        if self.target_device:
+            full_command.extend(["-s", self.target_device])
+        full_command.append("get-state")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *full_command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=os.name == "posix",
+            )
+        except OSError as e:
+            # E.g., the adb executable was removed (as ADB.get_state).
+            self.logger.debug("Device state not available: {0}".format(e))
+            return ""
+        try:
+            raw_output, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            await self._kill(process)
+            return ""
+        except asyncio.CancelledError:
+            await self._kill(process)
+            raise
+        if process.returncode != 0:
+            return ""
+        return raw_output.strip().decode(errors="backslashreplace")
+
+    async def _wait_for_state(
+        self,
+        command: List[str],
+        check: Callable[[str], bool],
+        timeout: Optional[float] = None,
+        interval: float = 0.2,
+    ) -> None:
+        """
+        Poll the state of the device until the check succeeds (asynchronous
+        counterpart of settle.PollUntil policy, with the same deadline).
+        """
+
+        deadline = PollDeadline(command, settle_timeout(None, timeout))
+        while not check(await self.get_state(STATE_QUERY_TIMEOUT)):
+            deadline.check()
+            await asyncio.sleep(interval)
+
+    async def get_version(self, timeout: Optional[int] = None) -> str:
+        """
+        Get the version of the installed adb.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: A string containing the version of the installed adb.
+        """
+
+        output: str = await self.execute(["version"], timeout=timeout)  # type: ignore[assignment]
+
+        return parse_version(output)
+
+    async def get_available_devices(self, timeout: Optional[int] = None) -> List[str]:
+        """
+        Get a list with the serials of the devices currently connected to adb.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: A list of strings, each string is a device serial number.
+        """
+
+        output: str = await self.execute(["devices"], timeout=timeout)  # type: ignore[assignment]
+
+        return parse_devices(output)
+
+    async def shell(
+        self, command: List[str], is_async: bool = False, timeout: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Execute an adb shell command on the Android device connected through adb and
+        return the output of the command as a string.
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param is_async: When set to True, the adb shell command will run in background
+                         and the coroutine will return immediately.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: The (string) output of the command. If the method is called with the
+                 parameter is_async = True, None will be returned.
+        """
+
+        validate_command(command)
+
+        return await self.execute(
+            ["shell"] + command, is_async=is_async, timeout=timeout
+        )
+
+    async def get_property(
+        self, property_name: str, timeout: Optional[int] = None
+    ) -> str:
+        """
+        Get the value of a property on the Android device connected through adb.
+
+        :param property_name: The name of the property.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: The value of the property.
+        """
+
+        property: str = await self.shell(["getprop", property_name], timeout=timeout)  # type: ignore[assignment]
+        return property
+
+    async def get_device_sdk_version(self, timeout: Optional[int] = None) -> int:
+        """
+        Get the version of the SDK installed on the Android device (e.g., 23 for
+        Android Marshmallow).
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: An int with the version number.
+        """
+
+        return int(await self.get_property("ro.build.version.sdk", timeout=timeout))
+
+    async def wait_for_device(self, timeout: Optional[int] = None) -> None:
+        """
+        Wait until the Android device connected through adb is ready to receive
+        commands.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        """
+
+        await self.execute(["wait-for-device"], timeout=timeout)
+
+    async def kill_server(self, timeout: Optional[int] = None) -> None:
+        """
+        Kill the adb server if it is running.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        """
+
+        await self.execute(["kill-server"], timeout=timeout)
+
+    async def connect(
+        self, host: Optional[str] = None, timeout: Optional[int] = None
+    ) -> str:
+        """
+        Start an adb server and (optionally) connect to an Android device.
+
+        :param host: (Optional) Host address of the Android device (in host[:port]
+                     format).
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: The string with the result of the connect operation.
+        """
+
+        output: str = await self.execute(connect_command(host), timeout=timeout)  # type: ignore[assignment]
+
+        return check_connect_output(output)
+
+    async def remount(self, timeout: Optional[int] = None) -> str:
+        """
+        Remount system partitions in writable mode (system partitions are read-only by
+        default). This command needs adb with root privileges. The coroutine returns
+        when the device is ready to receive commands again.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        :return: The string with the result of the remount operation.
+        """
+
+        output = await self.execute(["remount"], timeout=timeout)
+
+        await self._wait_for_state(["remount"], is_online, timeout)
+
+        return check_remount_output(output)
+
+    async def reboot(self, timeout: Optional[int] = None) -> str:
+        """
+        Reboot the Android device connected through adb. The coroutine returns when
+        the device goes offline.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception.
+        """
+
+        output: str = await self.execute(["reboot"], timeout=timeout)  # type: ignore[assignment]
+
+        await self._wait_for_state(["reboot"], is_offline, timeout)
+
+        return output
+
+    async def push_file(
+        self,
+        host_path: Union[str, List[str]],
+        device_path: str,
+        timeout: Optional[int] = None,
+    ) -> str:
+        """
+        Copy a file (or a list of files) from the computer to the Android device
+        connected through adb.
+
+        :param host_path: The path of the file on the host computer. This parameter
+                          also accepts a list of paths (strings) to copy more files
+                          at the same time.
+        :param device_path: The path on the Android device where the file(s) should
+                            be copied.
+        :param timeout: How many seconds to wait for the file copy operation before
+                        throwing an exception.
+        :return: The string with the result of the copy operation.
+        """
+
+        push_cmd = push_command(host_path, device_path)
+
+        output: str = await self.execute(push_cmd, timeout=timeout)  # type: ignore[assignment]
+
+        return check_push_output(output)
+
+    async def pull_file(
+        self,
+        device_path: Union[str, List[str]],
+        host_path: str,
+        timeout: Optional[int] = None,
+    ) -> str:
+        """
+        Copy a file (or a list of files) from the Android device to the computer
+        connected through adb.
+
+        :param device_path: The path of the file on the Android device. This parameter
+                            also accepts a list of paths (strings) to copy more files
+                            at the same time.
+        :param host_path: The path on the host computer where the file(s) should be
+                          copied. If multiple files are copied at the same time, this
+                          path should refer to an existing directory on the host.
+        :param timeout: How many seconds to wait for the file copy operation before
+                        throwing an exception.
+        :return: The string with the result of the copy operation.
+        """
+
+        pull_cmd = pull_command(device_path, host_path)
+
+        output: str = await self.execute(pull_cmd, timeout=timeout)  # type: ignore[assignment]
+
+        return check_pull_output(output)
+
+    async def install_app(
+        self,
+        apk_path: str,
+        replace_existing: bool = False,
+        grant_permissions: bool = False,
+        timeout: Optional[int] = None,
+    ):
+        """
+        Install an application into the Android device.
+
+        :param apk_path: The path on the host computer to the application file to be
+                         installed.
+        :param replace_existing: When set to True, any old version of the application
+                                 installed on the Android device will be replaced by
+                                 the new application being installed.
+        :param grant_permissions: When set to True, all the runtime permissions of the
+                                  application will be granted.
+        :param timeout: How many seconds to wait for the installation operation before
+                        throwing an exception.
+        :return: The string with the result of the installation operation.
+        """
+
+        check_apk_path(apk_path)
+
+        install_cmd = install_command(
+            apk_path,
+            replace_existing=replace_existing,
+            grant_permissions=grant_permissions
+            and await self.get_device_sdk_version() >= RUNTIME_PERMISSIONS_SDK_VERSION,
+        )
+
+        output: str = await self.execute(install_cmd, timeout=timeout)  # type: ignore[assignment]
+
+        return check_install_output(output)
+
+    async def uninstall_app(self, package_name: str, timeout: Optional[int] = None):
+        """
+        Uninstall an application from the Android device.
+
+        :param package_name: The package name of the application to uninstall.
+        :param timeout: How many seconds to wait for the uninstallation operation before
+                        throwing an exception.
+        :return: The string with the result of the uninstallation operation.
+        """
+
+        uninstall_cmd = ["uninstall", package_name]
+
+        output: str = await self.execute(uninstall_cmd, timeout=timeout)  # type: ignore[assignment]
+
+        return check_uninstall_output(output)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Execution of many small shell commands with a single shell invocation (see
+# ADB.shell_batch).
+
+import re
+import shlex
+import uuid
+from typing import List, NamedTuple
+
+# Maximum length of a shell command accepted by every device (older devices don't
+# accept more than 4096 bytes, including the name of the shell service).
+BATCH_MAX_LENGTH = 4000
+
+# Shell function running a command (in its own shell, so that it can't affect the
+# next commands) and printing a line with the marker, the index of the command, its
+# exit code and the uptime of the device before and after the command.
+_BATCH_FUNCTION = (
+    '_b() {{ read s _ </proc/uptime; sh -c "$2" </dev/null 2>&1; r=$?; '
+    "read e _ </proc/uptime; printf '\\n{0} %s %d %s %s\\n' \"$1\" $r $s $e; }}"
+)
+
+
+class ShellResult(NamedTuple):
+    command: List[str]
+    # The output of the command (stdout and stderr).
+    output: str
+    exit_code: int
+    # The execution time (in seconds, measured on the device with a resolution of
+    # 10 milliseconds).
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+def new_marker() -> str:
+    # Random marker, that can't be printed by the commands by chance.
+    return "batch-{0}".format(uuid.uuid4().hex)
+
+
+def batch_scripts(
+    commands: List[List[str]], marker: str, max_length: int = BATCH_MAX_LENGTH
+) -> List[str]:
+    """
+    Create the shell scripts running the commands, each script no longer than
+    max_length (unless a single command is longer).
+
+    :param commands: The commands, each one formatted as a list of strings (as for
+                     ADB.shell method).
+    :param marker: The marker separating the output of the commands.
+    :param max_length: The maximum length of each script.
+    :return: The scripts, to be executed in order.
+    """
+
+    function = _BATCH_FUNCTION.format(marker)
+    scripts = []
+    script = function
+    for index, command in enumerate(commands):
+        call = "; _b {0} {1}".format(index, shlex.quote(" ".join(command)))
+        if script != function and len(script) + len(call) > max_length:
+            scripts.append(script)
+            script = function
+        script += call
+    if script != function:
+        scripts.append(script)
+    return scripts
+
+
+def parse_batch_output(
+    output: str, commands: List[List[str]], marker: str
+) -> List[ShellResult]:
+    """
+    Split the output of the batch scripts into the results of the commands.
+
+    :return: The results of the commands executed (in order), a command without
+             result was never executed.
+    """
+
+    # The output could be stripped (e.g., when the first command prints nothing,
+    # the output starts with the marker) and could use CRLF line endings.
+    parts = re.split(
+        r"(?:^|\r?\n){0} (\d+) (-?\d+) ([\d.]+) ([\d.]+)(?=\r?\n|$)".format(
+            re.escape(marker)
+        ),
+        output,
+    )
+    results = []
+    # Output, index, exit code, start and end of every command (the last part is
+    # the output after the last command).
+    for position in range(0, len(parts) - 1, 5):
+        index = int(parts[position + 1])
+        results.append(
+            ShellResult(
+                commands[index],
+                parts[position].strip(),
+                int(parts[position + 2]),
+                round(float(parts[position + 4]) - float(parts[position + 3]), 2),
+            )
+        )
+    return results
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+# Byte channels connected to a command running on the device, either through an
+# adb process or directly through the adb server (native backend).
+
+import subprocess
+import threading
+from typing import Any, List, Optional, Union
+
+from .protocol import SHELL_ID_CLOSE_STDIN, SHELL_ID_EXIT, SHELL_ID_STDIN, AdbConnection
+
+
+class ProcessChannel:
+    def __init__(
+        self, command: List[str], stdin: bool = False, merge_stderr: bool = True
+    ):
+        """
+        Channel connected to the output (stdout and stderr) of an adb process.
+
+        :param command: The full command to execute (adb executable included).
+        :param stdin: When set to True, data can be written to the standard input
+                      of the process.
+        :param merge_stderr: When set to False, stderr is not part of the output of
+                             the channel, and it's collected separately (see
+                             stderr property).
+        """
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        )
+
+        self._stderr = bytearray()
+        self._stderr_reader = None
+        if not merge_stderr:
+            # Read stderr in background, otherwise the process could block when the
+            # pipe is full.
+            self._stderr_reader = threading.Thread(
+                target=lambda: self._stderr.extend(self.process.stderr.read()),  # type: ignore[union-attr]
+                daemon=True,
+            )
+            self._stderr_reader.start()
+
+    @property
+    def stderr(self) -> bytes:
+        """
+        The stderr of the process (only when not merged with the output), complete
+        once the process terminated.
+        """
+
+        if self._stderr_reader is not None and self.process.poll() is not None:
+            self._stderr_reader.join()
+        return bytes(self._stderr)
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.poll()
+
+    def write(self, data: bytes) -> None:
+        self.process.stdin.write(data)  # type: ignore[union-attr]
+        self.process.stdin.flush()  # type: ignore[union-attr]
+
+    def close_stdin(self) -> None:
+        """
+        Signal the end of the input (the command receives EOF).
+        """
+
+        self.process.stdin.close()  # type: ignore[union-attr]
+
+    def read(self, size: int = 65536) -> bytes:
+        """
+        Read at most size bytes, as soon as they are available. An empty result
+        means the end of the output.
+        """
+
+        return self.process.stdout.read1(size)  # type: ignore[union-attr]
+
+    def readinto(self, buffer) -> int:
+        """
+        Read the output directly into a writable buffer, until the buffer is full
+        or the output ends. A result of 0 means the end of the output.
+        """
+
+        return self.process.stdout.readinto(buffer)  # type: ignore[union-attr]
+
+    def wait(self) -> None:
+        self.process.wait()
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process.wait()
+        if self._stderr_reader is not None:
+            self._stderr_reader.join()
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            if pipe:
+                pipe.close()
+
+
+class SocketChannel:
+    def __init__(self, connection: AdbConnection, shell_v2: bool = False):
+        """
+        Channel connected to a device service opened through the adb server.
+
+        :param connection: The connection with the device service.
+        :param shell_v2: When set to True, the data is exchanged with the shell
+                         protocol (shell,v2).
+        """
+
+        self.connection = connection
+        self.shell_v2 = shell_v2
+        self._returncode: Optional[int] = None
+        self._finished = False
+        self._pending = b""
+
+    @property
+    def stderr(self) -> bytes:
+        # stderr is merged with the output by the device.
+        return b""
+
+    @property
+    def returncode(self) -> Optional[int]:
+        # Without the shell protocol the exit code is not available.
+        if self._finished and self._returncode is None:
+            return 0
+        return self._returncode
+
+    def write(self, data: bytes) -> None:
+        if self.shell_v2:
+            self.connection.send_shell_packet(SHELL_ID_STDIN, data)
+        else:
+            self.connection.sendall(data)
+
+    def close_stdin(self) -> None:
+        """
+        Signal the end of the input (the command receives EOF).
+        """
+
+        if self.shell_v2:
+            self.connection.send_shell_packet(SHELL_ID_CLOSE_STDIN)
+        else:
+            self.connection.shutdown_write()
+
+    def read(self, size: int = 65536) -> bytes:
+        """
+        Read the available output (both stdout and stderr). An empty result means
+        the end of the output.
+        """
+
+        if self._finished:
+            return b""
+        if not self.shell_v2:
+            data = self.connection.recv(size)
+            self._finished = not data
+            return data
+        while True:
+            packet = self.connection.read_shell_packet()
+            if packet is None:
+                self._finished = True
+                return b""
+            if packet[0] == SHELL_ID_EXIT:
+                self._returncode = packet[1][0]
+                self._finished = True
+                return b""
+            if packet[1]:
+                return packet[1]
+
+    def readinto(self, buffer) -> int:
+        """
+        Read the output directly into a writable buffer. A result of 0 means the end
+        of the output.
+        """
+
+        if not self.shell_v2:
+            if self._finished:
+                return 0
+            size = self.connection.recv_into(buffer)
+            self._finished = not size
+            return size
+
+        # With the shell protocol, the output is received in packets.
+        if not self._pending:
+            self._pending = self.read()
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def wait(self) -> None:
+        # The exit code (if any) is received before the end of the output.
+        pass
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def read_output(
+    channel: Union[ProcessChannel, SocketChannel],
+    output: Any = None,
+    chunk_size: int = 1024 * 1024,
+) -> Union[bytes, int]:
+    """
+    Read the whole output of a channel without decoding it.
+
+    :param channel: The channel to read.
+    :param output: Where to store the output: if None, the output is returned as
+                   bytes. If it's an object with a write method (e.g., a file opened
+                   in binary mode), the output is written into it in chunks. Any
+                   other writable buffer (e.g., bytearray, memoryview) is filled
+                   directly with the output.
+    :param chunk_size: The size (in bytes) of the chunks written into output.
+    :return: The output as bytes if output is None, otherwise the number of bytes
+             stored into output.
+    """
+
+    if output is None:
+        data = bytearray()
+        for chunk in iter(lambda: channel.read(chunk_size), b""):
+            data.extend(chunk)
+        return bytes(data)
+
+    if hasattr(output, "write"):
+        total = 0
+        view = memoryview(bytearray(chunk_size))
+        while True:
+            size = channel.readinto(view)
+            if not size:
+                return total
+            output.write(view[:size])
+            total += size
+
+    view = memoryview(output).cast("B")
+    total = 0
+    while total < len(view):
+        size = channel.readinto(view[total : total + chunk_size])
+        if not size:
+            return total
+        total += size
+    if channel.read(1):
+        raise RuntimeError(
+            "The output buffer is too small ({0} bytes)".format(len(view))
+        )
+    return total
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .protocol import (
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    SHELL_ID_EXIT,
+    SHELL_ID_STDERR,
+    SHELL_ID_STDOUT,
+    AdbConnection,
+    AdbProtocolError,
+)
+
+
+class AdbServerClient:
+    def __init__(
+        self, host: str = DEFAULT_SERVER_HOST, port: int = DEFAULT_SERVER_PORT
+    ):
+        """
+        Client talking directly with the adb server through its smart-socket
+        protocol, without starting a new adb process for every command.
+
+        :param host: The host where the adb server is listening.
+        :param port: The port where the adb server is listening.
+        """
+
+        self.host = host
+        self.port = port
+
+        # Remember which devices don't support the shell protocol (shell,v2), so
+        # that the legacy shell service is used directly the next time.
+        self._no_shell_v2: Dict[Optional[str], bool] = {}
+        self._lock = threading.Lock()
+
+    def open(self, timeout: Optional[float] = None) -> AdbConnection:
+        """
+        Open a new connection with the adb server.
+
+        :param timeout: How many seconds the connection can be used before throwing
+                        a timeout exception.
+        :return: The new connection.
+        """
+
+        return AdbConnection(self.host, self.port, timeout=timeout)
+
+    def host_query(self, request: str, timeout: Optional[float] = None) -> str:
+        """
+        Send a host request (e.g., host:version) and return the string replied by
+        the adb server.
+        """
+
+        with self.open(timeout) as connection:
+            connection.request(request)
+            return connection.read_string()
+
+    def version(self, timeout: Optional[float] = None) -> int:
+        """
+        Get the internal version number of the adb server (e.g., 41 for 1.0.41).
+        """
+
+        return int(self.host_query("host:version", timeout), 16)
+
+    def devices(self, long: bool = False, timeout: Optional[float] = None) -> str:
+        """
+        Get the list of devices, in the same format used by the adb server.
+        """
+
+        return self.host_query("host:devices-l" if long else "host:devices", timeout)
+
+    def kill(self, timeout: Optional[float] = None) -> None:
+        """
+        Ask the adb server to terminate. Nothing happens if the adb server is not
+        running.
+        """
+
+        try:
+            with self.open(timeout) as connection:
+                connection.request("host:kill")
+        except ConnectionRefusedError:
+            pass
+
+    def connect_device(self, address: str, timeout: Optional[float] = None) -> str:
+        return self.host_query("host:connect:{0}".format(address), timeout)
+
+    def disconnect_device(self, address: str, timeout: Optional[float] = None) -> str:
+        return self.host_query("host:disconnect:{0}".format(address), timeout)
+
+    def get_state(
+        self, serial: Optional[str] = None, timeout: Optional[float] = None
+    ) -> str:
+        """
+        Get the state of the device (e.g., device, offline, recovery).
+        """
+
+        if serial:
+            return self.host_query("host-serial:{0}:get-state".format(serial), timeout)
+        else:
+            return self.host_query("host:get-state", timeout)
+
+    def features(
+        self, serial: Optional[str] = None, timeout: Optional[float] = None
+    ) -> str:
+        """
+        Get the features supported by the device (as a comma separated list).
+        """
+
+        if serial:
+            return self.host_query("host-serial:{0}:features".format(serial), timeout)
+        else:
+            return self.host_query("host:features", timeout)
+
+    def host_features(self, timeout: Optional[float] = None) -> str:
+        """
+        Get the features supported by the adb server (as a comma separated list).
+        """
+
+        return self.host_query("host:host-features", timeout)
+
+    def wait_for_device(
+        self, serial: Optional[str] = None, timeout: Optional[float] = None
+    ) -> None:
+        """
+        Block until the device is ready to receive commands.
+        """
+
+        if serial:
+            request = "host-serial:{0}:wait-for-any-device".format(serial)
+        else:
+            request = "host:wait-for-any-device"
+
+        with self.open(timeout) as connection:
+            # The first status confirms the request, the second one is sent only
+            # when the device is ready.
+            connection.request(request)
+            connection.read_status()
+
+    def open_service(
+        self, serial: Optional[str], service: str, timeout: Optional[float] = None
+    ) -> AdbConnection:
+        """
+        Open a connection with a service running on the device (e.g., shell:ls).
+
+        :param serial: The serial number of the device. If None, the only device
+                       connected to adb will be used.
+        :param service: The device service to open.
+        :param timeout: How many seconds the connection can be used before throwing
+                        a timeout exception.
+        :return: The connection with the device service, ready to be used.
+        """
+
+        connection = self.open(timeout)
+        try:
+            if serial:
+                connection.request("host:transport:{0}".format(serial))
+            else:
+                connection.request("host:transport-any")
+            connection.request(service)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def service(
+        self, serial: Optional[str], service: str, timeout: Optional[float] = None
+    ) -> bytes:
+        """
+        Run a device service and return everything it sends back.
+        """
+
+        with self.open_service(serial, service, timeout) as connection:
+            return connection.read_all()
+
+    def open_shell(
+        self, serial: Optional[str], command: str, timeout: Optional[float] = None
+    ) -> Tuple[AdbConnection, bool]:
+        """
+        Open a shell service on the device, using the shell protocol (shell,v2) when
+        supported by the device.
+
+        :return: A tuple with the connection and a flag that is True when the shell
+                 protocol is in use (and False for the legacy shell service).
+        """
+
+        if not self._no_shell_v2.get(serial):
+            try:
+                return (
+                    self.open_service(
+                        serial, "shell,v2,raw:{0}".format(command), timeout
+                    ),
+                    True,
+                )
+            except AdbProtocolError:
+                # The device might not support the shell protocol, the legacy shell
+                # service will be tried below (any other error will be raised
+                # again by the legacy shell service).
+                pass
+
+        connection = self.open_service(serial, "shell:{0}".format(command), timeout)
+        with self._lock:
+            self._no_shell_v2[serial] = True
+        return connection, False
+
+    def shell(
+        self, serial: Optional[str], command: str, timeout: Optional[float] = None
+    ) -> Tuple[bytes, Optional[int]]:
+        """
+        Run a shell command on the device.
+
+        :return: A tuple with the output of the command (stdout and stderr) and its
+                 exit code. The exit code is None if the device doesn't support the
+                 shell protocol (shell,v2).
+        """
+
+        connection, shell_v2 = self.open_shell(serial, command, timeout)
+        with connection:
+            if not shell_v2:
+                return connection.read_all(), None
+
+            output = bytearray()
+            exit_code = None
+            while True:
+                packet = connection.read_shell_packet()
+                if packet is None:
+                    break
+                packet_id, data = packet
+                if packet_id in (SHELL_ID_STDOUT, SHELL_ID_STDERR):
+                    output.extend(data)
+                elif packet_id == SHELL_ID_EXIT:
+                    exit_code = data[0]
+                    break
+            return bytes(output), exit_code
+
+    @staticmethod
+    def supports(command: List[str]) -> bool:
+        """
+        Check if an adb command (formatted as a list of strings, without the adb
+        executable) can be executed by this client.
+        """
+
+        if not command:
+            return False
+        if command[0] in ("shell", "exec-out"):
+            # Interactive shells and shell options (e.g., -t) need the adb client.
+            return len(command) > 1 and not command[1].startswith("-")
+        if command[0] in ("connect", "disconnect"):
+            return len(command) == 2
+        if command[0] == "devices":
+            return command[1:] in ([], ["-l"])
+        return len(command) == 1 and command[0] in (
+            "version",
+            "kill-server",
+            "start-server",
+            "wait-for-device",
+            "get-state",
+            "features",
+            "host-features",
+            "reboot",
+            "remount",
+        )
+
+    def execute(
+        self, serial: Optional[str], command: List[str], timeout: Optional[float] = None
+    ) -> Tuple[bytes, int]:
+        """
+        Execute an adb command (formatted as a list of strings, without the adb
+        executable) and return the same output the adb client would print.
+
+        :param serial: The serial number of the device. If None, the only device
+                       connected to adb will be used.
+        :param command: The command to execute (see supports method).
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing a timeout exception.
+        :return: A tuple with the output of the command and its exit code.
+        """
+
+        if not self.supports(command):
+            raise ValueError(
+                "Command `{0}` is not supported by the native adb client".format(
+                    " ".join(command)
+                )
+            )
+
+        name, args = command[0], command[1:]
+
+        try:
+            if name == "version":
+                return (
+                    "Android Debug Bridge version 1.0.{0}".format(
+                        self.version(timeout)
+                    ).encode(),
+                    0,
+                )
+            elif name == "devices":
+                return (
+                    "List of devices attached\n{0}".format(
+                        self.devices(long=args == ["-l"], timeout=timeout)
+                    ).encode(),
+                    0,
+                )
+            elif name == "kill-server":
+                self.kill(timeout)
+                return b"", 0
+            elif name == "start-server":
+                # Make sure the adb server is reachable.
+                self.version(timeout)
+                return b"", 0
+            elif name == "connect":
+                return self.connect_device(args[0], timeout).encode(), 0
+            elif name == "disconnect":
+                return self.disconnect_device(args[0], timeout).encode(), 0
+            elif name == "get-state":
+                return self.get_state(serial, timeout).encode(), 0
+            elif name in ("features", "host-features"):
+                # Same output as the adb client, a feature on each line.
+                features = (
+                    self.features(serial, timeout)
+                    if name == "features"
+                    else self.host_features(timeout)
+                )
+                return "\n".join(features.split(",")).encode(), 0
+            elif name == "wait-for-device":
+                self.wait_for_device(serial, timeout)
+                return b"", 0
+            elif name == "shell":
+                output, exit_code = self.shell(serial, " ".join(args), timeout)
+                return output, exit_code or 0
+            elif name == "exec-out":
+                return self.service(
+                    serial, "exec:{0}".format(" ".join(args)), timeout
+                ), 0
+            else:
+                # reboot and remount.
+                return self.service(serial, "{0}:".format(name), timeout), 0
+        except AdbProtocolError as e:
+            # Same behavior as the adb client, which prints the error and exits with
+            # a non-zero code.
+            return "error: {0}".format(e).encode(), 1
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# Validation of the parameters, creation of the adb commands and parsing of their
+# output, shared between the synchronous (ADB) and the asynchronous (AsyncADB)
+# implementations.
+
+import os
+import re
+from typing import Dict, List, Optional, Union
+
+CONNECT_ERRORS = ["unable to connect", "cannot connect", "cannot resolve", "failed to"]
+
+# Runtime permissions exist since SDK version 23 (Android Marshmallow).
+RUNTIME_PERMISSIONS_SDK_VERSION = 23
+
+
+def validate_command(command: List[str]) -> None:
+    if not isinstance(command, list) or any(
+        not isinstance(command_token, str) for command_token in command
+    ):
+        raise TypeError("The command to execute should be passed as a list of strings")
+
+
+def validate_timeout(timeout: Optional[int], is_async: bool = False) -> None:
+    if timeout is not None and (not isinstance(timeout, int) or timeout <= 0):
+        raise ValueError("If a timeout is provided, it must be a positive integer")
+
+    if is_async and timeout:
+        raise RuntimeError(
+            "The timeout cannot be used when executing the program in background"
+        )
+
+
+def parse_version(output: str) -> str:
+    match = re.search(r"version\s(\S+)", output)
+    if match:
+        return match.group(1)
+    else:
+        raise RuntimeError("Unable to determine adb version")
+
+
+def parse_devices(output: str) -> List[str]:
+    devices = []
+    for line in output.splitlines():
+        tokens = line.strip().split()
+        if len(tokens) == 2 and tokens[1] == "device":
+            # Add to the list the name / ip and port of the device.
+            devices.append(tokens[0])
+    return devices
+
+
+def parse_properties(output: str) -> Dict[str, str]:
+    # Each property is printed by getprop as "[name]: [value]" (the value could
+    # span multiple lines). The older devices (without the shell protocol) print
+    # the lines ending with CRLF.
+    return dict(
+        re.findall(
+            r"^\[(.+?)\]: \[(.*?)\]$",
+            output.replace("\r\n", "\n"),
+            flags=re.MULTILINE | re.DOTALL,
+        )
+    )
+
+
+def parse_features(output: str) -> List[str]:
+    # The adb executable prints a feature on each line, the adb server replies with
+    # a comma separated list.
+    return [feature for feature in re.split(r"[,\s]+", output) if feature]
+
+
+def connect_command(host: Optional[str] = None) -> List[str]:
+    if host:
+        return ["connect", host]
+    else:
+        return ["start-server"]
+
+
+def check_connect_output(output: str) -> str:
+    # Make sure the connect operation ended successfully.
+    if output and any(error in output.lower() for error in CONNECT_ERRORS):
+        raise RuntimeError(
+            "Something went wrong during the connect operation: {0}".format(output)
+        )
+    else:
+        return output
+
+
+def check_remount_output(output: Optional[str]) -> str:
+    # Make sure the remount operation ended successfully.
+    if output and "remount succeeded" in output.lower():
+        return output
+    else:
+        raise RuntimeError(
+            "Something went wrong during the remount operation: {0}".format(output)
+        )
+
+
+def compression_flags(compression: Optional[str]) -> List[str]:
+    # Options of adb push and adb pull: -z ALGORITHM enables the compression, -Z
+    # disables it (when None, the default behavior of adb is kept).
+    if compression is None:
+        return []
+    elif compression == "none":
+        return ["-Z"]
+    else:
+        return ["-z", compression]
+
+
+def push_command(
+    host_path: Union[str, List[str]],
+    device_path: str,
+    compression: Optional[str] = None,
+) -> List[str]:
+    # Make sure the files to copy exist on the host computer.
+    if isinstance(host_path, list):
+        for p in host_path:
+            if not os.path.exists(p):
+                raise FileNotFoundError(
+                    "Cannot copy '{0}' to the Android device: no such file or "
+                    "directory".format(p)
+                )
+
+    if isinstance(host_path, str) and not os.path.exists(host_path):
+        raise FileNotFoundError(
+            "Cannot copy '{0}' to the Android device: no such file or directory".format(
+                host_path
+            )
+        )
+
+    push_cmd = ["push"] + compression_flags(compression)
+    if isinstance(host_path, list):
+        push_cmd.extend(host_path)
+    else:
+        push_cmd.append(host_path)
+
+    push_cmd.append(device_path)
+    return push_cmd
+
+
+def check_push_output(output: str) -> str:
+    # Make sure the push operation ended successfully.
+    match = re.search(r"\d+ files? pushed[.,]", output.splitlines()[-1])
+    if match:
+        return output
+    else:
+        raise RuntimeError("Something went wrong during the file push operation")
+
+
+def pull_command(
+    device_path: Union[str, List[str]],
+    host_path: str,
+    compression: Optional[str] = None,
+) -> List[str]:
+    # When copying multiple files at the same time, make sure the host path refers
+    # to an existing directory.
+    if isinstance(device_path, list) and not os.path.isdir(host_path):
+        raise NotADirectoryError(
+            "When copying multiple files, the destination host path should be an "
+            "existing directory: '{0}' directory was not found".format(host_path)
+        )
+
+    # Make sure the destination directory on the host exists (adb won't create the
+    # missing directories specified on the host path). For example, if test/
+    # directory exists on host, it can be used, but test/nested/ can be used only
+    # if it already exists on the host, otherwise adb won't create the nested/
+    # directory.
+    if not os.path.isdir(os.path.dirname(host_path)):
+        raise NotADirectoryError(
+            "The destination host directory '{0}' was not found".format(
+                os.path.dirname(host_path)
+            )
+        )
+
+    pull_cmd = ["pull"] + compression_flags(compression)
+    if isinstance(device_path, list):
+        pull_cmd.extend(device_path)
+    else:
+        pull_cmd.append(device_path)
+
+    pull_cmd.append(host_path)
+    return pull_cmd
+
+
+def check_pull_output(output: str) -> str:
+    # Make sure the pull operation ended successfully.
+    match = re.search(r"\d+ files? pulled[.,]", output.splitlines()[-1])
+    if match:
+        return output
+    else:
+        raise RuntimeError("Something went wrong during the file pull operation")
+
+
+def check_apk_path(apk_path: str) -> None:
+    # Make sure the application to install is an existing file on the host computer.
+    if not os.path.isfile(apk_path):
+        raise FileNotFoundError("'{0}' apk file was not found".format(apk_path))
+
+
+def install_flags(
+    replace_existing: bool = False, grant_permissions: bool = False
+) -> List[str]:
+    # Additional installation flags (the same for adb install and for the package
+    # manager of the device).
+    flags = []
+    if replace_existing:
+        flags.append("-r")
+    if grant_permissions:
+        flags.append("-g")
+    return flags
+
+
+def install_command(
+    apk_path: Union[str, List[str]],
+    replace_existing: bool = False,
+    grant_permissions: bool = False,
+    multi_package: bool = False,
+) -> List[str]:
+    """
+    Create the install command. grant_permissions should be set only if the device
+    supports runtime permissions (see RUNTIME_PERMISSIONS_SDK_VERSION). A list of
+    apk files is installed in a single session, as the split apks of the same
+    package (install-multiple) or, with multi_package, as different packages
+    (install-multi-package).
+    """
+
+    if isinstance(apk_path, list):
+        install_cmd = ["install-multi-package" if multi_package else "install-multiple"]
+    else:
+        install_cmd = ["install"]
+
+    install_cmd.extend(install_flags(replace_existing, grant_permissions))
+
+    if isinstance(apk_path, list):
+        install_cmd.extend(apk_path)
+    else:
+        install_cmd.append(apk_path)
+    return install_cmd
+
+
+def streamed_install_command(apk_size: int, flags: List[str]) -> List[str]:
+    # The package manager reads the apk (apk_size bytes) from its standard input.
+    return ["cmd", "package", "install"] + flags + ["-S", str(apk_size)]
+
+
+def install_write_command(session_id: str, apk_size: int, name: str) -> List[str]:
+    # Write an apk (read from the standard input) into an install session.
+    return [
+        "cmd",
+        "package",
+        "install-write",
+        "-S",
+        str(apk_size),
+        session_id,
+        name,
+        "-",
+    ]
+
+
+def parse_install_session(output: str) -> str:
+    # E.g., "Success: created install session [1234567]".
+    match = re.search(r"\[(\d+)\]", output)
+    if match:
+        return match.group(1)
+    else:
+        raise RuntimeError(
+            "Unable to create the installation session: {0}".format(output)
+        )
+
+
+def check_install_output(output: str) -> str:
+    # Make sure the installation operation ended successfully.
+    # Complete list of error messages:
+    # https://android.googlesource.com/platform/frameworks/base/+/lollipop-release/core/java/android/content/pm/PackageManager.java
+    match = re.search(r"Failure \[.+?\]", output, flags=re.IGNORECASE)
+    if not match:
+        return output
+    else:
+        raise RuntimeError("Application installation failed: {0}".format(match.group()))
+
+
+def check_uninstall_output(output: str) -> str:
+    # Make sure the uninstallation operation ended successfully.
+    # Complete list of error messages:
+    # https://android.googlesource.com/platform/frameworks/base/+/lollipop-release/core/java/android/content/pm/PackageManager.java
+    match = re.search(
+        r"(Failure \[.+?\])|(Unknown package: .+?)", output, flags=re.IGNORECASE
+    )
+    if not match:
+        return output
+    else:
+        raise RuntimeError("Application removal failed: {0}".format(match.group()))
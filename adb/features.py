@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import os
+import posixpath
+import subprocess
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .commands import parse_features
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+# The compression algorithms of the file sync protocol (sendrecv_v2), in order of
+# preference: zstd and lz4 are much faster than brotli, with a similar ratio on the
+# files usually copied (logs, databases, text).
+COMPRESSION_ALGORITHMS = ("zstd", "lz4", "brotli")
+
+# Value of the compression parameter that disables the compression.
+NO_COMPRESSION = "none"
+
+# Value of the compression parameter that chooses the compression automatically.
+AUTO_COMPRESSION = "auto"
+
+# Extensions of the files already compressed (compressing them again only wastes
+# time on both sides).
+INCOMPRESSIBLE_EXTENSIONS = frozenset(
+    (
+        ".7z",
+        ".aab",
+        ".apk",
+        ".apks",
+        ".br",
+        ".bz2",
+        ".gif",
+        ".gz",
+        ".jar",
+        ".jpeg",
+        ".jpg",
+        ".lz4",
+        ".mkv",
+        ".mp3",
+        ".mp4",
+        ".obb",
+        ".ogg",
+        ".png",
+        ".webm",
+        ".webp",
+        ".xz",
+        ".zip",
+        ".zst",
+    )
+)
+
+
+class FeatureCache:
+    def __init__(self, adb: "ADB"):
+        """
+        Cache of the features supported by both the adb server and the Android
+        devices (e.g., shell_v2, sendrecv_v2_zstd). The features don't change until
+        the device (or the adb server) is updated, so they are loaded only once for
+        each device (ADB.reboot invalidates them).
+
+        Usually accessed through ADB.features.
+
+        :param adb: The ADB instance used to read the features.
+        """
+
+        self._adb = adb
+
+        # Serial number of the device -> features supported by device and server.
+        self._features: Dict[Optional[str], List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _query(
+        self, command: List[str], device: Optional[str], timeout: Optional[int]
+    ) -> List[str]:
+        try:
+            output: str = self._adb.execute(command, timeout=timeout, device=device)  # type: ignore[assignment]
+        except subprocess.CalledProcessError:
+            # Old adb versions don't know the features, nothing is supported.
+            return []
+        return parse_features(output)
+
+    def get(
+        self,
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+        refresh: bool = False,
+    ) -> List[str]:
+        """
+        Get the features supported by both the adb server and a device.
+
+        :param device: The serial number of the device. If None, the target device
+                       of the ADB instance is used.
+        :param timeout: How many seconds to wait for each features command (if
+                        needed) to finish execution before throwing an exception.
+        :param refresh: When set to True, the features are always loaded again.
+        :return: The sorted list of the features.
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            cached = self._features.get(device)
+        if cached is not None and not refresh:
+            return list(cached)
+
+        device_features = self._query(["features"], device, timeout)
+        server_features = self._query(["host-features"], device, timeout)
+        features = sorted(set(device_features) & set(server_features))
+
+        with self._lock:
+            self._features[device] = features
+        return list(features)
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """
+        Forget the cached features of a device (e.g., after a reboot).
+
+        :param device: The serial number of the device. If None, the features of all
+                       the devices are forgotten.
+        """
+
+        with self._lock:
+            if device is None:
+                self._features.clear()
+            else:
+                self._features.pop(device, None)
+
+
+def is_compressible(path: str) -> bool:
+    """
+    Guess from its extension if a file (or a directory) is worth compressing.
+    """
+
+    name = posixpath.basename(posixpath.normpath(path.replace(os.sep, "/")))
+    return os.path.splitext(name)[1].lower() not in INCOMPRESSIBLE_EXTENSIONS
+
+
+def supported_compressions(features: List[str]) -> List[str]:
+    """
+    Get the compression algorithms available for the file sync protocol, in order
+    of preference.
+    """
+
+    return [
+        algorithm
+        for algorithm in COMPRESSION_ALGORITHMS
+        if "sendrecv_v2_{0}".format(algorithm) in features
+    ]
+
+
+def choose_compression(
+    paths: List[str], features: List[str], compression: str = AUTO_COMPRESSION
+) -> Optional[str]:
+    """
+    Choose the compression of a file transfer.
+
+    :param paths: The paths of the files copied (their names are used to guess if
+                  they are compressible).
+    :param features: The features supported by the adb server and the device.
+    :param compression: "auto" to choose automatically, "none" to disable the
+                        compression or the name of an algorithm (zstd, lz4 or
+                        brotli) to use it.
+    :return: The algorithm to use, "none" to disable the compression explicitly, or
+             None if the compression is not supported at all (the transfer is done
+             as usual).
+    """
+
+    if compression != AUTO_COMPRESSION:
+        if compression != NO_COMPRESSION and compression not in COMPRESSION_ALGORITHMS:
+            raise ValueError(
+                "Invalid compression '{0}', use '{1}', '{2}' or one of: {3}".format(
+                    compression,
+                    AUTO_COMPRESSION,
+                    NO_COMPRESSION,
+                    ", ".join(COMPRESSION_ALGORITHMS),
+                )
+            )
+        return compression
+
+    algorithms = supported_compressions(features)
+    if not algorithms:
+        return None
+    if not any(is_compressible(path) for path in paths):
+        return NO_COMPRESSION
+    return algorithms[0]
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+# Connection of many devices over TCP/IP at the same time (see ADB.connect_many) and
+# monitor connecting again the devices that drop (see ADB.keep_alive).
+
+import logging
+import random
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional
+
+from .protocol import AdbProtocolError
+from .tracker import DeviceEvent
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+# The port used by adb connect when the endpoint doesn't specify one.
+DEFAULT_CONNECT_PORT = 5555
+
+# Errors of a connection attempt worth retrying (RuntimeError is raised when the
+# output of adb connect contains an error, see check_connect_output).
+CONNECT_RETRY_ERRORS = (
+    RuntimeError,
+    subprocess.CalledProcessError,
+    subprocess.TimeoutExpired,
+    AdbProtocolError,
+    OSError,
+    socket.timeout,
+)
+
+ConnectFunction = Callable[[str, Optional[int]], str]
+
+
+class ConnectStatus(NamedTuple):
+    # The endpoint as requested.
+    host: str
+    # The serial number of the device once connected (host:port).
+    serial: str
+    # The output of the last attempt, None if the last attempt failed.
+    output: Optional[str]
+    # The error of the last attempt, None if the device is connected.
+    error: Optional[Exception]
+    attempts: int
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ConnectReport(NamedTuple):
+    hosts: List[ConnectStatus]
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return all(status.ok for status in self.hosts)
+
+    @property
+    def succeeded(self) -> List[ConnectStatus]:
+        return [status for status in self.hosts if status.ok]
+
+    @property
+    def failed(self) -> List[ConnectStatus]:
+        return [status for status in self.hosts if not status.ok]
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """
+    Get the serial number adb gives to a device connected over TCP/IP, i.e., the
+    endpoint with the default port added when missing (e.g., 192.168.1.10 becomes
+    192.168.1.10:5555 and ::1 becomes [::1]:5555).
+    """
+
+    endpoint = endpoint.strip()
+    if endpoint.startswith("["):
+        has_port = "]:" in endpoint
+    elif endpoint.count(":") > 1:
+        # IPv6 address without brackets (and without port).
+        return "[{0}]:{1}".format(endpoint, DEFAULT_CONNECT_PORT)
+    else:
+        has_port = ":" in endpoint
+    return endpoint if has_port else "{0}:{1}".format(endpoint, DEFAULT_CONNECT_PORT)
+
+
+def backoff_delay(attempt: int, backoff: float, max_backoff: float) -> float:
+    """
+    How many seconds to wait before the next attempt: the delay doubles after every
+    failed attempt (up to max_backoff) and a random half of it is added as jitter,
+    so the hosts that failed together don't retry all at the same time.
+
+    :param attempt: The number of the failed attempt (starting from 1).
+    """
+
+    delay = min(max_backoff, backoff * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class BulkConnector:
+    def __init__(
+        self,
+        connect: ConnectFunction,
+        max_workers: int = 16,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        timeout: Optional[int] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Connect many devices over TCP/IP at the same time, with at most max_workers
+        connections in progress. Every host that fails is retried on its own, after
+        a jittered exponential backoff, and the outcome of every host is reported.
+
+        Usually used through ADB.connect_many method.
+
+        :param connect: Function connecting a single host (e.g., ADB.connect), given
+                        the host and the timeout of the attempt.
+        :param max_workers: The maximum number of connections in progress at the
+                            same time.
+        :param retries: How many times a failed connection is attempted again.
+        :param backoff: How many seconds to wait (on average) before the first
+                        retry, the delay doubles after every retry.
+        :param max_backoff: The maximum number of seconds between two attempts.
+        :param timeout: How many seconds each connection attempt can take before
+                        failing.
+        :param logger: The logger used for the debug messages.
+        """
+
+        if max_workers <= 0:
+            raise ValueError("The number of workers must be a positive integer")
+        if retries < 0:
+            raise ValueError("The number of retries cannot be negative")
+
+        self.connect = connect
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+    def _connect_host(self, host: str) -> ConnectStatus:
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                output: Optional[str] = self.connect(host, self.timeout)
+                error: Optional[Exception] = None
+            except CONNECT_RETRY_ERRORS as e:
+                output, error = None, e
+            if error is None or attempts > self.retries:
+                break
+            delay = backoff_delay(attempts, self.backoff, self.max_backoff)
+            self.logger.debug(
+                "Connection to '{0}' failed ({1}), retrying in {2:.2f} seconds".format(
+                    host, error, delay
+                )
+            )
+            time.sleep(delay)
+
+        if error is not None:
+            self.logger.error(
+                "Failed to connect to '{0}' after {1} attempts: {2}".format(
+                    host, attempts, error
+                )
+            )
+        return ConnectStatus(
+            host,
+            normalize_endpoint(host),
+            output,
+            error,
+            attempts,
+            time.monotonic() - start,
+        )
+
+    def run(self, hosts: List[str]) -> ConnectReport:
+        """
+        Connect the hosts.
+
+        :param hosts: The endpoints of the devices, in host[:port] format.
+        :return: The report with the outcome of every host (in the same order).
+        """
+
+        if any(not host or not host.strip() for host in hosts):
+            raise ValueError("The hosts to connect cannot be empty")
+
+        start = time.monotonic()
+        self.logger.debug(
+            "Connecting {0} hosts with {1} workers".format(
+                len(hosts), min(self.max_workers, len(hosts))
+            )
+        )
+
+        statuses: List[ConnectStatus] = []
+        if hosts:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(hosts))
+            ) as executor:
+                statuses = list(executor.map(self._connect_host, hosts))
+
+        return ConnectReport(statuses, time.monotonic() - start)
+
+
+class KeepAlive:
+    def __init__(
+        self,
+        adb: "ADB",
+        hosts: List[str],
+        connector: BulkConnector,
+        interval: float = 10.0,
+        timeout: Optional[int] = None,
+    ):
+        """
+        Monitor (in a background thread) the devices connected over TCP/IP and
+        connect again the ones that drop. The devices are checked every interval
+        seconds and, when the device tracker of the ADB instance is running, also as
+        soon as one of them drops.
+
+        Usually obtained with ADB.keep_alive method.
+
+        :param adb: The ADB instance used to list the connected devices.
+        :param hosts: The endpoints of the devices to keep connected, in
+                      host[:port] format.
+        :param connector: Used to connect again the devices that dropped.
+        :param interval: How many seconds between two checks.
+        :param timeout: How many seconds listing the connected devices can take.
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self.adb = adb
+        self.hosts = list(hosts)
+        self.connector = connector
+        self.interval = interval
+        self.timeout = timeout
+        # The report of the last reconnection (if any).
+        self.last_report: Optional[ConnectReport] = None
+
+        # Host -> how many times it was connected again.
+        self._reconnections: Dict[str, int] = {host: 0 for host in self.hosts}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._serials = {normalize_endpoint(host) for host in self.hosts}
+
+    def __enter__(self) -> "KeepAlive":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def reconnections(self) -> Dict[str, int]:
+        """
+        How many times each host was connected again after dropping.
+        """
+
+        with self._lock:
+            return dict(self._reconnections)
+
+    def start(self) -> "KeepAlive":
+        """
+        Start monitoring the devices (nothing happens if already started).
+        """
+
+        if self._thread is None:
+            tracker = self.adb.tracker
+            if tracker is not None and tracker.running:
+                tracker.add_listener(self._on_event)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+        Stop monitoring the devices (they stay connected).
+        """
+
+        self._stop.set()
+        self._wake.set()
+        tracker = self.adb.tracker
+        if tracker is not None:
+            tracker.remove_listener(self._on_event)
+        if self._thread is not None:
+            self._thread.join()
+
+    def check(self) -> Optional[ConnectReport]:
+        """
+        Connect again the devices that dropped.
+
+        :return: The report of the reconnection, None if no device dropped.
+        """
+
+        available = set(self.adb.get_available_devices(self.timeout))
+        dropped = [
+            host for host in self.hosts if normalize_endpoint(host) not in available
+        ]
+        if not dropped:
+            return None
+
+        self.logger.info("Connecting again {0}".format(", ".join(dropped)))
+        report = self.connector.run(dropped)
+        with self._lock:
+            for status in report.succeeded:
+                self._reconnections[status.host] += 1
+        self.last_report = report
+        return report
+
+    def _on_event(self, event: DeviceEvent) -> None:
+        if event.serial in self._serials and event.kind != "added":
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                # E.g., the adb server is restarting, try again at the next check.
+                self.logger.error("Error while checking the devices: {0}".format(e))
+            self._wake.wait(self.interval)
+            self._wake.clear()
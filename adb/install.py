@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# Host-side cache of the applications installed on the devices, used to skip the
+# installation of an apk already installed (see ADB.install_app, ADB.install_multiple
+# and ADB.install_packages).
+
+import json
+import os
+import shlex
+import struct
+import threading
+import zipfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .manifest import file_md5
+
+# Chunk types of the binary xml format used for AndroidManifest.xml.
+_XML_STRING_POOL = 0x0001
+_XML_RESOURCE_MAP = 0x0180
+_XML_START_ELEMENT = 0x0102
+
+# Flag of the string pool when the strings are encoded as UTF-8 (otherwise UTF-16).
+_UTF8_FLAG = 0x100
+
+# Resource identifier of android:versionCode attribute.
+_VERSION_CODE_RESOURCE = 0x0101021B
+
+# Type of the attribute values.
+_TYPE_STRING = 0x03
+_TYPE_INT_DEC = 0x10
+_TYPE_INT_HEX = 0x11
+
+_NO_INDEX = 0xFFFFFFFF
+
+
+class ApkInfo(NamedTuple):
+    path: str
+    package: str
+    version_code: int
+    size: int
+    md5: str
+
+
+class InstalledApk(NamedTuple):
+    # The path of the apk on the device (base.apk or a split apk).
+    path: str
+    size: int
+    mtime: int
+
+
+class InstallResult(NamedTuple):
+    package: str
+    version_code: int
+    # True if the installation was skipped (the same apk was already installed).
+    skipped: bool
+    # The output of the installation command (empty if skipped).
+    output: str
+
+
+def _read_length(data: bytes, offset: int, utf8: bool) -> Tuple[int, int]:
+    # The length of a string uses 1 or 2 units (of 1 byte for UTF-8, of 2 bytes
+    # for UTF-16), the high bit of the first unit marks the longer form.
+    if utf8:
+        length = data[offset]
+        if length & 0x80:
+            return ((length & 0x7F) << 8) | data[offset + 1], offset + 2
+        return length, offset + 1
+    length = struct.unpack_from("<H", data, offset)[0]
+    if length & 0x8000:
+        low = struct.unpack_from("<H", data, offset + 2)[0]
+        return ((length & 0x7FFF) << 16) | low, offset + 4
+    return length, offset + 2
+
+
+def _parse_string_pool(data: bytes, offset: int, header_size: int) -> List[str]:
+    count, _, flags, strings_start = struct.unpack_from("<IIII", data, offset + 8)
+    utf8 = bool(flags & _UTF8_FLAG)
+    strings = []
+    for index in range(count):
+        position = offset + strings_start
+        position += struct.unpack_from("<I", data, offset + header_size + 4 * index)[0]
+        if utf8:
+            # Length in characters, then length in bytes.
+            _, position = _read_length(data, position, True)
+            size, position = _read_length(data, position, True)
+            strings.append(
+                data[position : position + size].decode("utf-8", errors="replace")
+            )
+        else:
+            size, position = _read_length(data, position, False)
+            strings.append(
+                data[position : position + 2 * size].decode(
+                    "utf-16-le", errors="replace"
+                )
+            )
+    return strings
+
+
+def parse_apk_manifest(apk_path: str) -> Tuple[str, int]:
+    """
+    Read the package name and the version code of an application from the binary
+    AndroidManifest.xml inside the apk file (without aapt or other Android tools).
+
+    :param apk_path: The path of the apk file on the host computer.
+    :return: A tuple with the package name and the version code.
+    """
+
+    try:
+        with zipfile.ZipFile(apk_path) as apk:
+            data = apk.read("AndroidManifest.xml")
+        return _parse_manifest(data)
+    except (zipfile.BadZipFile, KeyError, IndexError, struct.error, ValueError):
+        raise ValueError("Invalid apk file '{0}'".format(apk_path))
+
+
+def _parse_manifest(data: bytes) -> Tuple[str, int]:
+    strings: List[str] = []
+    resources: List[int] = []
+    offset = struct.unpack_from("<HHI", data, 0)[1]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, offset)
+        if chunk_size < 8:
+            break
+        if chunk_type == _XML_STRING_POOL:
+            strings = _parse_string_pool(data, offset, header_size)
+        elif chunk_type == _XML_RESOURCE_MAP:
+            resources = list(
+                struct.unpack_from(
+                    "<{0}I".format((chunk_size - header_size) // 4),
+                    data,
+                    offset + header_size,
+                )
+            )
+        elif chunk_type == _XML_START_ELEMENT:
+            # The manifest element is always the first element.
+            attribute_start, attribute_size, attribute_count = struct.unpack_from(
+                "<HHH", data, offset + 24
+            )
+            package, version_code = None, 0
+            for index in range(attribute_count):
+                _, name, raw_value, _, _, value_type, value = struct.unpack_from(
+                    "<IIIHBBI",
+                    data,
+                    offset + 16 + attribute_start + index * attribute_size,
+                )
+                raw = strings[raw_value] if raw_value != _NO_INDEX else None
+                if strings[name] == "package":
+                    package = raw if raw is not None else strings[value]
+                elif strings[name] == "versionCode" or (
+                    name < len(resources) and resources[name] == _VERSION_CODE_RESOURCE
+                ):
+                    if raw is not None:
+                        version_code = int(raw, 0)
+                    elif value_type in (_TYPE_INT_DEC, _TYPE_INT_HEX):
+                        version_code = value
+                    elif value_type == _TYPE_STRING:
+                        version_code = int(strings[value], 0)
+            if not package:
+                break
+            return package, version_code
+        offset += chunk_size
+
+    raise ValueError("No package name found in the manifest")
+
+
+def installed_apks_command(packages: List[str]) -> str:
+    """
+    Create the shell command that prints the size, the modification time and the
+    path of the apk files (base and splits) of the installed packages, with a
+    single invocation (nothing is printed for the packages not installed).
+    """
+
+    return (
+        "for p in {0}; do pm path $p 2>/dev/null | while read -r line; do "
+        'f=${{line#package:}}; echo "$p $(stat -c \'%s %Y\' "$f") $f"; '
+        "done; done".format(" ".join(shlex.quote(p) for p in packages))
+    )
+
+
+def parse_installed_apks(output: str) -> Dict[str, List[InstalledApk]]:
+    """
+    Parse the output of the command created by installed_apks_command.
+    """
+
+    installed: Dict[str, List[InstalledApk]] = {}
+    for line in output.splitlines():
+        tokens = line.strip().split(" ", 3)
+        if len(tokens) == 4 and tokens[1].isdigit() and tokens[2].isdigit():
+            installed.setdefault(tokens[0], []).append(
+                InstalledApk(tokens[3], int(tokens[1]), int(tokens[2]))
+            )
+    return installed
+
+
+class InstallCache:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Cache of the apk files on the host computer (package name, version code and
+        md5 hash, computed only once for each version of the file) and of the apk
+        files installed on the devices (size and modification time of the installed
+        files, when they are known to be identical to the host apk files).
+
+        Usually accessed through ADB.install_cache.
+
+        :param path: The json file where the cache is saved, to be reused by the
+                     next executions. If None, the cache is kept only in memory.
+        """
+
+        self.path = path
+
+        # "path:size:mtime" of a host apk -> package, version code and md5 hash.
+        self._apks: Dict[str, List] = {}
+        # Device serial number -> package -> md5 hashes and installed files.
+        self._devices: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.isfile(path):
+            try:
+                with open(path) as cache_file:
+                    content = json.load(cache_file)
+                self._apks = content.get("apks", {})
+                self._devices = content.get("devices", {})
+            except (OSError, ValueError, AttributeError):
+                # A corrupted cache is just ignored (it will be written again).
+                pass
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            content = json.dumps({"apks": self._apks, "devices": self._devices})
+        temporary_path = "{0}.{1}.tmp".format(self.path, threading.get_ident())
+        with open(temporary_path, "w") as cache_file:
+            cache_file.write(content)
+        os.replace(temporary_path, self.path)
+
+    def apk_info(self, apk_path: str) -> ApkInfo:
+        """
+        Get the package name, the version code and the md5 hash of an apk file.
+        """
+
+        st = os.stat(apk_path)
+        key = "{0}:{1}:{2}".format(
+            os.path.abspath(apk_path), st.st_size, st.st_mtime_ns
+        )
+        with self._lock:
+            cached = self._apks.get(key)
+        if cached is None:
+            package, version_code = parse_apk_manifest(apk_path)
+            cached = [package, version_code, file_md5(apk_path)]
+            with self._lock:
+                self._apks[key] = cached
+            self._save()
+        return ApkInfo(apk_path, cached[0], cached[1], st.st_size, cached[2])
+
+    def is_known(
+        self,
+        device: str,
+        apks: List[ApkInfo],
+        installed: List[InstalledApk],
+    ) -> bool:
+        """
+        Check if the installed files are known to be identical to the apk files.
+        """
+
+        with self._lock:
+            record = self._devices.get(device, {}).get(apks[0].package)
+        return (
+            record is not None
+            and record["md5"] == sorted(apk.md5 for apk in apks)
+            and record["files"] == sorted(list(apk) for apk in installed)
+        )
+
+    def remember(
+        self,
+        device: str,
+        apks: List[ApkInfo],
+        installed: List[InstalledApk],
+    ) -> None:
+        """
+        Remember that the installed files are identical to the apk files.
+        """
+
+        with self._lock:
+            self._devices.setdefault(device, {})[apks[0].package] = {
+                "md5": sorted(apk.md5 for apk in apks),
+                "files": sorted(list(apk) for apk in installed),
+            }
+        self._save()
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """
+        Forget the applications installed on a device.
+
+        :param device: The serial number of the device. If None, the applications
+                       of all the devices are forgotten.
+        """
+
+        with self._lock:
+            if device is None:
+                self._devices.clear()
+            else:
+                self._devices.pop(device, None)
+        self._save()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+
+# Collection of the logcat of the devices (see ADB.logcat): the output of logcat is
+# parsed into compact records, filtered before the records are built, kept in a
+# bounded ring buffer and (optionally) written to rotating jsonl files.
+
+import collections
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from typing import (
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    TextIO,
+)
+
+from .stream import CommandStream
+
+# Priorities of the log entries, from the lowest to the highest (in the binary format,
+# V is 2 and F is 7).
+PRIORITIES = "VDIWEF"
+
+_BINARY_PRIORITY_OFFSET = 2
+
+# Size of the header of the entries in the binary format when the header size is not
+# specified (version 1 of struct logger_entry).
+_BINARY_V1_HEADER_SIZE = 20
+
+# E.g., "01-02 03:04:05.678  1234  5678 I ActivityManager: message".
+_THREADTIME_PATTERN = re.compile(
+    rb"(\d\d-\d\d \d\d:\d\d:\d\d\.\d+)\s+(\d+)\s+(\d+) ([VDIWEFS]) (.*?)\s*:(?: (.*))?$"
+)
+
+
+class LogEntry(NamedTuple):
+    # The time of the entry, as printed by logcat -v threadtime (e.g., 01-02
+    # 03:04:05.678, in the timezone of the device).
+    timestamp: str
+    pid: int
+    tid: int
+    # V, D, I, W, E or F.
+    priority: str
+    tag: str
+    message: str
+
+
+class LogcatStats(NamedTuple):
+    # The entries parsed (including the filtered ones).
+    entries: int
+    # The entries discarded by the filter.
+    filtered: int
+    # The lines (or binary entries) that couldn't be parsed.
+    malformed: int
+    # The entries removed from the ring buffer to make room for newer entries.
+    evicted: int
+    # The entries written to disk.
+    written: int
+
+
+class LogFilter:
+    def __init__(
+        self,
+        tags: Optional[Iterable[str]] = None,
+        min_priority: str = "V",
+        pids: Optional[Iterable[int]] = None,
+    ):
+        """
+        Filter of the log entries, applied to the raw fields of each entry before
+        the record (with the decoded message) is built.
+
+        :param tags: Keep only the entries with these tags. If None, all the tags.
+        :param min_priority: Keep only the entries with this priority or higher
+                             (V, D, I, W, E or F).
+        :param pids: Keep only the entries of these processes. If None, all the
+                     processes.
+        """
+
+        if min_priority not in PRIORITIES:
+            raise ValueError(
+                "Invalid priority '{0}', use one of {1}".format(
+                    min_priority, ", ".join(PRIORITIES)
+                )
+            )
+        self.tags = {tag.encode() for tag in tags} if tags is not None else None
+        # The allowed priorities, both as characters and as numbers.
+        self.priorities = frozenset(
+            PRIORITIES[PRIORITIES.index(min_priority) :].encode()
+        ) | frozenset(
+            index + _BINARY_PRIORITY_OFFSET
+            for index in range(PRIORITIES.index(min_priority), len(PRIORITIES))
+        )
+        self.pids: Optional[Set[int]] = set(pids) if pids is not None else None
+
+    def accepts(self, priority: int, tag: bytes, pid: int) -> bool:
+        """
+        Check a log entry.
+
+        :param priority: The priority, as a character code (e.g., ord("I")) or as
+                         number of the binary format.
+        :param tag: The raw tag.
+        :param pid: The process id.
+        """
+
+        return (
+            priority in self.priorities
+            and (self.tags is None or tag in self.tags)
+            and (self.pids is None or pid in self.pids)
+        )
+
+
+class _Counters:
+    def __init__(self):
+        self.entries = 0
+        self.filtered = 0
+        self.malformed = 0
+
+
+def parse_threadtime(
+    chunks: Iterable[bytes],
+    log_filter: Optional[LogFilter] = None,
+    counters: Optional[_Counters] = None,
+) -> Iterator[List[LogEntry]]:
+    """
+    Parse the output of logcat -v threadtime.
+
+    :param chunks: The output of logcat, in chunks of any size.
+    :param log_filter: The filter of the entries (if None, all the entries are kept).
+    :return: An iterator over the entries, in lists (one for each chunk).
+    """
+
+    counters = counters or _Counters()
+    match = _THREADTIME_PATTERN.match
+    buffer = b""
+    for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        entries = []
+        for line in lines:
+            parsed = match(line.rstrip(b"\r"))
+            if parsed is None:
+                # E.g., "--------- beginning of main".
+                counters.malformed += bool(line.strip())
+                continue
+            counters.entries += 1
+            timestamp, pid, tid, priority, tag, message = parsed.groups()
+            if log_filter is not None and not log_filter.accepts(
+                priority[0], tag, int(pid)
+            ):
+                counters.filtered += 1
+                continue
+            entries.append(
+                LogEntry(
+                    timestamp.decode(),
+                    int(pid),
+                    int(tid),
+                    priority.decode(),
+                    tag.decode(errors="backslashreplace"),
+                    (message or b"").decode(errors="backslashreplace"),
+                )
+            )
+        yield entries
+
+
+def parse_binary(
+    chunks: Iterable[bytes],
+    log_filter: Optional[LogFilter] = None,
+    counters: Optional[_Counters] = None,
+) -> Iterator[List[LogEntry]]:
+    """
+    Parse the output of logcat -B (struct logger_entry followed by the priority, the
+    tag and the message of each entry). The timestamps are converted with the
+    timezone of the host computer.
+
+    :param chunks: The output of logcat, in chunks of any size.
+    :param log_filter: The filter of the entries (if None, all the entries are kept).
+    :return: An iterator over the entries, in lists (one for each chunk).
+    """
+
+    counters = counters or _Counters()
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        entries = []
+        offset = 0
+        while len(buffer) - offset >= 4:
+            payload_size, header_size = struct.unpack_from("<HH", buffer, offset)
+            header_size = header_size or _BINARY_V1_HEADER_SIZE
+            end = offset + header_size + payload_size
+            if end > len(buffer):
+                break
+            pid, tid, seconds, nanoseconds = struct.unpack_from(
+                "<iIII", buffer, offset + 4
+            )
+            payload = bytes(buffer[offset + header_size : end])
+            offset = end
+            tag_end = payload.find(b"\0", 1)
+            if tag_end < 0:
+                # E.g., the entries of the events buffer (binary payload).
+                counters.malformed += 1
+                continue
+            counters.entries += 1
+            priority, tag = payload[0], payload[1:tag_end]
+            if log_filter is not None and not log_filter.accepts(priority, tag, pid):
+                counters.filtered += 1
+                continue
+            priority -= _BINARY_PRIORITY_OFFSET
+            entries.append(
+                LogEntry(
+                    "{0}.{1:03d}".format(
+                        time.strftime("%m-%d %H:%M:%S", time.localtime(seconds)),
+                        nanoseconds // 1000000,
+                    ),
+                    pid,
+                    tid,
+                    PRIORITIES[priority] if 0 <= priority < len(PRIORITIES) else "?",
+                    tag.decode(errors="backslashreplace"),
+                    payload[tag_end + 1 :]
+                    .rstrip(b"\0\n")
+                    .decode(errors="backslashreplace"),
+                )
+            )
+        del buffer[:offset]
+        yield entries
+
+
+class LogBuffer:
+    def __init__(self, capacity: int = 10000):
+        """
+        Thread-safe ring buffer with the most recent log entries: when full, the
+        oldest entries are evicted.
+
+        :param capacity: The maximum number of entries.
+        """
+
+        if capacity <= 0:
+            raise ValueError("The capacity of the buffer must be a positive integer")
+        self.capacity = capacity
+        self.evicted = 0
+
+        self._entries: Deque[LogEntry] = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def extend(self, entries: List[LogEntry]) -> None:
+        with self._lock:
+            self.evicted += max(len(self._entries) + len(entries) - self.capacity, 0)
+            self._entries.extend(entries)
+
+    def snapshot(self) -> List[LogEntry]:
+        """
+        Get the entries in the buffer (from the oldest), without removing them.
+        """
+
+        with self._lock:
+            return list(self._entries)
+
+    def drain(self) -> List[LogEntry]:
+        """
+        Get and remove the entries in the buffer (from the oldest).
+        """
+
+        with self._lock:
+            entries = list(self._entries)
+            self._entries.clear()
+        return entries
+
+
+class LogWriter:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        backup_count: int = 5,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+    ):
+        """
+        Writer of the log entries to a jsonl file (one json object for each entry),
+        in batches. When the file is larger than max_bytes, it's rotated (the old
+        files are renamed to path.1, path.2 and so on).
+
+        :param path: The path of the jsonl file.
+        :param max_bytes: The maximum size of each file. If 0, the file is never
+                          rotated.
+        :param backup_count: The number of old files kept.
+        :param batch_size: The entries collected before writing them.
+        :param flush_interval: The maximum number of seconds the entries are kept
+                               in memory before writing them.
+        """
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+        self._file: Optional[TextIO] = None
+
+    def __enter__(self) -> "LogWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, entries: List[LogEntry]) -> None:
+        dumps = json.dumps
+        self._pending.extend(dumps(entry._asdict()) for entry in entries)
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("\n".join(self._pending) + "\n")
+        self._file.flush()
+        self.written += len(self._pending)
+        self._pending = []
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        self._file.close()  # type: ignore[union-attr]
+        self._file = None
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = "{0}.{1}".format(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, "{0}.{1}".format(self.path, index + 1))
+        os.replace(self.path, "{0}.1".format(self.path))
+
+
+class LogcatCollector:
+    def __init__(
+        self,
+        stream: CommandStream,
+        binary: bool = False,
+        log_filter: Optional[LogFilter] = None,
+        buffer: Optional[LogBuffer] = None,
+        writer: Optional[LogWriter] = None,
+    ):
+        """
+        Collect the entries of a logcat stream in a background thread: the entries
+        accepted by the filter are added to the ring buffer and written with the
+        writer (if any). The output is read as fast as the device sends it, so it's
+        never lost while the consumer is busy, and the memory is bounded by the size
+        of the buffer.
+
+        Usually obtained with ADB.logcat method.
+
+        :param stream: The raw stream with the output of logcat.
+        :param binary: When set to True, the output is in the binary format (logcat
+                       -B), otherwise in the threadtime format.
+        :param log_filter: The filter of the entries (if None, all the entries are
+                           kept).
+        :param buffer: The ring buffer with the most recent entries (if None, a new
+                       buffer with the default capacity).
+        :param writer: The writer of the entries to disk (if None, the entries are
+                       only kept in the buffer).
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self.stream = stream
+        self.binary = binary
+        self.log_filter = log_filter
+        self.buffer = buffer if buffer is not None else LogBuffer()
+        self.writer = writer
+        # The exception that stopped the collection (if any).
+        self.error: Optional[Exception] = None
+
+        self._counters = _Counters()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "LogcatCollector":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "LogcatCollector":
+        """
+        Start collecting the entries (nothing happens if already started).
+        """
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until logcat terminates (e.g., with logcat -d).
+
+        :return: True if logcat terminated, False if the timeout expired.
+        """
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.running
+
+    def close(self) -> None:
+        """
+        Stop logcat and write the pending entries.
+        """
+
+        self.stream.close()
+        self.wait()
+        if self.writer is not None:
+            self.writer.close()
+
+    def stats(self) -> LogcatStats:
+        return LogcatStats(
+            self._counters.entries,
+            self._counters.filtered,
+            self._counters.malformed,
+            self.buffer.evicted,
+            self.writer.written if self.writer is not None else 0,
+        )
+
+    def _run(self) -> None:
+        parse = parse_binary if self.binary else parse_threadtime
+        try:
+            for entries in parse(self.stream, self.log_filter, self._counters):
+                if not entries:
+                    continue
+                self.buffer.extend(entries)
+                if self.writer is not None:
+                    self.writer.write(entries)
+        except Exception as e:
+            if not self.stream.closed:
+                self.logger.error("Error while collecting logcat: {0}".format(e))
+                self.error = e
+        finally:
+            if self.writer is not None:
+                self.writer.flush()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Manifests (size, modification time and optional md5 hash of every file) of the
+# directory trees on the host computer and on the device, used to copy only the
+# files that changed (see ADB.sync_dir).
+
+import hashlib
+import os
+import shlex
+from typing import Dict, List, NamedTuple, Optional
+
+from .sync import TransferResult
+
+# Separates the file list from the hashes in the output of the device command.
+HASH_SEPARATOR = "--- md5 ---"
+
+# Printed by the device command (with this exit code) when the directory doesn't
+# exist (the exit code is not reported by the devices without the shell protocol).
+MANIFEST_MISSING = "--- missing ---"
+MANIFEST_MISSING_EXIT_CODE = 2
+
+
+class FileInfo(NamedTuple):
+    size: int
+    mtime: int
+    md5: Optional[str] = None
+
+
+class DirectorySyncResult(NamedTuple):
+    # The files copied (only the new or changed files).
+    transferred: List[TransferResult]
+    # The relative paths of the files already up to date.
+    unchanged: List[str]
+    # The relative paths of the files deleted from the destination.
+    deleted: List[str]
+
+
+def file_md5(path: str, chunk_size: int = 1024 * 1024) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def local_manifest(directory: str, checksum: bool = False) -> Dict[str, FileInfo]:
+    """
+    Get the manifest of a directory on the host computer.
+
+    :param directory: The directory on the host computer (if it doesn't exist, the
+                      manifest is empty).
+    :param checksum: When set to True, the md5 hash of every file is included.
+    :return: A dictionary with the relative path (with / as separator) and the
+             information of every file in the directory tree.
+    """
+
+    manifest = {}
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            st = os.stat(path)
+            manifest[os.path.relpath(path, directory).replace(os.sep, "/")] = FileInfo(
+                st.st_size, int(st.st_mtime), file_md5(path) if checksum else None
+            )
+    return manifest
+
+
+def remote_manifest_command(directory: str, checksum: bool = False) -> str:
+    """
+    Create the shell command that prints the manifest of a directory on the device
+    with a single invocation (MANIFEST_MISSING is printed and the command fails if
+    the directory doesn't exist).
+    """
+
+    command = "find . -type f -exec stat -c '%s %Y %n' {} +"
+    if checksum:
+        command += "; echo '{0}'; find . -type f -exec md5sum {{}} +".format(
+            HASH_SEPARATOR
+        )
+    return "cd {0} 2>/dev/null || {{ echo '{1}'; exit {2}; }}; {3}".format(
+        shlex.quote(directory), MANIFEST_MISSING, MANIFEST_MISSING_EXIT_CODE, command
+    )
+
+
+def parse_remote_manifest(output: str) -> Dict[str, FileInfo]:
+    """
+    Parse the output of the command created by remote_manifest_command.
+    """
+
+    files, _, hashes = output.partition(HASH_SEPARATOR)
+
+    md5 = {}
+    for line in hashes.splitlines():
+        if line.strip():
+            file_hash, path = line.split(None, 1)
+            md5[path.strip()[2:]] = file_hash
+
+    manifest = {}
+    for line in files.splitlines():
+        if line.strip():
+            size, mtime, path = line.strip().split(" ", 2)
+            # Remove the leading ./ of the paths printed by find.
+            manifest[path[2:]] = FileInfo(int(size), int(mtime), md5.get(path[2:]))
+    return manifest
+
+
+def changed_files(
+    source: Dict[str, FileInfo], destination: Dict[str, FileInfo]
+) -> List[str]:
+    """
+    Get the files of the source manifest missing or different in the destination
+    manifest. The files are compared by size and md5 hash when available, otherwise
+    by size and modification time.
+
+    :return: The sorted relative paths of the files to copy.
+    """
+
+    changed = []
+    for path, info in source.items():
+        other = destination.get(path)
+        if other is None or other.size != info.size:
+            changed.append(path)
+        elif info.md5 and other.md5:
+            if info.md5 != other.md5:
+                changed.append(path)
+        elif info.mtime != other.mtime:
+            changed.append(path)
+    return sorted(changed)
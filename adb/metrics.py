@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+# Instrumentation of the adb commands executed by ADB.execute (latency, bytes and
+# errors of every command), enabled by passing a MetricsRegistry to ADB.
+
+import json
+import subprocess
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Upper bounds (in seconds) of the buckets of the latency histograms.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class CommandMetric(NamedTuple):
+    # The type of the command, e.g., shell, push, install.
+    command: str
+    # The serial number of the device (empty for the default device).
+    device: str
+    # Total duration (in seconds).
+    duration: float
+    # Duration (in seconds) of each phase of the command: spawn (start of the adb
+    # process), run (execution on the device), decode (of the output) and settle
+    # (see adb/settle.py).
+    phases: Dict[str, float]
+    bytes_in: int
+    bytes_out: int
+    # ok, error or timeout.
+    outcome: str
+
+
+# Called (from the thread running the command) after every command.
+MetricsHook = Callable[[CommandMetric], None]
+
+
+class _Series:
+    def __init__(self, buckets: int):
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.duration = 0.0
+        self.buckets = [0] * (buckets + 1)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.phases: Dict[str, float] = {}
+
+
+class CommandMeasurement:
+    def __init__(
+        self, registry: "MetricsRegistry", command: List[str], device: Optional[str]
+    ):
+        """
+        Measurement of a single command, used as a context manager around the
+        execution of the command (the outcome depends on the exception raised).
+        """
+
+        self._registry = registry
+        self._command = command[0] if command else ""
+        self._device = device or ""
+        self._bytes_out = sum(len(token) + 1 for token in command)
+        self._bytes_in = 0
+        self._phases: Dict[str, float] = {}
+        self._start = self._last = time.perf_counter()
+
+    def __enter__(self) -> "CommandMeasurement":
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) -> None:
+        if exception_type is None:
+            outcome = "ok"
+        elif issubclass(exception_type, subprocess.TimeoutExpired):
+            outcome = "timeout"
+        else:
+            outcome = "error"
+        self._registry.record(
+            CommandMetric(
+                self._command,
+                self._device,
+                time.perf_counter() - self._start,
+                self._phases,
+                self._bytes_in,
+                self._bytes_out,
+                outcome,
+            )
+        )
+
+    def mark(self, phase: str) -> None:
+        """
+        End a phase of the command (started at the end of the previous phase).
+        """
+
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def received(self, size: int) -> None:
+        self._bytes_in += size
+
+
+class _DisabledMeasurement(CommandMeasurement):
+    # Used when the metrics are disabled, does nothing.
+
+    def __init__(self):
+        pass
+
+    def __enter__(self) -> "_DisabledMeasurement":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def mark(self, phase: str) -> None:
+        pass
+
+    def received(self, size: int) -> None:
+        pass
+
+
+DISABLED_MEASUREMENT: CommandMeasurement = _DisabledMeasurement()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Metrics of the adb commands, for each type of command (e.g., shell, push)
+        and device: latency histogram, time spent in each phase, bytes sent and
+        received, errors and timeouts. Functions can also be called after every
+        command (see add_hook).
+
+        Usually passed to ADB (e.g., ADB(metrics=MetricsRegistry())) and accessed
+        through ADB.metrics. Without a registry, nothing is measured.
+
+        :param buckets: The upper bounds (in seconds) of the buckets of the latency
+                        histograms.
+        """
+
+        self.buckets = tuple(sorted(buckets))
+
+        # (Command type, device) -> metrics.
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._hooks: List[MetricsHook] = []
+        self._lock = threading.Lock()
+
+    def measure(self, command: List[str], device: Optional[str]) -> CommandMeasurement:
+        """
+        Start measuring a command (see CommandMeasurement).
+        """
+
+        return CommandMeasurement(self, command, device)
+
+    def add_hook(self, hook: MetricsHook) -> None:
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: MetricsHook) -> None:
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def record(self, metric: CommandMetric) -> None:
+        with self._lock:
+            series = self._series.get((metric.command, metric.device))
+            if series is None:
+                series = self._series[(metric.command, metric.device)] = _Series(
+                    len(self.buckets)
+                )
+            series.count += 1
+            series.errors += metric.outcome == "error"
+            series.timeouts += metric.outcome == "timeout"
+            series.duration += metric.duration
+            series.buckets[bisect_left(self.buckets, metric.duration)] += 1
+            series.bytes_in += metric.bytes_in
+            series.bytes_out += metric.bytes_out
+            for phase, duration in metric.phases.items():
+                series.phases[phase] = series.phases.get(phase, 0.0) + duration
+            hooks = list(self._hooks)
+        for hook in hooks:
+            hook(metric)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> List[Dict]:
+        """
+        Get the current value of the metrics.
+
+        :return: A list with the metrics of each type of command and device (the
+                 histogram buckets are cumulative, as in Prometheus).
+        """
+
+        bounds = [_format_bound(bound) for bound in self.buckets + (float("inf"),)]
+        with self._lock:
+            snapshot = []
+            for (command, device), series in sorted(self._series.items()):
+                cumulative, buckets = 0, {}
+                for bound, count in zip(bounds, series.buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                snapshot.append(
+                    {
+                        "command": command,
+                        "device": device,
+                        "count": series.count,
+                        "errors": series.errors,
+                        "timeouts": series.timeouts,
+                        "duration_seconds": series.duration,
+                        "buckets": buckets,
+                        "phase_seconds": dict(series.phases),
+                        "bytes_in": series.bytes_in,
+                        "bytes_out": series.bytes_out,
+                    }
+                )
+        return snapshot
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "adb") -> str:
+        """
+        Export the metrics in the Prometheus text exposition format.
+
+        :param prefix: The prefix of the names of the metrics.
+        """
+
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name: str, kind: str, description: str) -> str:
+            full_name = "{0}_{1}".format(prefix, name)
+            lines.append("# HELP {0} {1}".format(full_name, description))
+            lines.append("# TYPE {0} {1}".format(full_name, kind))
+            return full_name
+
+        def labels(series: Dict, **extra: str) -> str:
+            values = [("command", series["command"]), ("device", series["device"])]
+            values.extend(extra.items())
+            return ",".join(
+                '{0}="{1}"'.format(key, _escape_label(value)) for key, value in values
+            )
+
+        name = family(
+            "command_duration_seconds", "histogram", "Duration of the commands."
+        )
+        for series in snapshot:
+            for bound, count in series["buckets"].items():
+                lines.append(
+                    "{0}_bucket{{{1}}} {2}".format(
+                        name, labels(series, le=bound), count
+                    )
+                )
+            lines.append(
+                "{0}_sum{{{1}}} {2}".format(
+                    name, labels(series), series["duration_seconds"]
+                )
+            )
+            lines.append(
+                "{0}_count{{{1}}} {2}".format(name, labels(series), series["count"])
+            )
+
+        name = family(
+            "command_phase_seconds_total", "counter", "Time spent in each phase."
+        )
+        for series in snapshot:
+            for phase, duration in sorted(series["phase_seconds"].items()):
+                lines.append(
+                    "{0}{{{1}}} {2}".format(name, labels(series, phase=phase), duration)
+                )
+
+        for key, metric, description in (
+            ("bytes_in", "received_bytes_total", "Bytes of output received."),
+            ("bytes_out", "sent_bytes_total", "Bytes of command sent."),
+            ("errors", "command_errors_total", "Commands failed."),
+            ("timeouts", "command_timeouts_total", "Commands timed out."),
+        ):
+            name = family(metric, "counter", description)
+            for series in snapshot:
+                lines.append("{0}{{{1}}} {2}".format(name, labels(series), series[key]))
+
+        return "\n".join(lines) + "\n"
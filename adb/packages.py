@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+import re
+import shlex
+import subprocess
+import threading
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+# Path, uid and version code of every package (the last two options are available
+# since Android 9, the older devices only get the path).
+PACKAGE_LIST_FLAGS = ["-f", "-U", "--show-versioncode"]
+_LEGACY_PACKAGE_LIST_FLAGS = ["-f"]
+
+
+class PackageInfo(NamedTuple):
+    name: str
+    # The path of the base apk on the device.
+    path: str
+    version_code: Optional[int] = None
+    uid: Optional[int] = None
+    # Only available with the details from dumpsys.
+    version_name: Optional[str] = None
+    target_sdk: Optional[int] = None
+    first_install_time: Optional[str] = None
+    last_update_time: Optional[str] = None
+
+
+class PackageDiff(NamedTuple):
+    # The packages only in the second list.
+    added: List[str]
+    # The packages only in the first list.
+    removed: List[str]
+    # The packages in both lists, with a different version code or path.
+    changed: List[str]
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    # E.g., "10100" or "10100,10101" (uid of more users).
+    if value is None:
+        return None
+    value = value.split(",")[0]
+    return int(value) if value.isdigit() else None
+
+
+def parse_package_list(output: str) -> Dict[str, PackageInfo]:
+    """
+    Parse the output of pm list packages -f [-U --show-versioncode], e.g.,
+    "package:/data/app/com.example-1/base.apk=com.example versionCode:12 uid:10100".
+    """
+
+    packages = {}
+    for line in output.splitlines():
+        tokens = line.strip().split(" ")
+        if not tokens[0].startswith("package:") or "=" not in tokens[0]:
+            continue
+        # The path can contain "=" too, the package name never.
+        path, _, name = tokens[0][len("package:") :].rpartition("=")
+        details = dict(token.split(":", 1) for token in tokens[1:] if ":" in token)
+        packages[name] = PackageInfo(
+            name,
+            path,
+            _optional_int(details.get("versionCode")),
+            _optional_int(details.get("uid")),
+        )
+    return packages
+
+
+def parse_dumpsys_packages(output: str) -> Dict[str, Dict[str, str]]:
+    """
+    Parse the details of the packages printed by dumpsys package packages.
+
+    :return: A dictionary with the name of each package as key and its details
+             (e.g., versionName, targetSdk, firstInstallTime) as value.
+    """
+
+    packages: Dict[str, Dict[str, str]] = {}
+    details: Optional[Dict[str, str]] = None
+    for line in output.splitlines():
+        if line.startswith("Hidden system packages"):
+            # The older versions of the updated system packages.
+            break
+        match = re.match(r"\s*Package \[(.+?)\]", line)
+        if match:
+            details = packages.setdefault(match.group(1), {})
+            continue
+        if details is None:
+            continue
+        line = line.strip()
+        if line.startswith(("firstInstallTime=", "lastUpdateTime=")):
+            # The value contains a space (e.g., 2024-01-02 03:04:05).
+            key, _, value = line.partition("=")
+            details.setdefault(key, value)
+        else:
+            for token in line.split():
+                key, separator, value = token.partition("=")
+                if separator:
+                    details.setdefault(key, value)
+    return packages
+
+
+def diff_packages(
+    old: Dict[str, PackageInfo], new: Dict[str, PackageInfo]
+) -> PackageDiff:
+    """
+    Compare two lists of packages (e.g., of two devices, or of the same device at
+    different times).
+    """
+
+    return PackageDiff(
+        sorted(name for name in new if name not in old),
+        sorted(name for name in old if name not in new),
+        sorted(
+            name
+            for name, info in new.items()
+            if name in old
+            and (old[name].version_code, old[name].path)
+            != (info.version_code, info.path)
+        ),
+    )
+
+
+class PackageIndex:
+    def __init__(self, adb: "ADB"):
+        """
+        Index of the packages installed on the Android devices, loaded all at once
+        with a single pm list packages command and then kept up to date after each
+        installation and uninstallation made through the ADB instance (only the
+        changed packages are loaded again).
+
+        Usually accessed through ADB.packages.
+
+        :param adb: The ADB instance used to list the packages.
+        """
+
+        self._adb = adb
+
+        # Serial number of the device -> package name -> package.
+        self._packages: Dict[Optional[str], Dict[str, PackageInfo]] = {}
+        # Serial number of the device -> options supported by pm list packages.
+        self._flags: Dict[Optional[str], List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _list(
+        self,
+        packages: List[str],
+        device: Optional[str],
+        timeout: Optional[int],
+    ) -> Dict[str, PackageInfo]:
+        # All the packages, or only the packages whose names contain one of the
+        # requested names (the filter of pm list packages).
+        with self._lock:
+            flags = self._flags.get(device, PACKAGE_LIST_FLAGS)
+        command = " ".join(["pm", "list", "packages"] + flags)
+        if packages:
+            command = 'for p in {0}; do {1} "$p"; done'.format(
+                " ".join(shlex.quote(package) for package in packages), command
+            )
+        try:
+            output: str = self._adb.shell([command], timeout=timeout, device=device)  # type: ignore[assignment]
+        except subprocess.CalledProcessError as e:
+            output = e.output.decode(errors="backslashreplace") if e.output else ""
+            if flags == _LEGACY_PACKAGE_LIST_FLAGS or "Unknown option" not in output:
+                raise
+        if flags != _LEGACY_PACKAGE_LIST_FLAGS and "Unknown option" in output:
+            with self._lock:
+                self._flags[device] = _LEGACY_PACKAGE_LIST_FLAGS
+            return self._list(packages, device, timeout)
+        return parse_package_list(output)
+
+    def is_loaded(self, device: Optional[str] = None) -> bool:
+        """
+        Check if the packages of a device were loaded (and so are kept up to date).
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            return device in self._packages
+
+    def load(
+        self,
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+        details: bool = False,
+    ) -> Dict[str, PackageInfo]:
+        """
+        Load (again) all the packages installed on a device.
+
+        :param device: The serial number of the device. If None, the target device
+                       of the ADB instance is used.
+        :param timeout: How many seconds to wait for the commands to finish
+                        execution before throwing an exception.
+        :param details: When set to True, also the details of the packages (e.g.,
+                        version name, install time) are loaded, with a single
+                        dumpsys package command.
+        :return: A dictionary with the name of each package as key.
+        """
+
+        device = device or self._adb.target_device
+
+        packages = self._list([], device, timeout)
+        if details:
+            output: str = self._adb.shell(
+                ["dumpsys", "package", "packages"], timeout=timeout, device=device
+            )  # type: ignore[assignment]
+            for name, extra in parse_dumpsys_packages(output).items():
+                if name in packages:
+                    packages[name] = packages[name]._replace(
+                        version_code=packages[name].version_code
+                        or _optional_int(extra.get("versionCode")),
+                        uid=packages[name].uid or _optional_int(extra.get("userId")),
+                        version_name=extra.get("versionName"),
+                        target_sdk=_optional_int(extra.get("targetSdk")),
+                        first_install_time=extra.get("firstInstallTime"),
+                        last_update_time=extra.get("lastUpdateTime"),
+                    )
+
+        with self._lock:
+            self._packages[device] = packages
+        return dict(packages)
+
+    def snapshot(
+        self, device: Optional[str] = None, timeout: Optional[int] = None
+    ) -> Dict[str, PackageInfo]:
+        """
+        Get all the packages installed on a device (loaded only the first time).
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            packages = self._packages.get(device)
+        if packages is None:
+            return self.load(device, timeout)
+        return dict(packages)
+
+    def get(
+        self,
+        name: str,
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+    ) -> Optional[PackageInfo]:
+        """
+        Get an installed package.
+
+        :param name: The package name.
+        :return: The package, or None if the package is not installed.
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            packages = self._packages.get(device)
+        if packages is None:
+            packages = self.load(device, timeout)
+        return packages.get(name)
+
+    def is_installed(
+        self,
+        name: str,
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+    ) -> bool:
+        return self.get(name, device, timeout) is not None
+
+    def diff(
+        self,
+        device: Optional[str],
+        other_device: Optional[str],
+        timeout: Optional[int] = None,
+    ) -> PackageDiff:
+        """
+        Compare the packages installed on two devices.
+        """
+
+        return diff_packages(
+            self.snapshot(device, timeout), self.snapshot(other_device, timeout)
+        )
+
+    def refresh(
+        self,
+        names: List[str],
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+    ) -> None:
+        """
+        Load again only some packages (e.g., after installing them), with a single
+        command. Nothing happens if the packages of the device were never loaded.
+        """
+
+        device = device or self._adb.target_device
+
+        if not names or not self.is_loaded(device):
+            return
+        found = self._list(names, device, timeout)
+        with self._lock:
+            packages = self._packages.get(device)
+            if packages is None:
+                return
+            for name in names:
+                if name in found:
+                    packages[name] = found[name]
+                else:
+                    packages.pop(name, None)
+
+    def remove(self, name: str, device: Optional[str] = None) -> None:
+        """
+        Forget a package (e.g., after uninstalling it).
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            self._packages.get(device, {}).pop(name, None)
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """
+        Forget the packages of a device, they will be loaded again when needed.
+
+        :param device: The serial number of the device. If None, the packages of all
+                       the devices are forgotten.
+        """
+
+        with self._lock:
+            if device is None:
+                self._packages.clear()
+            else:
+                self._packages.pop(device, None)
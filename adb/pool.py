@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .adb import ADB
+
+
+class DevicePool:
+    def __init__(
+        self,
+        devices: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        debug: bool = False,
+        **adb_options: Any,
+    ):
+        """
+        Run the same adb operation on many Android devices at the same time.
+
+        Every operation returns a dictionary with the serial number of each device as
+        key and the result of the operation on that device as value. If the operation
+        fails on a device, the exception is returned as value instead of being raised,
+        so a failing device doesn't affect the others.
+
+        :param devices: The serial numbers of the devices. If None, all the devices
+                        currently connected to adb are used.
+        :param max_workers: The maximum number of devices on which an operation runs
+                            at the same time. If None, all the devices are used at
+                            the same time.
+        :param debug: When set to True, more debug messages will be shown for each
+                      executed operation.
+        :param adb_options: Other parameters for the ADB instance shared by the
+                            devices of the pool (e.g., backend="native").
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        if debug:
+            self.logger.setLevel(logging.DEBUG)
+
+        # A single ADB instance is used by all the worker threads, the device is
+        # selected for each command.
+        self.adb = ADB(debug=debug, **adb_options)
+
+        if devices is None:
+            devices = self.adb.get_available_devices()
+
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError("The maximum number of workers must be a positive integer")
+
+        self.devices: List[str] = list(devices)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(len(self.devices), 1),
+            thread_name_prefix="DevicePool",
+        )
+
+    def __enter__(self) -> "DevicePool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Wait for the running operations and release the worker threads.
+        """
+
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, operation: Callable[[ADB, str], Any]) -> Dict["Future[Any]", str]:
+        return {
+            self._executor.submit(operation, self.adb, device): device
+            for device in self.devices
+        }
+
+    def as_completed(
+        self, operation: Callable[[ADB, str], Any]
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Run an operation on all the devices and get the results as soon as each
+        device finishes, so a slow device doesn't delay the results of the others.
+
+        :param operation: The operation to run, a function that receives the ADB
+                          instance and the serial number of a device (e.g., lambda
+                          adb, device: adb.shell(["ls"], device=device)).
+        :return: An iterator of (device serial number, result or exception) tuples,
+                 in completion order.
+        """
+
+        futures = self._submit(operation)
+        for future in as_completed(futures):
+            device = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                self.logger.error(
+                    "Operation failed on device {0}: {1}".format(device, e)
+                )
+                result = e
+            else:
+                self.logger.debug("Operation completed on device {0}".format(device))
+            yield device, result
+
+    def run(self, operation: Callable[[ADB, str], Any]) -> Dict[str, Any]:
+        """
+        Run an operation on all the devices and wait for all of them to finish.
+
+        :param operation: The operation to run, a function that receives the ADB
+                          instance and the serial number of a device (e.g., lambda
+                          adb, device: adb.shell(["ls"], device=device)).
+        :return: A dictionary with the result (or the exception) of each device.
+        """
+
+        results = dict(self.as_completed(operation))
+        return {device: results[device] for device in self.devices}
+
+    def shell(
+        self, command: List[str], timeout: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute an adb shell command on all the devices.
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        on each device before throwing an exception.
+        :return: A dictionary with the (string) output of the command (or the
+                 exception) of each device.
+        """
+
+        return self.run(
+            lambda adb, device: adb.shell(command, timeout=timeout, device=device)
+        )
+
+    def reboot(self, timeout: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Reboot all the devices.
+
+        :param timeout: How many seconds to wait for the command to finish execution
+                        on each device before throwing an exception.
+        :return: A dictionary with the result (or the exception) of each device.
+        """
+
+        return self.run(lambda adb, device: adb.reboot(timeout=timeout, device=device))
+
+    def push_file(
+        self,
+        host_path: Union[str, List[str]],
+        device_path: str,
+        timeout: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Copy a file (or a list of files) from the computer to all the devices.
+
+        :param host_path: The path of the file on the host computer (or a list of
+                          paths).
+        :param device_path: The path on the Android devices where the file(s) should
+                            be copied.
+        :param timeout: How many seconds to wait for the file copy operation on each
+                        device before throwing an exception.
+        :return: A dictionary with the result of the copy operation (or the
+                 exception) of each device.
+        """
+
+        return self.run(
+            lambda adb, device: adb.push_file(
+                host_path, device_path, timeout, device=device
+            )
+        )
+
+    def pull_file(
+        self,
+        device_path: Union[str, List[str]],
+        host_path: str,
+        timeout: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Copy a file (or a list of files) from all the devices to the computer. The
+        files of each device are copied into a different subdirectory of host_path,
+        named after the serial number of the device (and created if missing).
+
+        :param device_path: The path of the file on the Android devices (or a list of
+                            paths).
+        :param host_path: The existing directory on the host computer where the
+                          subdirectories of the devices will be created.
+        :param timeout: How many seconds to wait for the file copy operation on each
+                        device before throwing an exception.
+        :return: A dictionary with the result of the copy operation (or the
+                 exception) of each device.
+        """
+
+        if not os.path.isdir(host_path):
+            raise NotADirectoryError(
+                "The destination host directory '{0}' was not found".format(host_path)
+            )
+
+        def pull(adb: ADB, device: str) -> str:
+            # Serial numbers of network devices contain characters (e.g., ":") not
+            # allowed in directory names on every platform.
+            device_dir = os.path.join(host_path, re.sub(r"[^\w.-]", "_", device))
+            os.makedirs(device_dir, exist_ok=True)
+            return adb.pull_file(
+                device_path,
+                device_dir if isinstance(device_path, list) else device_dir + os.sep,
+                timeout,
+                device=device,
+            )
+
+        return self.run(pull)
+
+    def install_app(
+        self,
+        apk_path: str,
+        replace_existing: bool = False,
+        grant_permissions: bool = False,
+        timeout: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Install an application into all the devices.
+
+        :param apk_path: The path on the host computer to the application file to be
+                         installed.
+        :param replace_existing: When set to True, any old version of the application
+                                 will be replaced by the new application.
+        :param grant_permissions: When set to True, all the runtime permissions of the
+                                  application will be granted.
+        :param timeout: How many seconds to wait for the installation operation on
+                        each device before throwing an exception.
+        :return: A dictionary with the result of the installation operation (or the
+                 exception) of each device.
+        """
+
+        return self.run(
+            lambda adb, device: adb.install_app(
+                apk_path, replace_existing, grant_permissions, timeout, device=device
+            )
+        )
+
+    def uninstall_app(
+        self, package_name: str, timeout: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Uninstall an application from all the devices.
+
+        :param package_name: The package name of the application to uninstall.
+        :param timeout: How many seconds to wait for the uninstallation operation on
+                        each device before throwing an exception.
+        :return: A dictionary with the result of the uninstallation operation (or the
+                 exception) of each device.
+        """
+
+        return self.run(
+            lambda adb, device: adb.uninstall_app(package_name, timeout, device=device)
+        )
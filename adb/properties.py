@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .commands import parse_properties
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+
+class PropertyCache:
+    def __init__(self, adb: "ADB", ttl: float = 5.0):
+        """
+        Cache of the system properties of the Android devices, loaded all at once
+        with a single getprop command. The read-only properties (ro.*) don't change
+        until the device reboots, so they are kept until the cache is invalidated
+        (ADB.reboot and ADB.remount do it automatically). The other properties are
+        loaded again when older than ttl seconds.
+
+        Usually accessed through ADB.properties.
+
+        :param adb: The ADB instance used to read the properties.
+        :param ttl: How many seconds the values of the mutable properties are valid.
+                    With 0, the mutable properties are never cached.
+        """
+
+        self._adb = adb
+        self.ttl = ttl
+
+        # Serial number of the device -> (load time, all the properties).
+        self._snapshots: Dict[Optional[str], Tuple[float, Dict[str, str]]] = {}
+        # Serial number of the device -> read-only properties.
+        self._read_only: Dict[Optional[str], Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(
+        self,
+        device: Optional[str] = None,
+        timeout: Optional[int] = None,
+        refresh: bool = False,
+    ) -> Dict[str, str]:
+        """
+        Get all the properties of a device.
+
+        :param device: The serial number of the device. If None, the target device
+                       of the ADB instance is used.
+        :param timeout: How many seconds to wait for the getprop command (if needed)
+                        to finish execution before throwing an exception.
+        :param refresh: When set to True, the properties are always loaded again from
+                        the device.
+        :return: A dictionary with the name and the value of each property.
+        """
+
+        device = device or self._adb.target_device
+
+        with self._lock:
+            cached = self._snapshots.get(device)
+        if (
+            not refresh
+            and cached is not None
+            and time.monotonic() - cached[0] < self.ttl
+        ):
+            return dict(cached[1])
+
+        output: str = self._adb.shell(["getprop"], timeout=timeout, device=device)  # type: ignore[assignment]
+        properties = parse_properties(output)
+
+        with self._lock:
+            self._snapshots[device] = (time.monotonic(), properties)
+            self._read_only[device] = {
+                name: value
+                for name, value in properties.items()
+                if name.startswith("ro.")
+            }
+        return dict(properties)
+
+    def get(
+        self, name: str, device: Optional[str] = None, timeout: Optional[int] = None
+    ) -> str:
+        """
+        Get the value of a property of a device.
+
+        :param name: The name of the property.
+        :param device: The serial number of the device. If None, the target device
+                       of the ADB instance is used.
+        :param timeout: How many seconds to wait for the getprop command (if needed)
+                        to finish execution before throwing an exception.
+        :return: The value of the property (an empty string if the property is not
+                 set, same as getprop).
+        """
+
+        device = device or self._adb.target_device
+
+        if name.startswith("ro."):
+            with self._lock:
+                read_only = self._read_only.get(device)
+            if read_only is None:
+                read_only = self.snapshot(device, timeout)
+            return read_only.get(name, "")
+
+        if not self.ttl:
+            # Reading a single property is faster than reading all of them.
+            value: str = self._adb.shell(
+                ["getprop", name], timeout=timeout, device=device
+            )  # type: ignore[assignment]
+            return value
+
+        return self.snapshot(device, timeout).get(name, "")
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """
+        Forget the cached properties of a device (e.g., after a reboot).
+
+        :param device: The serial number of the device. If None, the properties of
+                       all the devices are forgotten.
+        """
+
+        with self._lock:
+            if device is None:
+                self._snapshots.clear()
+                self._read_only.clear()
+            else:
+                self._snapshots.pop(device, None)
+                self._read_only.pop(device, None)
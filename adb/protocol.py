@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import socket
+import struct
+import time
+from typing import Optional, Tuple
+
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 5037
+
+# Identifiers of the packets exchanged with the shell protocol (shell,v2).
+SHELL_ID_STDIN = 0
+SHELL_ID_STDOUT = 1
+SHELL_ID_STDERR = 2
+SHELL_ID_EXIT = 3
+SHELL_ID_CLOSE_STDIN = 4
+
+
+class AdbProtocolError(RuntimeError):
+    """
+    Error reported by the adb server (FAIL reply), or unexpected data received while
+    talking with the adb server.
+    """
+
+
+class AdbConnection:
+    def __init__(
+        self,
+        host: str = DEFAULT_SERVER_HOST,
+        port: int = DEFAULT_SERVER_PORT,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Open a connection with the adb server, using the adb smart-socket protocol
+        (every request is a string prefixed by its length as 4 hex digits, and every
+        reply starts with an OKAY or FAIL status).
+
+        :param host: The host where the adb server is listening.
+        :param port: The port where the adb server is listening.
+        :param timeout: How many seconds this connection can be used (in total)
+                        before throwing a timeout exception. If None, the connection
+                        will block until the adb server replies.
+        """
+
+        self._deadline = time.monotonic() + timeout if timeout else None
+        self._socket = socket.create_connection(
+            (host, port), timeout=self._remaining_time()
+        )
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def __enter__(self) -> "AdbConnection":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _remaining_time(self) -> Optional[float]:
+        if self._deadline is None:
+            return None
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("Timed out while talking with the adb server")
+        return remaining
+
+    def fileno(self) -> int:
+        return self._socket.fileno()
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def shutdown_write(self) -> None:
+        """
+        Signal the end of the data sent to the adb server, while still receiving.
+        """
+
+        self._socket.shutdown(socket.SHUT_WR)
+
+    def send(self, request: str) -> None:
+        """
+        Send a request to the adb server, prefixed by its length.
+
+        :param request: The request to send (e.g., host:version).
+        """
+
+        payload = request.encode()
+        self.sendall("{0:04x}".format(len(payload)).encode() + payload)
+
+    def sendall(self, data: bytes) -> None:
+        self._socket.settimeout(self._remaining_time())
+        self._socket.sendall(data)
+
+    def recv(self, size: int) -> bytes:
+        """
+        Receive at most size bytes from the adb server. An empty result means the
+        adb server closed the connection.
+        """
+
+        self._socket.settimeout(self._remaining_time())
+        return self._socket.recv(size)
+
+    def recv_into(self, buffer) -> int:
+        """
+        Receive data directly into a writable buffer, without intermediate copies.
+        A result of 0 means the adb server closed the connection.
+        """
+
+        self._socket.settimeout(self._remaining_time())
+        return self._socket.recv_into(buffer)
+
+    def read_exactly(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.recv(size - len(data))
+            if not chunk:
+                raise AdbProtocolError(
+                    "Connection closed by the adb server ({0} bytes missing)".format(
+                        size - len(data)
+                    )
+                )
+            data.extend(chunk)
+        return bytes(data)
+
+    def read_exactly_into(self, buffer: memoryview) -> None:
+        """
+        Fill a writable buffer with data received from the adb server, without
+        intermediate copies.
+        """
+
+        received = 0
+        while received < len(buffer):
+            size = self.recv_into(buffer[received:])
+            if not size:
+                raise AdbProtocolError(
+                    "Connection closed by the adb server ({0} bytes missing)".format(
+                        len(buffer) - received
+                    )
+                )
+            received += size
+
+    def read_all(self) -> bytes:
+        """
+        Read everything the adb server sends until the connection is closed.
+        """
+
+        data = bytearray()
+        while True:
+            chunk = self.recv(65536)
+            if not chunk:
+                return bytes(data)
+            data.extend(chunk)
+
+    def read_string(self) -> str:
+        """
+        Read a string prefixed by its length (as 4 hex digits).
+        """
+
+        length = self.read_exactly(4)
+        try:
+            size = int(length, 16)
+        except ValueError:
+            raise AdbProtocolError("Invalid length received: {0!r}".format(length))
+        return self.read_exactly(size).decode(errors="backslashreplace")
+
+    def read_status(self) -> None:
+        """
+        Read the status of the last request and raise an exception if the adb server
+        replied with FAIL.
+        """
+
+        status = self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        elif status == b"FAIL":
+            raise AdbProtocolError(self.read_string())
+        else:
+            raise AdbProtocolError("Unexpected status received: {0!r}".format(status))
+
+    def request(self, request: str) -> None:
+        """
+        Send a request to the adb server and make sure it was accepted.
+
+        :param request: The request to send (e.g., host:transport:<serial>).
+        """
+
+        self.send(request)
+        self.read_status()
+
+    def read_shell_packet(self) -> Optional[Tuple[int, bytes]]:
+        """
+        Read a packet sent with the shell protocol (shell,v2).
+
+        :return: A tuple with the packet identifier and the packet data, or None if
+                 the connection was closed.
+        """
+
+        self._socket.settimeout(self._remaining_time())
+        header = self._socket.recv(5)
+        if not header:
+            return None
+        if len(header) < 5:
+            header += self.read_exactly(5 - len(header))
+        packet_id, size = struct.unpack("<BI", header)
+        return packet_id, self.read_exactly(size)
+
+    def send_shell_packet(self, packet_id: int, data: bytes = b"") -> None:
+        self.sendall(struct.pack("<BI", packet_id, len(data)) + data)
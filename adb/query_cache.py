@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Method, serial number of the device and arguments.
+_QueryKey = Tuple[str, Optional[str], Tuple[str, ...]]
+
+# How many seconds the result of each cached method is valid. The results are also
+# forgotten when a method changing the state of the device (e.g., install_app,
+# reboot) runs through the same ADB instance.
+DEFAULT_QUERY_TTLS: Dict[str, float] = {
+    "get_version": 300.0,
+    "get_available_devices": 2.0,
+    "get_device_sdk_version": 300.0,
+    "get_package_path": 60.0,
+    "get_setting": 5.0,
+}
+
+
+class QueryStats(NamedTuple):
+    hits: int
+    misses: int
+    # The results removed because the cache was full.
+    evictions: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class QueryCache:
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 256):
+        """
+        Cache of the results of the ADB methods that only query the state of adb or
+        of the devices (e.g., get_version, get_setting), keyed by method, device
+        and arguments. Every method has its own ttl and, when the cache is full, the
+        least recently used results are removed first.
+
+        Passed to ADB constructor (opt-in), which invalidates it when a method
+        changing the state of a device runs (install_app, uninstall_app, reboot,
+        remount, kill_server and connect).
+
+        :param ttls: How many seconds the result of each method is valid (the
+                     methods not in the dictionary are never cached). If None,
+                     DEFAULT_QUERY_TTLS.
+        :param max_entries: The maximum number of results kept.
+        """
+
+        if max_entries <= 0:
+            raise ValueError("The maximum number of entries must be a positive integer")
+
+        self.ttls = dict(DEFAULT_QUERY_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+
+        # Query -> (expiration time, result), from the least recently used.
+        self._entries: "OrderedDict[_QueryKey, Tuple[float, Any]]" = OrderedDict()
+        # Method -> [hits, misses, evictions].
+        self._counters: Dict[str, List[int]] = {}
+        # Increased by every invalidation, so that a result loaded while the cache
+        # was invalidated is not stored.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _count(self, method: str, index: int) -> None:
+        self._counters.setdefault(method, [0, 0, 0])[index] += 1
+
+    def get(
+        self,
+        method: str,
+        device: Optional[str],
+        arguments: List[str],
+        load: Callable[[], T],
+    ) -> T:
+        """
+        Get the cached result of a method, or load it (and cache it) if missing or
+        expired.
+
+        :param method: The name of the method (its ttl is used).
+        :param device: The serial number of the device, None if the result doesn't
+                       depend on a device.
+        :param arguments: The arguments identifying the result (e.g., the package
+                          name).
+        :param load: Function loading the result (its exceptions are not cached).
+        :return: The result.
+        """
+
+        ttl = self.ttls.get(method, 0)
+        if ttl <= 0:
+            return load()
+
+        key: _QueryKey = (method, device, tuple(arguments))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(method, 0)
+                return entry[1]
+            self._count(method, 1)
+            generation = self._generation
+
+        value = load()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._count(evicted[0], 2)
+        return value
+
+    def invalidate(self, device: Optional[str] = None) -> None:
+        """
+        Forget the cached results of a device.
+
+        :param device: The serial number of the device (the results not depending
+                       on a device, e.g., the list of the available devices, are
+                       forgotten too). If None, all the results are forgotten.
+        """
+
+        with self._lock:
+            self._generation += 1
+            if device is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[1] in (device, None)]:
+                del self._entries[key]
+
+    def stats(self, method: Optional[str] = None) -> QueryStats:
+        """
+        Get the number of hits, misses and evictions.
+
+        :param method: The name of the method. If None, the totals of all the
+                       methods.
+        """
+
+        with self._lock:
+            if method is not None:
+                return QueryStats(*self._counters.get(method, [0, 0, 0]))
+            return QueryStats(
+                *(sum(values) for values in zip([0, 0, 0], *self._counters.values()))
+            )
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters.clear()
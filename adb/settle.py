@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+# How many seconds to wait for the effects of a command to settle, when the command
+# has no timeout.
+DEFAULT_SETTLE_TIMEOUT = 30
+
+# How many seconds a single query of the device state can take.
+STATE_QUERY_TIMEOUT = 10
+
+
+class SettlePolicy(ABC):
+    """
+    Decide what to wait for after an adb command returned its output, before the
+    execution continues with the next command.
+    """
+
+    @abstractmethod
+    def settle(
+        self,
+        adb: "ADB",
+        command: List[str],
+        process: Optional[subprocess.Popen] = None,
+        device: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Wait until the effects of an adb command are settled.
+
+        :param adb: The ADB instance that executed the command.
+        :param command: The command that was executed, formatted as a list of
+                        strings.
+        :param process: The adb process that executed the command, or None if the
+                        command was not executed by a new process (e.g., with the
+                        native backend).
+        :param device: The serial number of the device targeted by the command (None
+                       if adb chose the only device connected).
+        :param timeout: The timeout of the command (if any), the policies waiting for
+                        a condition use it as the maximum wait.
+        """
+
+
+class NoWait(SettlePolicy):
+    """
+    Continue immediately after the output of the command was received.
+    """
+
+    def settle(self, adb, command, process=None, device=None, timeout=None) -> None:
+        pass
+
+
+class WaitForExit(SettlePolicy):
+    """
+    Make sure the adb process terminated and was reaped before continuing (this is
+    the default policy, it doesn't add any delay once the output was received).
+    """
+
+    def settle(self, adb, command, process=None, device=None, timeout=None) -> None:
+        if process is not None:
+            process.wait()
+
+
+class FixedDelay(SettlePolicy):
+    def __init__(self, delay: float = 1.0):
+        """
+        Always wait for a fixed amount of time (this was the behavior of the
+        previous versions, with a delay of 1 second).
+
+        :param delay: How many seconds to wait after every command.
+        """
+
+        self.delay = delay
+
+    def settle(self, adb, command, process=None, device=None, timeout=None) -> None:
+        WaitForExit().settle(adb, command, process)
+        time.sleep(self.delay)
+
+
+class PollUntil(SettlePolicy):
+    def __init__(
+        self,
+        check: Callable[["ADB", Optional[str]], bool],
+        interval: float = 0.2,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Poll a readiness check until it succeeds, for the commands whose effects
+        are not completed when the adb command returns (e.g., reboot).
+
+        :param check: Function receiving the ADB instance and the serial number of
+                      the device, and returning True when the command effects are
+                      settled.
+        :param interval: How many seconds to wait between two checks.
+        :param timeout: How many seconds to wait for the check to succeed before
+                        throwing an exception. If None, the timeout of the command is
+                        used (DEFAULT_SETTLE_TIMEOUT if the command has no timeout).
+        """
+
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+
+    def settle(self, adb, command, process=None, device=None, timeout=None) -> None:
+        WaitForExit().settle(adb, command, process)
+        deadline = PollDeadline(command, settle_timeout(self.timeout, timeout))
+        while not self.check(adb, device):
+            deadline.check()
+            time.sleep(self.interval)
+
+
+def settle_timeout(
+    policy_timeout: Optional[float], command_timeout: Optional[float]
+) -> float:
+    """
+    The maximum wait of a polling policy: its own timeout, otherwise the timeout of
+    the command, otherwise DEFAULT_SETTLE_TIMEOUT.
+    """
+
+    if policy_timeout is not None:
+        return policy_timeout
+    if command_timeout is not None:
+        return command_timeout
+    return DEFAULT_SETTLE_TIMEOUT
+
+
+class PollDeadline:
+    def __init__(self, command: List[str], timeout: float):
+        """
+        Deadline of a polling loop (shared by PollUntil and the polling of
+        AsyncADB).
+
+        :param command: The command whose effects are awaited (reported by the
+                        exception).
+        :param timeout: How many seconds the polling can last.
+        """
+
+        self.command = command
+        self.timeout = timeout
+        self._deadline = time.monotonic() + timeout
+
+    def check(self) -> None:
+        """
+        Throw subprocess.TimeoutExpired if the deadline has passed.
+        """
+
+        if time.monotonic() >= self._deadline:
+            raise subprocess.TimeoutExpired(self.command, self.timeout)
+
+
+def is_online(state: str) -> bool:
+    # The state printed by adb get-state when the device is ready (an empty state
+    # means that the device is not connected).
+    return state == "device"
+
+
+def is_offline(state: str) -> bool:
+    return not is_online(state)
+
+
+def device_offline(adb: "ADB", device: Optional[str] = None) -> bool:
+    """
+    Readiness check succeeding when the device is no longer available (e.g., when
+    it started rebooting).
+    """
+
+    return is_offline(adb.get_state(STATE_QUERY_TIMEOUT, device))
+
+
+def device_online(adb: "ADB", device: Optional[str] = None) -> bool:
+    """
+    Readiness check succeeding when the device is ready to receive commands.
+    """
+
+    return is_online(adb.get_state(STATE_QUERY_TIMEOUT, device))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import logging
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from .channels import ProcessChannel, SocketChannel
+from .commands import validate_command, validate_timeout
+
+if TYPE_CHECKING:
+    from .adb import ADB
+
+
+class ShellSession:
+    def __init__(self, adb: "ADB", device: Optional[str] = None):
+        """
+        Long-lived remote shell used to run many commands one after the other,
+        without starting a new adb shell for every command. Each command runs in a
+        subshell, so changes to the shell state (e.g., cd) are not kept between
+        commands. The session is opened on the first command and reopened
+        automatically if the device drops.
+
+        Usually obtained with ADB.shell_session method.
+
+        :param adb: The ADB instance used to open the remote shell.
+        :param device: The serial number of the device. If None, the target device
+                       of the ADB instance is used.
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+        self.logger.setLevel(adb.logger.level)
+
+        self._adb = adb
+        self.device = device or adb.target_device
+
+        self._channel: Optional[Union[ProcessChannel, SocketChannel]] = None
+        self._lines: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ShellSession":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._channel is not None
+
+    def _open(self) -> None:
+        client = self._adb._server_client
+        if client is not None:
+            connection, shell_v2 = client.open_shell(self.device, "sh")
+            self._channel = SocketChannel(connection, shell_v2)
+        else:
+            command = [self._adb.adb_path]
+            if self.device:
+                command.extend(["-s", self.device])
+            command.extend(["shell", "sh"])
+            self._channel = ProcessChannel(command, stdin=True)
+
+        self.logger.debug("Shell session opened (device={0})".format(self.device))
+
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read_lines, args=(self._channel, self._lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read_lines(channel, lines: "queue.Queue[Optional[bytes]]") -> None:
+        buffer = b""
+        try:
+            while True:
+                chunk = channel.read()
+                if not chunk:
+                    break
+                buffer += chunk
+                *complete, buffer = buffer.split(b"\n")
+                for line in complete:
+                    lines.put(line)
+        except (OSError, ValueError):
+            # The session was closed.
+            pass
+        if buffer:
+            lines.put(buffer)
+        # End of the session.
+        lines.put(None)
+
+    def close(self) -> None:
+        """
+        Close the remote shell (a new one will be opened by the next command).
+        """
+
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+            self.logger.debug("Shell session closed (device={0})".format(self.device))
+
+    def _send(self, data: bytes) -> None:
+        # If the session was dropped before sending the command (e.g., the device
+        # was disconnected), open a new session and try again once.
+        for attempt in range(2):
+            if self._channel is None:
+                self._open()
+            try:
+                self._channel.write(data)  # type: ignore[union-attr]
+                return
+            except OSError:
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def run(self, command: List[str], timeout: Optional[int] = None) -> str:
+        """
+        Run a command in the remote shell and return its output (stdout and stderr).
+
+        :param command: The command to execute, formatted as a list of strings.
+        :param timeout: How many seconds to wait for the command to finish execution
+                        before throwing an exception (the session is closed when a
+                        command times out).
+        :return: The (string) output of the command.
+        """
+
+        validate_command(command)
+        validate_timeout(timeout)
+
+        marker = "__PYTHONADB_{0}__".format(uuid.uuid4().hex)
+        joined_command = " ".join(command)
+
+        with self._lock:
+            # Discard the lines left by a previous session that dropped.
+            if self._channel is not None and self._channel_closed():
+                self.close()
+
+            self.logger.debug(
+                "Running command `{0}` in shell session (timeout={1})".format(
+                    joined_command, timeout
+                )
+            )
+
+            self._send(
+                "( {0}\n) </dev/null 2>&1; printf '\\n{1} %d\\n' $?\n".format(
+                    joined_command, marker
+                ).encode()
+            )
+
+            deadline = time.monotonic() + timeout if timeout else None
+            output: List[bytes] = []
+            marker_bytes = marker.encode()
+            while True:
+                try:
+                    line = self._lines.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                        if deadline
+                        else None
+                    )
+                except queue.Empty:
+                    self.logger.error(
+                        "Command `{0}` timed out in shell session".format(
+                            joined_command
+                        )
+                    )
+                    # The remote command can't be interrupted, discard the session.
+                    self.close()
+                    raise subprocess.TimeoutExpired(command, timeout)  # type: ignore[arg-type]
+
+                if line is None:
+                    self.close()
+                    raise RuntimeError(
+                        "Shell session closed while running `{0}`".format(
+                            joined_command
+                        )
+                    )
+
+                if line.startswith(marker_bytes):
+                    exit_code = int(line[len(marker_bytes) :].strip() or 0)
+                    break
+                output.append(line)
+
+        result = b"\n".join(output).strip().decode(errors="backslashreplace")
+        if exit_code != 0:
+            self.logger.error(
+                "Command `{0}` exited with error in shell session: {1}".format(
+                    joined_command, result
+                )
+            )
+            raise subprocess.CalledProcessError(exit_code, command, result.encode())
+
+        self.logger.debug(
+            "Command `{0}` successfully returned in shell session: {1}".format(
+                joined_command, result
+            )
+        )
+        return result
+
+    def _channel_closed(self) -> bool:
+        # An end of session marker is waiting in the queue.
+        return any(line is None for line in list(self._lines.queue))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import logging
+import subprocess
+from typing import Any, Iterator, List, Optional, Union
+
+from .channels import ProcessChannel, SocketChannel
+
+
+class CommandStream:
+    def __init__(
+        self,
+        channel: Union[ProcessChannel, SocketChannel],
+        command: List[str],
+        raw: bool = False,
+        chunk_size: int = 65536,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Iterator over the output of a (possibly endless) adb command, returning the
+        output as soon as it's received. The output is read only when the next item
+        is requested, so a slow consumer also slows down the command (instead of
+        buffering its output in memory). Closing the stream (or exiting the with
+        statement) stops the command.
+
+        Usually obtained with ADB.stream or ADB.shell_stream methods.
+
+        :param channel: The channel connected to the output of the command.
+        :param command: The command, formatted as a list of strings.
+        :param raw: When set to True, the stream returns chunks of bytes, otherwise
+                    (default) it returns decoded lines (without line terminators).
+        :param chunk_size: The maximum size (in bytes) of the chunks read from the
+                           command output.
+        :param logger: The logger used for the debug messages.
+        """
+
+        self.command = command
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.logger = logger or logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self._channel = channel
+        self._closed = False
+        self._iterator: Iterator[Any] = self._chunks() if raw else self._lines()
+
+    def __enter__(self) -> "CommandStream":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __iter__(self) -> "CommandStream":
+        return self
+
+    def __next__(self) -> Any:
+        # A string, or bytes when the stream is raw.
+        return next(self._iterator)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def returncode(self):
+        """
+        The exit code of the command, or None if the command is still running.
+        """
+
+        return self._channel.returncode
+
+    def close(self) -> None:
+        """
+        Stop the command (if still running) and release its resources.
+        """
+
+        if not self._closed:
+            self._closed = True
+            self._channel.close()
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "Stream of `{0}` closed".format(" ".join(self.command))
+                )
+
+    def _chunks(self) -> Iterator[bytes]:
+        while not self._closed:
+            try:
+                chunk = self._channel.read(self.chunk_size)
+            except (OSError, ValueError):
+                if self._closed:
+                    # The stream was closed while waiting for the output.
+                    return
+                raise
+            if not chunk:
+                self._finish()
+                return
+            yield chunk
+
+    def _lines(self) -> Iterator[str]:
+        buffer = b""
+        for chunk in self._chunks():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.rstrip(b"\r").decode(errors="backslashreplace")
+        if buffer:
+            yield buffer.rstrip(b"\r").decode(errors="backslashreplace")
+
+    def _finish(self) -> None:
+        # The command terminated on its own, make sure it was successful.
+        self._channel.wait()
+        returncode = self._channel.returncode
+        self.close()
+        if returncode:
+            self.logger.error(
+                "Streamed command `{0}` exited with error code {1}".format(
+                    " ".join(self.command), returncode
+                )
+            )
+            raise subprocess.CalledProcessError(returncode, self.command)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import posixpath
+import stat
+import struct
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from .protocol import AdbConnection, AdbProtocolError
+
+# Maximum size of the data sent in a single DATA packet.
+SYNC_DATA_MAX = 64 * 1024
+
+# Maximum length of a path on the device accepted by the sync service.
+SYNC_PATH_MAX = 1024
+
+# Called with the source path of the file, the bytes copied so far and the size of
+# the file.
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class RemoteStat(NamedTuple):
+    mode: int
+    size: int
+    mtime: int
+
+    @property
+    def exists(self) -> bool:
+        return self.mode != 0
+
+    @property
+    def is_dir(self) -> bool:
+        return stat.S_ISDIR(self.mode)
+
+
+class TransferResult(NamedTuple):
+    source: str
+    destination: str
+    size: int
+    duration: float
+
+    @property
+    def throughput(self) -> float:
+        """
+        The transfer speed in bytes per second.
+        """
+
+        return self.size / self.duration if self.duration > 0 else float(self.size)
+
+
+class SyncClient:
+    def __init__(self, connection: AdbConnection):
+        """
+        Copy files from and to the device with the adb file sync protocol, without
+        running the adb executable. The files are streamed in chunks of 64 KiB, so
+        they are never loaded completely in memory.
+
+        Usually obtained with ADB.sync method.
+
+        :param connection: The connection with the sync service of the device.
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self.connection = connection
+
+        # Header (id and length) followed by the data, reused for every packet.
+        self._buffer = memoryview(bytearray(8 + SYNC_DATA_MAX))
+
+    def __enter__(self) -> "SyncClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._send_request(b"QUIT", b"")
+        except OSError:
+            pass
+        self.connection.close()
+
+    def _send_request(self, request_id: bytes, data: bytes) -> None:
+        self.connection.sendall(struct.pack("<4sI", request_id, len(data)) + data)
+
+    def _send_path_request(self, request_id: bytes, path: str) -> None:
+        encoded_path = path.encode()
+        if len(encoded_path) > SYNC_PATH_MAX:
+            raise AdbProtocolError("Path too long: '{0}'".format(path))
+        self._send_request(request_id, encoded_path)
+
+    def _read_header(self) -> Tuple[bytes, int]:
+        return struct.unpack("<4sI", self.connection.read_exactly(8))
+
+    def _raise_failure(self, size: int) -> None:
+        raise AdbProtocolError(
+            self.connection.read_exactly(size).decode(errors="backslashreplace")
+        )
+
+    def stat(self, path: str) -> RemoteStat:
+        """
+        Get the mode, the size and the modification time of a file on the device (a
+        mode equal to 0 means the file doesn't exist).
+        """
+
+        self._send_path_request(b"STAT", path)
+        reply = self.connection.read_exactly(16)
+        reply_id, mode, size, mtime = struct.unpack("<4sIII", reply)
+        if reply_id != b"STAT":
+            raise AdbProtocolError("Unexpected sync reply: {0!r}".format(reply_id))
+        return RemoteStat(mode, size, mtime)
+
+    def listdir(self, path: str) -> List[Tuple[str, RemoteStat]]:
+        """
+        List the content of a directory on the device.
+
+        :return: A list with the name and the stat of each entry (except . and ..).
+        """
+
+        self._send_path_request(b"LIST", path)
+        entries: List[Tuple[str, RemoteStat]] = []
+        while True:
+            reply = self.connection.read_exactly(20)
+            reply_id, mode, size, mtime, name_length = struct.unpack("<4sIIII", reply)
+            if reply_id == b"DONE":
+                return entries
+            if reply_id != b"DENT":
+                raise AdbProtocolError("Unexpected sync reply: {0!r}".format(reply_id))
+            name = self.connection.read_exactly(name_length).decode(
+                errors="surrogateescape"
+            )
+            if name not in (".", ".."):
+                entries.append((name, RemoteStat(mode, size, mtime)))
+
+    def push_file(
+        self,
+        local_path: str,
+        remote_path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> TransferResult:
+        """
+        Copy a single file from the computer to the device (the missing directories
+        of the destination path are created by the device).
+
+        :param local_path: The path of the file on the host computer.
+        :param remote_path: The complete destination path on the device.
+        :param progress: Function called after every chunk copied.
+        :return: The result of the transfer.
+        """
+
+        start = time.monotonic()
+        local_stat = os.stat(local_path)
+
+        self._send_path_request(
+            b"SEND", "{0},{1}".format(remote_path, local_stat.st_mode)
+        )
+
+        transferred = 0
+        with open(local_path, "rb") as local_file:
+            while True:
+                size = local_file.readinto(self._buffer[8:])
+                if not size:
+                    break
+                struct.pack_into("<4sI", self._buffer, 0, b"DATA", size)
+                self.connection.sendall(self._buffer[: 8 + size])  # type: ignore[arg-type]
+                transferred += size
+                if progress:
+                    progress(local_path, transferred, local_stat.st_size)
+
+        # The modification time of the file is sent instead of the length.
+        self.connection.sendall(struct.pack("<4sI", b"DONE", int(local_stat.st_mtime)))
+
+        reply_id, size = self._read_header()
+        if reply_id == b"FAIL":
+            self._raise_failure(size)
+        if reply_id != b"OKAY":
+            raise AdbProtocolError("Unexpected sync reply: {0!r}".format(reply_id))
+
+        result = TransferResult(
+            local_path, remote_path, transferred, time.monotonic() - start
+        )
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Pushed '{0}' to '{1}' ({2} bytes in {3:.3f}s)".format(
+                    local_path, remote_path, result.size, result.duration
+                )
+            )
+        return result
+
+    def pull_file(
+        self,
+        remote_path: str,
+        local_path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> TransferResult:
+        """
+        Copy a single file from the device to the computer.
+
+        :param remote_path: The path of the file on the device.
+        :param local_path: The complete destination path on the host computer.
+        :param progress: Function called after every chunk copied.
+        :return: The result of the transfer.
+        """
+
+        start = time.monotonic()
+        total = self.stat(remote_path).size
+
+        # Opened before the request, so that the file is removed below only if
+        # created by this call (and the connection stays usable if it fails).
+        local_file = open(local_path, "wb")
+
+        transferred = 0
+        try:
+            with local_file:
+                self._send_path_request(b"RECV", remote_path)
+                while True:
+                    reply_id, size = self._read_header()
+                    if reply_id == b"DONE":
+                        break
+                    if reply_id == b"FAIL":
+                        self._raise_failure(size)
+                    if reply_id != b"DATA" or size > SYNC_DATA_MAX:
+                        raise AdbProtocolError(
+                            "Unexpected sync reply: {0!r}".format(reply_id)
+                        )
+                    self.connection.read_exactly_into(self._buffer[:size])
+                    local_file.write(self._buffer[:size])
+                    transferred += size
+                    if progress:
+                        progress(remote_path, transferred, total)
+        except BaseException:
+            # Don't leave incomplete files on the host computer.
+            os.remove(local_path)
+            raise
+
+        result = TransferResult(
+            remote_path, local_path, transferred, time.monotonic() - start
+        )
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Pulled '{0}' to '{1}' ({2} bytes in {3:.3f}s)".format(
+                    remote_path, local_path, result.size, result.duration
+                )
+            )
+        return result
+
+    def push(
+        self,
+        local_path: str,
+        remote_path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[TransferResult]:
+        """
+        Copy a file or a directory (with all its content) from the computer to the
+        device, with the same rules as adb push: if the destination is an existing
+        directory, the source is copied inside it.
+
+        :param local_path: The path of the file or directory on the host computer.
+        :param remote_path: The destination path on the device.
+        :param progress: Function called after every chunk copied.
+        :return: The results of the transfers (one for each file copied).
+        """
+
+        if not os.path.exists(local_path):
+            raise FileNotFoundError(
+                "Cannot copy '{0}' to the Android device: no such file or "
+                "directory".format(local_path)
+            )
+
+        if remote_path.endswith("/") or self.stat(remote_path).is_dir:
+            remote_path = posixpath.join(
+                remote_path, os.path.basename(os.path.normpath(local_path))
+            )
+
+        if not os.path.isdir(local_path):
+            return [self.push_file(local_path, remote_path, progress)]
+
+        results = []
+        for directory, _, files in os.walk(local_path):
+            relative_dir = os.path.relpath(directory, local_path)
+            for file_name in sorted(files):
+                results.append(
+                    self.push_file(
+                        os.path.join(directory, file_name),
+                        posixpath.normpath(
+                            posixpath.join(
+                                remote_path,
+                                relative_dir.replace(os.sep, "/"),
+                                file_name,
+                            )
+                        ),
+                        progress,
+                    )
+                )
+        return results
+
+    def pull(
+        self,
+        remote_path: str,
+        local_path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[TransferResult]:
+        """
+        Copy a file or a directory (with all its content) from the device to the
+        computer, with the same rules as adb pull: if the destination is an existing
+        directory, the source is copied inside it.
+
+        :param remote_path: The path of the file or directory on the device.
+        :param local_path: The destination path on the host computer.
+        :param progress: Function called after every chunk copied.
+        :return: The results of the transfers (one for each file copied).
+        """
+
+        remote_stat = self.stat(remote_path)
+        if not remote_stat.exists:
+            raise AdbProtocolError(
+                "remote object '{0}' does not exist".format(remote_path)
+            )
+
+        if os.path.isdir(local_path):
+            local_path = os.path.join(
+                local_path, posixpath.basename(posixpath.normpath(remote_path))
+            )
+
+        if not remote_stat.is_dir:
+            return [self.pull_file(remote_path, local_path, progress)]
+
+        results = []
+        directories = [(remote_path, local_path)]
+        while directories:
+            remote_dir, local_dir = directories.pop(0)
+            os.makedirs(local_dir, exist_ok=True)
+            for name, entry in sorted(self.listdir(remote_dir)):
+                remote_entry = posixpath.join(remote_dir, name)
+                local_entry = os.path.join(local_dir, name)
+                if entry.is_dir:
+                    directories.append((remote_entry, local_entry))
+                elif stat.S_ISREG(entry.mode) or stat.S_ISLNK(entry.mode):
+                    results.append(self.pull_file(remote_entry, local_entry, progress))
+        return results
+
+
+def transfer_summary(results: List[TransferResult], operation: str) -> str:
+    """
+    Describe the results of the transfers with the same summary printed by adb
+    (e.g., "2 files pushed, 0 skipped. 10.5 MB/s (1048576 bytes in 0.095s)").
+
+    :param results: The results of the transfers.
+    :param operation: The name of the operation (pushed or pulled).
+    :return: The summary of the transfers.
+    """
+
+    size = sum(result.size for result in results)
+    duration = sum(result.duration for result in results)
+    return "{0} file{1} {2}, 0 skipped. {3:.1f} MB/s ({4} bytes in {5:.3f}s)".format(
+        len(results),
+        "" if len(results) == 1 else "s",
+        operation,
+        size / duration / (1024 * 1024) if duration > 0 else 0,
+        size,
+        duration,
+    )
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import socket
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from .protocol import (
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    AdbConnection,
+    AdbProtocolError,
+)
+
+
+class DeviceInfo(NamedTuple):
+    serial: str
+    # E.g., device, offline, unauthorized, recovery.
+    state: str
+    product: Optional[str] = None
+    model: Optional[str] = None
+    device: Optional[str] = None
+    transport_id: Optional[int] = None
+
+
+class DeviceEvent(NamedTuple):
+    serial: str
+    # The information before the change, None if the device was just connected.
+    old: Optional[DeviceInfo]
+    # The information after the change, None if the device was disconnected.
+    new: Optional[DeviceInfo]
+
+    @property
+    def kind(self) -> str:
+        """
+        The kind of change: added, removed or changed (e.g., a different state).
+        """
+
+        if self.old is None:
+            return "added"
+        if self.new is None:
+            return "removed"
+        return "changed"
+
+
+# Called (from the thread of the tracker) for every change of the devices.
+DeviceListener = Callable[[DeviceEvent], None]
+
+
+def parse_device_list(output: str) -> Dict[str, DeviceInfo]:
+    """
+    Parse the list of devices sent by the adb server, in the short format
+    ("serial<TAB>state" on each line) or in the long format (e.g., "serial device
+    product:sdk model:Pixel device:generic transport_id:1").
+    """
+
+    devices = {}
+    for line in output.splitlines():
+        tokens = line.split()
+        if len(tokens) < 2:
+            continue
+        details = dict(
+            token.split(":", 1) for token in tokens[2:] if ":" in token.strip(":")
+        )
+        transport_id = details.get("transport_id")
+        devices[tokens[0]] = DeviceInfo(
+            tokens[0],
+            tokens[1],
+            details.get("product"),
+            details.get("model"),
+            details.get("device"),
+            int(transport_id) if transport_id and transport_id.isdigit() else None,
+        )
+    return devices
+
+
+def device_events(
+    old: Dict[str, DeviceInfo], new: Dict[str, DeviceInfo]
+) -> List[DeviceEvent]:
+    """
+    Compare two lists of devices and get the changes.
+    """
+
+    events = [
+        DeviceEvent(serial, old.get(serial), info)
+        for serial, info in new.items()
+        if old.get(serial) != info
+    ]
+    events.extend(
+        DeviceEvent(serial, info, None)
+        for serial, info in old.items()
+        if serial not in new
+    )
+    return events
+
+
+class DeviceTracker:
+    def __init__(
+        self,
+        host: str = DEFAULT_SERVER_HOST,
+        port: int = DEFAULT_SERVER_PORT,
+        long: bool = True,
+        reconnect_delay: float = 1.0,
+    ):
+        """
+        Registry of the devices connected to adb, updated as soon as a device is
+        connected, disconnected or changes state: a single connection with the adb
+        server (host:track-devices) is kept open in a background thread, instead of
+        running adb devices again and again.
+
+        Usually obtained with ADB.track_devices method.
+
+        :param host: The host where the adb server is listening.
+        :param port: The port where the adb server is listening.
+        :param long: When set to True (default), also the product, the model and
+                     the transport id of the devices are tracked.
+        :param reconnect_delay: How many seconds to wait before connecting again to
+                                the adb server, when the connection is lost (e.g.,
+                                the adb server was restarted).
+        """
+
+        self.logger = logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+        self.host = host
+        self.port = port
+        self.long = long
+        self.reconnect_delay = reconnect_delay
+
+        self._devices: Dict[str, DeviceInfo] = {}
+        self._listeners: List[DeviceListener] = []
+        # Called when the tracker is closed (to end the asynchronous iterators).
+        self._close_callbacks: List[Callable[[], None]] = []
+        # Notified whenever the registry changes.
+        self._condition = threading.Condition()
+        self._connection: Optional[AdbConnection] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Set after the first list of devices is received.
+        self._ready = threading.Event()
+
+    def __enter__(self) -> "DeviceTracker":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped.is_set()
+
+    def start(self, timeout: Optional[float] = None) -> "DeviceTracker":
+        """
+        Start tracking the devices (nothing happens if already started).
+
+        :param timeout: How many seconds to wait for the first list of devices
+                        (if None, wait until the adb server replies).
+        :return: This tracker.
+        """
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        if not self._ready.wait(timeout):
+            raise socket.timeout("Timed out while waiting for the list of devices")
+        return self
+
+    def close(self) -> None:
+        """
+        Stop tracking the devices and close the connection with the adb server.
+        """
+
+        self._stopped.set()
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.shutdown_write()
+            except OSError:
+                pass
+            connection.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._condition:
+            self._condition.notify_all()
+            close_callbacks = list(self._close_callbacks)
+        for callback in close_callbacks:
+            callback()
+
+    def add_listener(self, listener: DeviceListener) -> None:
+        """
+        Call a function for every change of the devices (from the thread of the
+        tracker, so it shouldn't block).
+        """
+
+        with self._condition:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: DeviceListener) -> None:
+        with self._condition:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def devices(self) -> Dict[str, DeviceInfo]:
+        """
+        Get the devices currently known by the adb server (in any state).
+
+        :return: A dictionary with the serial number and the information of every
+                 device.
+        """
+
+        with self._condition:
+            return dict(self._devices)
+
+    def wait_for(
+        self,
+        serial: Optional[str] = None,
+        state: str = "device",
+        timeout: Optional[float] = None,
+    ) -> DeviceInfo:
+        """
+        Wait until a device is in the requested state, without sending any request
+        to the adb server.
+
+        :param serial: The serial number of the device. If None, any device.
+        :param state: The state to wait for (default device, ready to receive
+                      commands).
+        :param timeout: How many seconds to wait before throwing a timeout
+                        exception. If None, wait forever.
+        :return: The information of the device.
+        """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                for info in self._devices.values():
+                    if info.state == state and serial in (None, info.serial):
+                        return info
+                if self._stopped.is_set():
+                    raise RuntimeError("The device tracker is closed")
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise socket.timeout(
+                        "Timed out while waiting for device {0} to be {1}".format(
+                            serial or "(any)", state
+                        )
+                    )
+                self._condition.wait(remaining)
+
+    async def events(self) -> AsyncIterator[DeviceEvent]:
+        """
+        Asynchronous iterator over the changes of the devices (only the changes
+        after the start of the iteration), e.g., async for event in
+        tracker.events(). The iteration ends when the tracker is closed.
+        """
+
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Optional[DeviceEvent]]" = asyncio.Queue()
+
+        def listener(event: Optional[DeviceEvent]) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        def stop() -> None:
+            listener(None)
+
+        with self._condition:
+            self._listeners.append(listener)
+            self._close_callbacks.append(stop)
+        if self._stopped.is_set():
+            stop()
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            with self._condition:
+                self._listeners.remove(listener)
+                self._close_callbacks.remove(stop)
+
+    def _update(self, devices: Dict[str, DeviceInfo]) -> None:
+        with self._condition:
+            events = device_events(self._devices, devices)
+            self._devices = devices
+            listeners = list(self._listeners)
+            self._condition.notify_all()
+        self._ready.set()
+        for event in events:
+            self.logger.debug(
+                "Device {0} {1} ({2})".format(
+                    event.serial,
+                    event.kind,
+                    event.new.state if event.new else "disconnected",
+                )
+            )
+            for listener in listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    self.logger.error("Error in device listener: {0}".format(e))
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._connection = AdbConnection(self.host, self.port)
+                self._connection.request(
+                    "host:track-devices-l" if self.long else "host:track-devices"
+                )
+                while not self._stopped.is_set():
+                    # Every message contains the complete list of devices.
+                    self._update(parse_device_list(self._connection.read_string()))
+            except (AdbProtocolError, OSError) as e:
+                if self._stopped.is_set():
+                    break
+                self.logger.debug(
+                    "Connection with the adb server lost, retrying in {0}s: {1}".format(
+                        self.reconnect_delay, e
+                    )
+                )
+                # Without connection, the state of the devices is unknown.
+                self._update({})
+            finally:
+                if self._connection is not None:
+                    self._connection.close()
+            self._stopped.wait(self.reconnect_delay)
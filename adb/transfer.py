@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+# Parallel copy of many files, split into shards copied at the same time through
+# different file sync sessions (see ADB.push_files and ADB.pull_files).
+
+import heapq
+import logging
+import os
+import posixpath
+import socket
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from .protocol import AdbProtocolError
+from .sync import ProgressCallback, SyncClient, TransferResult
+
+
+class FileTransfer(NamedTuple):
+    source: str
+    destination: str
+    size: int
+
+
+class FileStatus(NamedTuple):
+    source: str
+    destination: str
+    # The result of the last attempt, None if the file couldn't be copied.
+    result: Optional[TransferResult]
+    # The error of the last attempt, None if the file was copied.
+    error: Optional[Exception]
+    attempts: int
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class TransferReport(NamedTuple):
+    files: List[FileStatus]
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return all(status.ok for status in self.files)
+
+    @property
+    def succeeded(self) -> List[FileStatus]:
+        return [status for status in self.files if status.ok]
+
+    @property
+    def failed(self) -> List[FileStatus]:
+        return [status for status in self.files if not status.ok]
+
+    @property
+    def size(self) -> int:
+        return sum(status.result.size for status in self.files if status.result)
+
+    @property
+    def throughput(self) -> float:
+        """
+        The overall transfer speed in bytes per second.
+        """
+
+        return self.size / self.duration if self.duration > 0 else float(self.size)
+
+
+def shard_transfers(
+    transfers: List[FileTransfer], width: int
+) -> List[List[FileTransfer]]:
+    """
+    Split the files into (at most) width shards of similar total size: every file,
+    from the largest, goes into the shard with the smallest total size so far.
+    """
+
+    shards: List[List[FileTransfer]] = [[] for _ in range(min(width, len(transfers)))]
+    heap = [(0, index) for index in range(len(shards))]
+    for transfer in sorted(transfers, key=lambda t: t.size, reverse=True):
+        total, index = heapq.heappop(heap)
+        shards[index].append(transfer)
+        heapq.heappush(heap, (total + transfer.size, index))
+    return shards
+
+
+def local_transfers(host_paths: List[str], device_dir: str) -> List[FileTransfer]:
+    """
+    List the files to push (the content of the directories included) with their
+    destination paths on the device.
+    """
+
+    transfers = []
+    for host_path in host_paths:
+        base_name = os.path.basename(os.path.normpath(host_path))
+        if not os.path.isdir(host_path):
+            size = os.path.getsize(host_path) if os.path.exists(host_path) else 0
+            transfers.append(
+                FileTransfer(host_path, posixpath.join(device_dir, base_name), size)
+            )
+            continue
+        for directory, _, files in os.walk(host_path):
+            relative_dir = os.path.relpath(directory, host_path).replace(os.sep, "/")
+            for file_name in sorted(files):
+                path = os.path.join(directory, file_name)
+                transfers.append(
+                    FileTransfer(
+                        path,
+                        posixpath.normpath(
+                            posixpath.join(
+                                device_dir, base_name, relative_dir, file_name
+                            )
+                        ),
+                        os.path.getsize(path),
+                    )
+                )
+    return transfers
+
+
+def remote_transfers(
+    session: SyncClient, device_paths: List[str], host_dir: str
+) -> List[FileTransfer]:
+    """
+    List the files to pull (the content of the directories included) with their
+    destination paths on the host computer.
+    """
+
+    transfers = []
+    for device_path in device_paths:
+        base_name = posixpath.basename(posixpath.normpath(device_path))
+        remote_stat = session.stat(device_path)
+        if not remote_stat.is_dir:
+            # Missing files are reported as failed by the transfer.
+            transfers.append(
+                FileTransfer(
+                    device_path, os.path.join(host_dir, base_name), remote_stat.size
+                )
+            )
+            continue
+        directories = [(device_path, os.path.join(host_dir, base_name))]
+        while directories:
+            remote_dir, local_dir = directories.pop(0)
+            for name, entry in sorted(session.listdir(remote_dir)):
+                if entry.is_dir:
+                    directories.append(
+                        (
+                            posixpath.join(remote_dir, name),
+                            os.path.join(local_dir, name),
+                        )
+                    )
+                elif stat.S_ISREG(entry.mode) or stat.S_ISLNK(entry.mode):
+                    transfers.append(
+                        FileTransfer(
+                            posixpath.join(remote_dir, name),
+                            os.path.join(local_dir, name),
+                            entry.size,
+                        )
+                    )
+    return transfers
+
+
+class ParallelTransfer:
+    def __init__(
+        self,
+        open_session: Callable[[], SyncClient],
+        push: bool,
+        width: int = 4,
+        retries: int = 1,
+        progress: Optional[ProgressCallback] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Copy many files at the same time through width file sync sessions. The files
+        that fail are retried one by one (each time with a new session), and the
+        result of every file is reported.
+
+        Usually used through ADB.push_files and ADB.pull_files methods.
+
+        :param open_session: Function opening a new sync session with the device.
+        :param push: True to copy the files to the device, False to copy them from
+                     the device.
+        :param width: The maximum number of sessions used at the same time.
+        :param retries: How many times a failed file is copied again.
+        :param progress: Function called after every chunk copied (from different
+                         threads at the same time).
+        :param logger: The logger used for the debug messages.
+        """
+
+        if width <= 0:
+            raise ValueError(
+                "The number of transfer channels must be a positive integer"
+            )
+        if retries < 0:
+            raise ValueError("The number of retries cannot be negative")
+
+        self.open_session = open_session
+        self.push = push
+        self.width = width
+        self.retries = retries
+        self.progress = progress
+        self.logger = logger or logging.getLogger(
+            "{0}.{1}".format(__name__, self.__class__.__name__)
+        )
+
+    def _copy(
+        self, session: SyncClient, transfer: FileTransfer
+    ) -> Tuple[Optional[TransferResult], Optional[Exception]]:
+        try:
+            if self.push:
+                result = session.push_file(
+                    transfer.source, transfer.destination, self.progress
+                )
+            else:
+                os.makedirs(os.path.dirname(transfer.destination) or ".", exist_ok=True)
+                result = session.pull_file(
+                    transfer.source, transfer.destination, self.progress
+                )
+            return result, None
+        except (AdbProtocolError, OSError, socket.timeout) as e:
+            self.logger.error(
+                "Failed to copy '{0}' to '{1}': {2}".format(
+                    transfer.source, transfer.destination, e
+                )
+            )
+            return None, e
+
+    def _copy_shard(self, shard: List[FileTransfer]) -> List[FileStatus]:
+        statuses = []
+        session: Optional[SyncClient] = None
+        try:
+            for transfer in shard:
+                attempts = 0
+                while True:
+                    attempts += 1
+                    try:
+                        if session is None:
+                            session = self.open_session()
+                        result, error = self._copy(session, transfer)
+                    except (AdbProtocolError, OSError, socket.timeout) as e:
+                        result, error = None, e
+                    if error is not None and session is not None:
+                        # After an error the session could be out of sync, the
+                        # next file uses a new session.
+                        session.close()
+                        session = None
+                    if error is None or attempts > self.retries:
+                        break
+                    self.logger.debug(
+                        "Retrying '{0}' (attempt {1})".format(
+                            transfer.source, attempts + 1
+                        )
+                    )
+                statuses.append(
+                    FileStatus(
+                        transfer.source, transfer.destination, result, error, attempts
+                    )
+                )
+        finally:
+            if session is not None:
+                session.close()
+        return statuses
+
+    def run(self, transfers: List[FileTransfer]) -> TransferReport:
+        """
+        Copy the files.
+
+        :param transfers: The files to copy.
+        :return: The report with the status of every file (in the same order).
+        """
+
+        start = time.monotonic()
+        shards = shard_transfers(transfers, self.width)
+
+        self.logger.debug(
+            "Copying {0} files ({1} bytes) with {2} channels".format(
+                len(transfers), sum(t.size for t in transfers), len(shards)
+            )
+        )
+
+        statuses = {}
+        if shards:
+            with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+                for shard_statuses in executor.map(self._copy_shard, shards):
+                    for status in shard_statuses:
+                        statuses[(status.source, status.destination)] = status
+
+        return TransferReport(
+            [statuses[(t.source, t.destination)] for t in transfers],
+            time.monotonic() - start,
+        )
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# Copy of whole directory trees as a single tar stream (see ADB.pull_tree and
+# ADB.push_tree), created and extracted while the data is transferred.
+
+import fnmatch
+import gzip
+import os
+import posixpath
+import shlex
+import tarfile
+from typing import List, Optional, Union
+
+from .channels import ProcessChannel, SocketChannel
+
+# Size of the blocks read and written by tarfile.
+TAR_BUFFER_SIZE = 64 * 1024
+
+
+class ChannelReader:
+    def __init__(self, channel: Union[ProcessChannel, SocketChannel]):
+        # Minimal file object reading from a channel (for tarfile stream mode).
+        self.channel = channel
+
+    def read(self, size: int = TAR_BUFFER_SIZE) -> bytes:
+        return self.channel.read(size)
+
+
+class ChannelWriter:
+    def __init__(self, channel: Union[ProcessChannel, SocketChannel]):
+        # Minimal file object writing into a channel (for tarfile stream mode).
+        self.channel = channel
+
+    def write(self, data: bytes) -> int:
+        if data:
+            # Skip the empty writes (e.g., from gzip), never sent as stdin packets.
+            self.channel.write(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def _matches(path: str, patterns: List[str]) -> bool:
+    # A pattern matches the relative path or the name of the file.
+    name = posixpath.basename(path)
+    return any(
+        fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
+
+
+def is_selected(
+    path: str,
+    is_dir: bool,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> bool:
+    """
+    Check if a file (or directory) of the tree should be copied.
+
+    :param path: The relative path of the file, with / as separator.
+    :param is_dir: True if the path is a directory.
+    :param include: If not empty, only the files matching one of these patterns are
+                    copied (the directories are always traversed).
+    :param exclude: The files and directories (with all their content) matching one
+                    of these patterns are not copied.
+    :return: True if the file should be copied.
+    """
+
+    if exclude:
+        parts = path.split("/")
+        for index in range(1, len(parts) + 1):
+            if _matches("/".join(parts[:index]), exclude):
+                return False
+    if is_dir or not include:
+        return True
+    return _matches(path, include)
+
+
+def pull_tree_command(
+    device_dir: str, compress: bool = False, exclude: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Create the device command writing the content of a directory as a tar stream.
+    """
+
+    command = ["tar", "-czf" if compress else "-cf", "-", "-C", shlex.quote(device_dir)]
+    for pattern in exclude or []:
+        # Skip the excluded files already on the device (the patterns are checked
+        # again during the extraction).
+        command.append(shlex.quote("--exclude={0}".format(pattern)))
+    command.append(".")
+    return command
+
+
+def push_tree_command(device_dir: str, compress: bool = False) -> List[str]:
+    """
+    Create the device command extracting a tar stream into a directory.
+    """
+
+    quoted_dir = shlex.quote(device_dir)
+    return [
+        "mkdir",
+        "-p",
+        quoted_dir,
+        "&&",
+        "tar",
+        "-xzf" if compress else "-xf",
+        "-",
+        "-C",
+        quoted_dir,
+    ]
+
+
+def _extract(tar: tarfile.TarFile, member: tarfile.TarInfo, host_dir: str) -> None:
+    if hasattr(tarfile, "data_filter"):
+        # Refuse absolute paths, links outside host_dir and special files.
+        tar.extract(member, host_dir, filter="data")
+        return
+
+    if (
+        member.name.startswith("/")
+        or member.name.split("/")[0] == ".."
+        or not (member.isfile() or member.isdir())
+    ):
+        raise tarfile.TarError("Unsafe tar member '{0}'".format(member.name))
+    tar.extract(member, host_dir)
+
+
+def extract_tree(
+    source: ChannelReader,
+    host_dir: str,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Extract a (possibly compressed) tar stream into a directory while it's received.
+
+    :return: The relative paths of the files extracted.
+    """
+
+    extracted = []
+    with tarfile.open(fileobj=source, mode="r|*", bufsize=TAR_BUFFER_SIZE) as tar:  # type: ignore[call-overload]
+        for member in tar:
+            path = posixpath.normpath(member.name)
+            if path == "." or not is_selected(path, member.isdir(), include, exclude):
+                continue
+            member.name = path
+            _extract(tar, member, host_dir)
+            if not member.isdir():
+                extracted.append(path)
+    return extracted
+
+
+def create_tree(
+    destination: ChannelWriter,
+    host_dir: str,
+    compress: bool = False,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Write the content of a directory as a (possibly compressed) tar stream, while
+    it's sent.
+
+    :return: The relative paths of the files added to the stream.
+    """
+
+    added = []
+
+    def select(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        if not is_selected(info.name, info.isdir(), include, exclude):
+            return None
+        if not info.isdir():
+            added.append(info.name)
+        return info
+
+    output = (
+        gzip.GzipFile(fileobj=destination, mode="wb", compresslevel=6)  # type: ignore[arg-type]
+        if compress
+        else destination
+    )
+    with tarfile.open(fileobj=output, mode="w|", bufsize=TAR_BUFFER_SIZE) as tar:  # type: ignore[call-overload]
+        for name in sorted(os.listdir(host_dir)):
+            tar.add(os.path.join(host_dir, name), arcname=name, filter=select)
+    if compress:
+        # Write the end of the compressed stream (destination is not closed).
+        output.close()  # type: ignore[union-attr]
+    return added
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Listing of the files on the device (see ADB.walk and ADB.listdir): the names, the
+# modes, the sizes and the modification times of a whole tree are printed by a single
+# find command and parsed while they are received.
+
+import fnmatch
+import posixpath
+import shlex
+import stat
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+# Exit code of the walk command when the directory doesn't exist.
+WALK_MISSING_EXIT_CODE = 2
+
+
+class RemoteEntry(NamedTuple):
+    # The full path on the device.
+    path: str
+    # The path relative to the walked directory.
+    relative_path: str
+    mode: int
+    size: int
+    mtime: int
+
+    @property
+    def name(self) -> str:
+        return posixpath.basename(self.path)
+
+    @property
+    def is_dir(self) -> bool:
+        return stat.S_ISDIR(self.mode)
+
+    @property
+    def is_file(self) -> bool:
+        return stat.S_ISREG(self.mode)
+
+    @property
+    def is_link(self) -> bool:
+        return stat.S_ISLNK(self.mode)
+
+
+def walk_command(device_path: str, max_depth: Optional[int] = None) -> str:
+    """
+    Create the shell command that prints the mode (in hexadecimal), the size, the
+    modification time and the path of every entry under a directory, with a single
+    invocation. The symbolic links under the directory are not followed, but the
+    directory itself can be a symbolic link (e.g., /sdcard on Android).
+    """
+
+    path = shlex.quote(device_path)
+    return (
+        "[ -e {0} ] || exit {1}; find -H {0} -mindepth 1{2} "
+        "-exec stat -c '%f %s %Y %n' {{}} + 2>/dev/null; exit 0".format(
+            path,
+            WALK_MISSING_EXIT_CODE,
+            " -maxdepth {0}".format(max_depth) if max_depth else "",
+        )
+    )
+
+
+def parse_walk_output(lines: Iterable[str], device_path: str) -> Iterator[RemoteEntry]:
+    """
+    Parse the output of the command created by walk_command, while it's received.
+    """
+
+    root = device_path.rstrip("/") or "/"
+    for line in lines:
+        tokens = line.split(" ", 3)
+        if len(tokens) != 4 or not tokens[1].isdigit() or not tokens[2].isdigit():
+            continue
+        path = tokens[3]
+        try:
+            mode = int(tokens[0], 16)
+        except ValueError:
+            continue
+        yield RemoteEntry(
+            path,
+            posixpath.relpath(path, root),
+            mode,
+            int(tokens[1]),
+            int(tokens[2]),
+        )
+
+
+class RemoteIndex:
+    def __init__(self, device_path: str, entries: Iterable[RemoteEntry]):
+        """
+        Index of the entries under a directory of the device, to be reused (e.g.,
+        to choose the files to pull) without listing the directory again.
+
+        Usually obtained with ADB.index method.
+
+        :param device_path: The indexed directory on the device.
+        :param entries: The entries under the directory.
+        """
+
+        self.device_path = device_path
+        # Relative path -> entry.
+        self.entries: Dict[str, RemoteEntry] = {
+            entry.relative_path: entry for entry in entries
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, relative_path: str) -> bool:
+        return relative_path in self.entries
+
+    def get(self, relative_path: str) -> Optional[RemoteEntry]:
+        return self.entries.get(relative_path)
+
+    def files(
+        self,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+    ) -> List[RemoteEntry]:
+        """
+        Get the regular files in the index.
+
+        :param include: Keep only the files matching one of these patterns (e.g.,
+                        *.db). A pattern matches the relative path or the name of a
+                        file. If None, all the files.
+        :param exclude: Skip the files matching one of these patterns.
+        """
+
+        def matches(entry: RemoteEntry, patterns: List[str]) -> bool:
+            return any(
+                fnmatch.fnmatch(entry.relative_path, pattern)
+                or fnmatch.fnmatch(entry.name, pattern)
+                for pattern in patterns
+            )
+
+        return [
+            entry
+            for entry in self.entries.values()
+            if entry.is_file
+            and (include is None or matches(entry, include))
+            and not matches(entry, exclude or [])
+        ]
+
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self.entries.values() if entry.is_file)
+
+    def changed(self, other: "RemoteIndex") -> List[RemoteEntry]:
+        """
+        Get the files new or changed (different size or modification time) in this
+        index compared to an older index of the same directory.
+        """
+
+        changed = []
+        for relative_path, entry in self.entries.items():
+            old = other.entries.get(relative_path)
+            if entry.is_file and (
+                old is None or (old.size, old.mtime) != (entry.size, entry.mtime)
+            ):
+                changed.append(entry)
+        return changed
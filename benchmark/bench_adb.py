@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+# Benchmark suite of the main adb operations (execute, shell, push_file, pull_file,
+# install_app and multi-device fan-out with DevicePool), with both backends. No real
+# device is needed: the subprocess backend uses the stub adb executable in this
+# directory and the native backend uses the fake adb server of the tests, both with a
+# configurable latency. The results can be saved as json and compared with the
+# results of a previous run (e.g., of a previous commit). Usage (from the main
+# directory of the project):
+#
+#   python3 -m benchmark.bench_adb [--backend both] [--iterations N] [--latency S]
+#                                  [--payload-size BYTES] [--devices N]
+#                                  [--output results.json] [--compare old.json]
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from adb.adb import ADB
+from adb.pool import DevicePool
+from test.fake_adb_server import FakeAdbServer
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+
+STUB_ADB_PATH = os.path.join(BENCHMARK_DIR, "stub_adb.py")
+
+TEST_APK = os.path.join(
+    os.path.dirname(BENCHMARK_DIR), "test", "test_resources", "test.apk"
+)
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    backend: str
+    iterations: int
+    # Commands per second (for the fan-out, one command for each device).
+    commands_per_second: float
+    # Latency (in milliseconds) of a single operation.
+    p50_ms: float
+    p99_ms: float
+    # Transfer throughput (only for the operations copying data).
+    mb_per_second: Optional[float] = None
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    # Nearest-rank percentile.
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def measure(
+    name: str,
+    backend: str,
+    operation: Callable[[], Any],
+    iterations: int,
+    commands: int = 1,
+    payload_size: int = 0,
+) -> BenchmarkResult:
+    """
+    Run an operation many times (after a warm-up run) and measure its latency.
+
+    :param commands: The adb commands executed by each operation.
+    :param payload_size: The bytes copied by each operation.
+    """
+
+    operation()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return BenchmarkResult(
+        name,
+        backend,
+        iterations,
+        iterations * commands / total,
+        percentile(latencies, 0.5) * 1000,
+        percentile(latencies, 0.99) * 1000,
+        iterations * payload_size / total / 1024 / 1024 if payload_size else None,
+    )
+
+
+def run_suite(
+    backend: str,
+    iterations: int,
+    latency: float,
+    payload_size: int,
+    devices: int,
+    work_dir: str,
+) -> List[BenchmarkResult]:
+    serials = ["bench-{0}".format(index) for index in range(devices)]
+    os.environ["STUB_ADB_DEVICES"] = ",".join(serials)
+    os.environ["STUB_ADB_LATENCY"] = str(latency)
+
+    payload = os.path.join(work_dir, "payload.bin")
+    with open(payload, "wb") as payload_file:
+        payload_file.write(os.urandom(payload_size))
+    device_dir = os.path.join(work_dir, "device")
+    os.makedirs(device_dir, exist_ok=True)
+    pushed = os.path.join(device_dir, "payload.bin")
+    pulled = os.path.join(work_dir, "pulled.bin")
+    apk_size = os.path.getsize(TEST_APK)
+
+    # The fake adb server is used only by the native backend.
+    with FakeAdbServer(devices=serials, latency=latency) as server:
+        options: Dict[str, Any] = {"backend": backend, "server_port": server.port}
+        adb = ADB(device=serials[0], **options)
+        adb.push_file(payload, pushed)
+
+        results = [
+            measure("execute", backend, lambda: adb.execute(["version"]), iterations),
+            measure("shell", backend, lambda: adb.shell(["echo", "bench"]), iterations),
+            measure(
+                "push_file",
+                backend,
+                lambda: adb.push_file(payload, pushed),
+                iterations,
+                payload_size=payload_size,
+            ),
+            measure(
+                "pull_file",
+                backend,
+                lambda: adb.pull_file(pushed, pulled),
+                iterations,
+                payload_size=payload_size,
+            ),
+            measure(
+                "install_app",
+                backend,
+                lambda: adb.install_app(TEST_APK),
+                iterations,
+                payload_size=apk_size,
+            ),
+        ]
+        with DevicePool(serials, **options) as pool:
+
+            def fan_out() -> None:
+                for result in pool.shell(["echo", "bench"]).values():
+                    if isinstance(result, Exception):
+                        raise result
+
+            results.append(
+                measure("fan_out", backend, fan_out, iterations, commands=devices)
+            )
+    return results
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCHMARK_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(
+    results: List[BenchmarkResult], baseline: Optional[Dict[str, Dict]] = None
+) -> None:
+    print(
+        "{0:<12} {1:<10} {2:>12} {3:>10} {4:>10} {5:>10}{6}".format(
+            "operation",
+            "backend",
+            "commands/s",
+            "p50 ms",
+            "p99 ms",
+            "MB/s",
+            " {0:>10}".format("vs base") if baseline is not None else "",
+        )
+    )
+    for result in results:
+        comparison = ""
+        if baseline is not None:
+            old = baseline.get("{0}/{1}".format(result.name, result.backend))
+            comparison = (
+                " {0:>+9.1f}%".format(
+                    (result.commands_per_second / old["commands_per_second"] - 1) * 100
+                )
+                if old
+                else " {0:>10}".format("-")
+            )
+        print(
+            "{0:<12} {1:<10} {2:>12.1f} {3:>10.2f} {4:>10.2f} {5:>10}{6}".format(
+                result.name,
+                result.backend,
+                result.commands_per_second,
+                result.p50_ms,
+                result.p99_ms,
+                "{0:.1f}".format(result.mb_per_second)
+                if result.mb_per_second is not None
+                else "-",
+                comparison,
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the main adb operations with a fake device"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("subprocess", "native", "both"),
+        default="both",
+        help="The backend of ADB to measure",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=20, help="Runs of each operation"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds added by the fake device to every command",
+    )
+    parser.add_argument(
+        "--payload-size",
+        type=int,
+        default=4 * 1024 * 1024,
+        help="Bytes of the file pushed and pulled",
+    )
+    parser.add_argument(
+        "--devices", type=int, default=4, help="Fake devices for the fan-out"
+    )
+    parser.add_argument("--output", help="Save the results to this json file")
+    parser.add_argument(
+        "--compare", help="Compare with the results saved in this json file"
+    )
+    args = parser.parse_args()
+
+    # Use the stub adb executable unless a different one is specified.
+    os.environ.setdefault("ADB_PATH", STUB_ADB_PATH)
+    print("adb executable: {0}".format(os.environ["ADB_PATH"]))
+
+    results: List[BenchmarkResult] = []
+    backends = ["subprocess", "native"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as work_dir:
+        for backend in backends:
+            results.extend(
+                run_suite(
+                    backend,
+                    args.iterations,
+                    args.latency,
+                    args.payload_size,
+                    args.devices,
+                    work_dir,
+                )
+            )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = {
+                "{0}/{1}".format(result["name"], result["backend"]): result
+                for result in json.load(baseline_file)["results"]
+            }
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {
+                    "commit": current_commit(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "config": {
+                        "iterations": args.iterations,
+                        "latency": args.latency,
+                        "payload_size": args.payload_size,
+                        "devices": args.devices,
+                        "adb_path": os.environ["ADB_PATH"],
+                    },
+                    "results": [result._asdict() for result in results],
+                },
+                output_file,
+                indent=2,
+            )
+        print("Results saved to {0}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
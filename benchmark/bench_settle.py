@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# Micro-benchmark of the settle policies used after every adb command. By default,
+# it runs against the stub adb executable in this directory, so no real device is
+# needed. Usage (from the main directory of the project):
+#
+#   python3 -m benchmark.bench_settle [--iterations N]
+
+import argparse
+import os
+import time
+
+from adb.adb import ADB
+from adb.settle import FixedDelay, NoWait, SettlePolicy, WaitForExit
+
+STUB_ADB_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "stub_adb.py")
+
+
+def commands_per_second(policy: SettlePolicy, iterations: int) -> float:
+    adb = ADB(settle_policy=policy)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        adb.shell(["true"])
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the adb commands per second with each settle policy"
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=50, help="Commands per settle policy"
+    )
+    parser.add_argument(
+        "--legacy-iterations",
+        type=int,
+        default=3,
+        help="Commands for the legacy policy (each one takes more than 1 second)",
+    )
+    args = parser.parse_args()
+
+    # Use the stub adb executable unless a different one is specified.
+    os.environ.setdefault("ADB_PATH", STUB_ADB_PATH)
+    print("adb executable: {0}".format(os.environ["ADB_PATH"]))
+
+    for name, policy, iterations in [
+        ("before: FixedDelay(1.0)", FixedDelay(1.0), args.legacy_iterations),
+        ("after: WaitForExit (default)", WaitForExit(), args.iterations),
+        ("after: NoWait", NoWait(), args.iterations),
+    ]:
+        print(
+            "{0:<30} {1:8.2f} commands/s".format(
+                name, commands_per_second(policy, iterations)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
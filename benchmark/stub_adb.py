@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Stub adb executable, to be used with ADB_PATH environment variable for running the
+# benchmarks without a real adb installation or a real Android device. Shell commands
+# are executed on the local machine, and the files are pushed and pulled on the local
+# machine. Environment variables:
+#
+#   STUB_ADB_LATENCY  seconds to wait before executing every command (default 0)
+#   STUB_ADB_DEVICES  comma separated serial numbers of the fake devices
+
+import os
+import shutil
+import sys
+import time
+
+# Compression algorithms of push -z/pull -z, not paths.
+COMPRESSION = ("any", "none", "brotli", "lz4", "zstd")
+
+
+def copy_files(args, action: str) -> int:
+    # The last path is the destination, the options (e.g., --sync, -z) are ignored.
+    paths = [arg for arg in args if not arg.startswith("-") and arg not in COMPRESSION]
+    sources, destination = paths[:-1], paths[-1]
+    start = time.perf_counter()
+    size = 0
+    for source in sources:
+        if os.path.isdir(destination):
+            target = os.path.join(destination, os.path.basename(source))
+        else:
+            target = destination
+        shutil.copyfile(source, target)
+        size += os.path.getsize(target)
+    duration = max(time.perf_counter() - start, 1e-6)
+    print(
+        "{0}: {1} file{2} {3}, 0 skipped. {4:.1f} MB/s ({5} bytes in {6:.3f}s)".format(
+            sources[-1],
+            len(sources),
+            "" if len(sources) == 1 else "s",
+            action,
+            size / duration / 1024 / 1024,
+            size,
+            duration,
+        )
+    )
+    return 0
+
+
+def main(argv) -> int:
+    # Ignore the serial number of the device (if any).
+    if argv[:1] == ["-s"]:
+        argv = argv[2:]
+
+    if not argv:
+        print("stub adb: no command", file=sys.stderr)
+        return 1
+
+    command, args = argv[0], argv[1:]
+
+    latency = float(os.environ.get("STUB_ADB_LATENCY", 0))
+    if latency > 0:
+        time.sleep(latency)
+
+    if command == "version":
+        print("Android Debug Bridge version 1.0.41")
+        print("Version 34.0.0-stub")
+        print("Installed as {0}".format(os.path.realpath(__file__)))
+    elif command == "devices":
+        print("List of devices attached")
+        for device in os.environ.get("STUB_ADB_DEVICES", "stub-device").split(","):
+            print("{0}\tdevice".format(device))
+        print()
+    elif command == "get-state":
+        print("device")
+    elif command in ("start-server", "kill-server", "wait-for-device", "reboot"):
+        pass
+    elif command == "connect":
+        print("connected to {0}".format(args[0]))
+    elif command == "remount":
+        print("remount succeeded")
+    elif command in ("features", "host-features"):
+        print("shell_v2\ncmd\nstat_v2")
+    elif command == "push":
+        return copy_files(args, "pushed")
+    elif command == "pull":
+        return copy_files(args, "pulled")
+    elif command == "install":
+        # Read the whole apk, as the real adb executable does.
+        with open(args[-1], "rb") as apk:
+            while apk.read(1024 * 1024):
+                pass
+        print("Performing Streamed Install")
+        print("Success")
+    elif command in ("shell", "exec-out"):
+        sys.stdout.flush()
+        # Replace the stub with the shell, so that killing the adb process (e.g.,
+        # when a command times out) stops the command too.
+        os.execvp("sh", ["sh", "-c", " ".join(args)])
+    else:
+        print("stub adb: unknown command {0}".format(command), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import pathlib
+from typing import Iterator
+
+import pytest
+
+from ..adb.adb import ADB
+from .fake_adb_server import FakeAdbServer
+
+STUB_ADB = pathlib.Path(__file__).parent.parent / "benchmark" / "stub_adb.py"
+
+
+@pytest.fixture
+def stub_adb(monkeypatch) -> str:
+    # The tests using the fake adb server don't need a real adb installation: the
+    # commands not supported natively (and the adb executable looked up by ADB
+    # constructor) use the stub adb executable.
+    monkeypatch.setenv("ADB_PATH", str(STUB_ADB))
+    return str(STUB_ADB)
+
+
+@pytest.fixture
+def fake_server(stub_adb: str) -> Iterator[FakeAdbServer]:
+    with FakeAdbServer() as server:
+        yield server
+
+
+@pytest.fixture
+def native_adb(fake_server: FakeAdbServer) -> Iterator[ADB]:
+    adb = ADB(debug=True, backend="native", server_port=fake_server.port)
+    yield adb
+    if adb.tracker is not None:
+        adb.tracker.close()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+import os
+import select
+import socket
+import socketserver
+import struct
+import subprocess
+import threading
+import time
+from typing import List, Optional, Sequence, Set, Tuple
+
+
+class _FakeAdbRequestHandler(socketserver.BaseRequestHandler):
+    server: "_FakeAdbTCPServer"
+
+    def read_exactly(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_request(self) -> Optional[str]:
+        length = self.read_exactly(4)
+        if not length:
+            return None
+        request = self.read_exactly(int(length, 16))
+        return request.decode() if request is not None else None
+
+    def okay(self, data: bytes = b"") -> None:
+        self.request.sendall(b"OKAY" + data)
+
+    def fail(self, message: str) -> None:
+        self.request.sendall(
+            b"FAIL" + "{0:04x}".format(len(message)).encode() + message.encode()
+        )
+
+    def okay_string(self, message: str) -> None:
+        self.okay("{0:04x}".format(len(message)).encode() + message.encode())
+
+    def run(self, command: str, shell_v2: bool, merge_stderr: bool = True) -> None:
+        """
+        Run a shell command on the local machine (the fake device), forwarding its
+        input and its output through the connection.
+        """
+
+        process = subprocess.Popen(
+            ["sh", "-c", command],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        )
+        send_lock = threading.Lock()
+
+        def send(packet_id: int, data: bytes) -> None:
+            with send_lock:
+                if shell_v2:
+                    data = struct.pack("<BI", packet_id, len(data)) + data
+                self.request.sendall(data)
+
+        def pump_output(pipe, packet_id: int) -> None:
+            try:
+                for chunk in iter(lambda: pipe.read1(65536), b""):
+                    send(packet_id, chunk)
+            except OSError:
+                # The connection was closed.
+                process.kill()
+
+        def pump_input() -> None:
+            try:
+                while True:
+                    if shell_v2:
+                        header = self.read_exactly(5)
+                        if header is None:
+                            break
+                        packet_id, size = struct.unpack("<BI", header)
+                        data = self.read_exactly(size) if size else b""
+                        if data is None:
+                            break
+                        if packet_id == 4:
+                            process.stdin.close()  # type: ignore[union-attr]
+                            continue
+                    else:
+                        data = self.request.recv(65536)
+                        if not data:
+                            break
+                    process.stdin.write(data)  # type: ignore[union-attr]
+                    process.stdin.flush()  # type: ignore[union-attr]
+            except (OSError, ValueError):
+                pass
+            # The connection was closed, stop the command.
+            if process.poll() is None:
+                process.kill()
+
+        pumps = [threading.Thread(target=pump_output, args=(process.stdout, 1))]
+        if not merge_stderr:
+            pumps.append(threading.Thread(target=pump_output, args=(process.stderr, 2)))
+        for pump in pumps:
+            pump.start()
+        threading.Thread(target=pump_input, daemon=True).start()
+
+        for pump in pumps:
+            pump.join()
+        process.wait()
+        if shell_v2:
+            send(3, bytes([process.returncode & 0xFF]))
+
+    def sync_fail(self, message: str) -> None:
+        self.request.sendall(
+            struct.pack("<4sI", b"FAIL", len(message)) + message.encode()
+        )
+
+    def sync(self) -> None:
+        """
+        Serve the file sync protocol, using the files of the local machine (the fake
+        device).
+        """
+
+        while True:
+            header = self.read_exactly(8)
+            if header is None:
+                return
+            request_id, size = struct.unpack("<4sI", header)
+            data = self.read_exactly(size) if size else b""
+            if request_id == b"QUIT" or data is None:
+                return
+            self.server.fake.sync_requests.append(
+                (request_id.decode(), data.decode(errors="replace"))
+            )
+            path = data.decode()
+
+            if request_id == b"STAT":
+                try:
+                    st = os.stat(path)
+                    reply = (st.st_mode, st.st_size, int(st.st_mtime))
+                except OSError:
+                    reply = (0, 0, 0)
+                self.request.sendall(struct.pack("<4sIII", b"STAT", *reply))
+            elif request_id == b"LIST":
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        st = entry.stat(follow_symlinks=False)
+                        name = entry.name.encode()
+                        self.request.sendall(
+                            struct.pack(
+                                "<4sIIII",
+                                b"DENT",
+                                st.st_mode,
+                                st.st_size,
+                                int(st.st_mtime),
+                                len(name),
+                            )
+                            + name
+                        )
+                self.request.sendall(struct.pack("<4sIIII", b"DONE", 0, 0, 0, 0))
+            elif request_id == b"SEND":
+                path, _, mode = path.rpartition(",")
+                error = None
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    output = open(path, "wb")
+                except OSError as e:
+                    error = str(e)
+                    output = open(os.devnull, "wb")
+                with output:
+                    while True:
+                        chunk_header = self.read_exactly(8)
+                        if chunk_header is None:
+                            return
+                        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+                        if chunk_id == b"DONE":
+                            break
+                        output.write(self.read_exactly(chunk_size) or b"")
+                if error:
+                    self.sync_fail(error)
+                else:
+                    os.chmod(path, int(mode) & 0o777)
+                    os.utime(path, (chunk_size, chunk_size))
+                    self.request.sendall(struct.pack("<4sI", b"OKAY", 0))
+            elif request_id == b"RECV":
+                try:
+                    with open(path, "rb") as source:
+                        for chunk in iter(lambda: source.read(65536), b""):
+                            self.request.sendall(
+                                struct.pack("<4sI", b"DATA", len(chunk)) + chunk
+                            )
+                except OSError as e:
+                    self.sync_fail(str(e))
+                    continue
+                self.request.sendall(struct.pack("<4sI", b"DONE", 0))
+            else:
+                self.sync_fail("unknown sync request")
+                return
+
+    def track_devices(self, long: bool) -> None:
+        """
+        Send the list of devices every time it changes, until the connection is
+        closed.
+        """
+
+        fake = self.server.fake
+        last = None
+        while True:
+            state = "offline" if fake.offline else "device"
+            devices = "".join(
+                "{0}\t{1}{2}\n".format(
+                    serial,
+                    state,
+                    " product:fake model:Fake_Device device:generic "
+                    "transport_id:{0}".format(index + 1)
+                    if long
+                    else "",
+                )
+                for index, serial in enumerate(fake.devices)
+            )
+            if devices != last:
+                message = devices.encode()
+                self.request.sendall("{0:04x}".format(len(message)).encode() + message)
+                last = devices
+            if select.select([self.request], [], [], 0.05)[0]:
+                if not self.request.recv(1):
+                    return
+
+    def handle(self) -> None:
+        fake = self.server.fake
+        fake.connections.add(self.request)
+        try:
+            self.handle_requests()
+        finally:
+            fake.connections.discard(self.request)
+
+    def handle_requests(self) -> None:
+        fake = self.server.fake
+        while True:
+            request = self.read_request()
+            if request is None:
+                return
+            fake.requests.append(request)
+
+            if request == "host:version":
+                self.okay_string("{0:04x}".format(fake.version))
+            elif request in ("host:devices", "host:devices-l"):
+                self.okay_string(
+                    "".join("{0}\tdevice\n".format(d) for d in fake.devices)
+                )
+            elif request in ("host:track-devices", "host:track-devices-l"):
+                self.okay()
+                self.track_devices(request.endswith("-l"))
+                return
+            elif request == "host:kill":
+                self.okay()
+                fake.killed = True
+                return
+            elif request.startswith("host:connect:"):
+                address = request.split(":", 2)[2]
+                if address in fake.unreachable_hosts:
+                    self.okay_string("failed to connect to {0}".format(address))
+                else:
+                    if ":" not in address:
+                        address = "{0}:5555".format(address)
+                    if address not in fake.devices:
+                        fake.devices.append(address)
+                    self.okay_string("connected to {0}".format(address))
+            elif request.startswith("host:disconnect:"):
+                address = request.split(":", 2)[2]
+                if address in fake.devices:
+                    fake.devices.remove(address)
+                self.okay_string("disconnected {0}".format(address))
+            elif request.endswith("get-state"):
+                serial = None
+                if request.startswith("host-serial:"):
+                    serial = request[len("host-serial:") : -len(":get-state")]
+                if fake.offline or (serial and serial not in fake.devices):
+                    self.fail("device offline")
+                else:
+                    self.okay_string("device")
+            elif request == "host:host-features":
+                self.okay_string(",".join(fake.host_features))
+            elif request.endswith(":features"):
+                self.okay_string(",".join(fake.features))
+            elif request.endswith("wait-for-any-device"):
+                self.okay()
+                self.okay()
+                return
+            elif request.startswith("host:transport:"):
+                serial = request.split(":", 2)[2]
+                if serial not in fake.devices:
+                    self.fail("device '{0}' not found".format(serial))
+                    return
+                self.okay()
+            elif request == "host:transport-any":
+                if len(fake.devices) != 1:
+                    self.fail("more than one device/emulator")
+                    return
+                self.okay()
+            else:
+                self.handle_device_service(request)
+                return
+
+    def handle_device_service(self, service: str) -> None:
+        fake = self.server.fake
+        name, _, argument = service.partition(":")
+
+        if name not in (
+            "shell,v2,raw",
+            "shell",
+            "exec",
+            "sync",
+            "reboot",
+            "remount",
+        ) or (name == "shell,v2,raw" and not fake.shell_v2):
+            self.fail("closed")
+            return
+        fake.opened_services.append(service)
+        if fake.latency > 0:
+            time.sleep(fake.latency)
+
+        if name == "shell,v2,raw":
+            self.okay()
+            self.run(argument, shell_v2=True, merge_stderr=False)
+        elif name in ("shell", "exec"):
+            self.okay()
+            self.run(argument, shell_v2=False)
+        elif name == "sync":
+            self.okay()
+            self.sync()
+        elif name == "reboot":
+            self.okay()
+            fake.offline = True
+        elif name == "remount":
+            self.okay(b"remount succeeded\n")
+
+
+class _FakeAdbTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fake: "FakeAdbServer"):
+        self.fake = fake
+        super().__init__(("127.0.0.1", 0), _FakeAdbRequestHandler)
+
+
+class FakeAdbServer:
+    def __init__(
+        self,
+        devices: Sequence[str] = ("emulator-5554",),
+        version: int = 41,
+        shell_v2: bool = True,
+        latency: float = 0.0,
+    ):
+        """
+        Fake adb server (listening on a random local port) speaking the adb
+        smart-socket protocol. The shell commands sent to the fake devices are
+        executed on the local machine, and the file sync service uses the files of
+        the local machine.
+
+        :param devices: The serial numbers of the fake devices.
+        :param version: The internal version number of the fake adb server.
+        :param shell_v2: When set to False, the fake devices won't support the shell
+                         protocol (shell,v2).
+        :param latency: How many seconds the fake devices wait before serving each
+                        service (e.g., a shell command), to emulate a real device.
+        """
+
+        self.devices = list(devices)
+        self.version = version
+        self.shell_v2 = shell_v2
+        self.latency = latency
+        self.unreachable_hosts = ["unknown"]
+        self.features = ["cmd", "shell_v2", "stat_v2"]
+        self.host_features = ["cmd", "shell_v2", "stat_v2"]
+        self.requests: List[str] = []
+        self.opened_services: List[str] = []
+        self.sync_requests: List[Tuple[str, str]] = []
+        self.connections: Set[socket.socket] = set()
+        self.killed = False
+        self.offline = False
+
+        self._server = _FakeAdbTCPServer(self)
+        self.port: int = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+
+    def __enter__(self) -> "FakeAdbServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def disconnect(self) -> None:
+        """
+        Close all the open connections (e.g., to simulate a device disconnection).
+        """
+
+        for connection in list(self.connections):
+            connection.shutdown(socket.SHUT_RDWR)
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
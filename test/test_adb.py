@@ -100,6 +100,23 @@ class TestCommandExecution:
         with pytest.raises(RuntimeError):
             adb_instance.shell(["sleep", "1"], is_async=True, timeout=3)
 
+    def test_adb_shell_stream(self, adb_instance: ADB):
+        with adb_instance.shell_stream(["logcat"]) as stream:
+            lines = [line for line, _ in zip(stream, range(10))]
+        assert len(lines) == 10
+        assert stream.closed
+
+    def test_adb_exec_out(self, adb_instance: ADB):
+        result = adb_instance.exec_out(["screencap", "-p"])
+        assert isinstance(result, bytes)
+        assert result.startswith(b"\x89PNG\r\n\x1a\n")
+
+    def test_adb_command_not_modified(self, adb_instance: ADB):
+        command = ["echo", "test"]
+        assert adb_instance.shell(command, device=adb_instance.target_device) == "test"
+        assert adb_instance.shell(command) == "test"
+        assert command == ["echo", "test"]
+
     def test_adb_execute_generic_exception(self, adb_instance: ADB, monkeypatch):
         monkeypatch.setattr(adb_instance.logger, "debug", lambda _: 1 / 0)
         with pytest.raises(Exception):
@@ -162,7 +179,7 @@ class TestFileInteraction:
         self, adb_instance: ADB, tmp_path: pathlib.Path, monkeypatch
     ):
         monkeypatch.setattr(
-            ADB, "execute", lambda _, command, timeout: "incomplete transfer"
+            ADB, "execute", lambda _, command, timeout, device: "incomplete transfer"
         )
         with pytest.raises(RuntimeError):
             adb_instance.pull_file("/etc/hosts", os.fspath(tmp_path))
@@ -222,7 +239,7 @@ class TestFileInteraction:
         self, adb_instance: ADB, tmp_path: pathlib.Path, monkeypatch
     ):
         monkeypatch.setattr(
-            ADB, "execute", lambda _, command, timeout: "incomplete transfer"
+            ADB, "execute", lambda _, command, timeout, device: "incomplete transfer"
         )
         source_file_path = tmp_path / "testfile.txt"
         with open(source_file_path, "w") as source_file:
@@ -255,7 +272,7 @@ class TestAppInstallation:
         self, adb_instance: ADB, tmp_path: pathlib.Path, monkeypatch
     ):
         monkeypatch.setattr(
-            ADB, "execute", lambda _, command, timeout: "Failure [ERROR]"
+            ADB, "execute", lambda _, command, timeout, device: "Failure [ERROR]"
         )
         invalid_apk_path = tmp_path / "invalid.apk"
         with open(invalid_apk_path, "w") as source_file:
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+import pathlib
+import subprocess
+import time
+
+import pytest
+
+from ..adb.async_adb import AsyncADB
+
+
+@pytest.fixture(scope="class")
+def async_adb_instance() -> AsyncADB:
+    instance = AsyncADB(debug=True)
+    asyncio.run(instance.connect(timeout=30))
+    return instance
+
+
+@pytest.fixture
+def stub_async_adb(stub_adb: str) -> AsyncADB:
+    # The commands run on the local machine through the stub adb executable (no
+    # real adb or device needed).
+    return AsyncADB(debug=True)
+
+
+@pytest.fixture
+def state_adb(tmp_path: pathlib.Path, monkeypatch) -> AsyncADB:
+    # Fake adb executable whose device goes offline after being polled 3 times
+    # (get-state always fails once the remount file exists).
+    count = tmp_path / "count"
+    count.write_text("0")
+    adb_executable = tmp_path / "adb"
+    adb_executable.write_text(
+        "#!/bin/sh\n"
+        '[ "$1" = get-state ] || exit 0\n'
+        "[ -f {0}/remount ] && exit 1\n"
+        "n=$(cat {1}); echo $((n + 1)) > {1}\n"
+        '[ "$n" -ge 3 ] && echo offline || echo device\n'.format(tmp_path, count)
+    )
+    adb_executable.chmod(0o755)
+    monkeypatch.setenv("ADB_PATH", os.fspath(adb_executable))
+    return AsyncADB(debug=True)
+
+
+class TestAsyncAdbAvailability:
+    def test_async_adb_not_available(self, monkeypatch):
+        monkeypatch.setenv("ADB_PATH", "fake adb path")
+        with pytest.raises(FileNotFoundError):
+            AsyncADB()
+
+
+class TestAsyncCommandExecution:
+    def test_async_adb_version(self, async_adb_instance: AsyncADB):
+        adb_version = asyncio.run(async_adb_instance.get_version())
+        assert isinstance(adb_version, str)
+        assert adb_version != ""
+
+    def test_async_adb_shell(self, async_adb_instance: AsyncADB):
+        result = asyncio.run(async_adb_instance.shell(["echo", "Hello"]))
+        assert result == "Hello"
+
+    def test_async_adb_background_shell(self, async_adb_instance: AsyncADB):
+        result = asyncio.run(async_adb_instance.shell(["sleep", "1"], is_async=True))
+        assert result is None
+
+    def test_async_adb_concurrent_shell(self, async_adb_instance: AsyncADB):
+        async def run_all():
+            return await asyncio.gather(
+                *(async_adb_instance.shell(["echo", str(i)]) for i in range(5))
+            )
+
+        assert asyncio.run(run_all()) == ["0", "1", "2", "3", "4"]
+
+    def test_async_adb_get_state(self, async_adb_instance: AsyncADB):
+        assert asyncio.run(async_adb_instance.get_state(timeout=10)) == "device"
+
+    def test_async_adb_invalid_command(self, async_adb_instance: AsyncADB):
+        with pytest.raises(TypeError):
+            asyncio.run(async_adb_instance.shell("not a list of strings"))  # type: ignore
+
+    def test_async_adb_invalid_timeout(self, async_adb_instance: AsyncADB):
+        with pytest.raises(ValueError):
+            asyncio.run(async_adb_instance.shell(["sleep", "1"], timeout=0))
+
+    def test_async_adb_shell_timeout(self, async_adb_instance: AsyncADB):
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(async_adb_instance.shell(["sleep", "300"], timeout=3))
+
+    def test_async_adb_shell_cancel(self, async_adb_instance: AsyncADB):
+        async def cancel_shell():
+            task = asyncio.ensure_future(async_adb_instance.shell(["sleep", "300"]))
+            await asyncio.sleep(1)
+            task.cancel()
+            await task
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(cancel_shell())
+
+
+class TestAsyncFileInteraction:
+    def test_async_adb_pull_single_valid_file(
+        self, async_adb_instance: AsyncADB, tmp_path: pathlib.Path
+    ):
+        dest_file = tmp_path / "hosts"
+        asyncio.run(async_adb_instance.pull_file("/etc/hosts", os.fspath(dest_file)))
+        assert os.path.isfile(dest_file)
+        assert os.path.getsize(dest_file) > 0
+
+    def test_async_adb_push_invalid_file(self, async_adb_instance: AsyncADB):
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(async_adb_instance.push_file("", "/data/local/tmp/"))
+
+    def test_async_adb_install_missing_apk_file(self, async_adb_instance: AsyncADB):
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(async_adb_instance.install_app("", timeout=300))
+
+    def test_async_adb_runtime_install_error(
+        self, async_adb_instance: AsyncADB, tmp_path: pathlib.Path, monkeypatch
+    ):
+        async def fake_execute(*args, **kwargs):
+            return "Failure [ERROR]"
+
+        monkeypatch.setattr(async_adb_instance, "execute", fake_execute)
+        invalid_apk_path = tmp_path / "invalid.apk"
+        with open(invalid_apk_path, "w") as source_file:
+            source_file.write("This is not an apk file\n")
+        with pytest.raises(RuntimeError):
+            asyncio.run(async_adb_instance.install_app(os.fspath(invalid_apk_path)))
+
+
+class TestAsyncStubAdb:
+    def test_async_execute_output(self, stub_async_adb: AsyncADB):
+        assert asyncio.run(stub_async_adb.get_version()) == "1.0.41"
+        assert asyncio.run(stub_async_adb.shell(["echo", "Hello"])) == "Hello"
+        assert asyncio.run(stub_async_adb.get_state(timeout=10)) == "device"
+
+    def test_async_execute_error(self, stub_async_adb: AsyncADB):
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            asyncio.run(stub_async_adb.shell(["echo", "failed;", "exit", "3"]))
+        assert error.value.returncode == 3
+        assert error.value.output == b"failed"
+
+    def test_async_execute_timeout(
+        self, stub_async_adb: AsyncADB, tmp_path: pathlib.Path
+    ):
+        # The whole process group is killed, including the processes started by
+        # the command.
+        pid_file = tmp_path / "pid"
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(
+                stub_async_adb.shell(
+                    ["sleep 30 & echo $! > {0}; wait".format(pid_file)], timeout=1
+                )
+            )
+        pid = int(pid_file.read_text())
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("The process started by the command is still running")
+
+    def test_async_get_state_polling(
+        self, state_adb: AsyncADB, tmp_path: pathlib.Path, caplog
+    ):
+        # The reboot returns when the device goes offline.
+        assert asyncio.run(state_adb.reboot(timeout=10)) == ""
+        assert (tmp_path / "count").read_text().strip() == "4"
+
+        # The failing get-state commands are not logged as errors, the remount only
+        # times out.
+        (tmp_path / "remount").touch()
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(state_adb.remount(timeout=1))
+        assert not [
+            r
+            for r in caplog.records
+            if r.levelno >= logging.ERROR and "get-state" in r.getMessage()
+        ]
+
+    def test_async_get_state_not_available(self, stub_async_adb: AsyncADB):
+        stub_async_adb.adb_path = "/missing/adb"
+        assert asyncio.run(stub_async_adb.get_state(timeout=10)) == ""
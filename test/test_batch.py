@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.batch import ShellResult, batch_scripts, parse_batch_output
+from .fake_adb_server import FakeAdbServer
+
+
+class TestShellBatch:
+    def test_parse_batch_output(self):
+        commands = [["echo", "a"], ["false"], ["printf", "b"]]
+        output = "a\n\nm 0 0 1.00 1.25\n\nm 1 1 1.25 1.25\nb\nm 2 0 1.30 2.00\n"
+        assert parse_batch_output(output, commands, "m") == [
+            ShellResult(["echo", "a"], "a", 0, 0.25),
+            ShellResult(["false"], "", 1, 0.0),
+            ShellResult(["printf", "b"], "b", 0, 0.7),
+        ]
+        # The last command was never executed.
+        assert len(parse_batch_output(output.split("b\n")[0], commands, "m")) == 2
+
+    def test_batch_scripts(self):
+        commands = [["echo", str(index) * 50] for index in range(10)]
+        assert len(batch_scripts(commands, "m")) == 1
+        scripts = batch_scripts(commands, "m", max_length=300)
+        assert len(scripts) > 1
+        assert all(len(script) <= 300 for script in scripts)
+
+    def test_shell_batch(self, native_adb: ADB, fake_server: FakeAdbServer):
+        results = native_adb.shell_batch(
+            [
+                ["echo", "first"],
+                ["echo", "'quoted; $HOME'", ";", "exit", "3"],
+                ["ls", "/nonexistent", "&&", "echo", "never"],
+                ["printf", "no-newline"],
+                ["cd", "/", "&&", "exit", "0"],
+                ["echo", "last"],
+            ],
+            timeout=10,
+        )
+
+        assert [(result.output, result.exit_code) for result in results] == [
+            ("first", 0),
+            ("quoted; $HOME", 3),
+            (results[2].output, results[2].exit_code),
+            ("no-newline", 0),
+            ("", 0),
+            ("last", 0),
+        ]
+        assert not results[2].ok and "nonexistent" in results[2].output
+        assert all(result.duration >= 0 for result in results)
+        # A single shell invocation for all the commands.
+        assert len([r for r in fake_server.requests if r.startswith("shell")]) == 1
+
+    def test_shell_batch_split(self, native_adb: ADB, fake_server: FakeAdbServer):
+        commands = [["echo", str(index)] for index in range(20)]
+        results = native_adb.shell_batch(commands, timeout=10, max_length=300)
+        assert [result.output for result in results] == [str(i) for i in range(20)]
+        assert len([r for r in fake_server.requests if r.startswith("shell")]) > 1
+
+    def test_parse_stripped_output(self):
+        # The first command printed nothing, so the (stripped) output starts with
+        # the marker, and CRLF line endings (older devices).
+        commands = [["true"], ["echo", "a"]]
+        output = "m 0 0 1.00 1.00\r\na\r\nm 1 0 1.00 1.10"
+        assert parse_batch_output(output, commands, "m") == [
+            ShellResult(["true"], "", 0, 0.0),
+            ShellResult(["echo", "a"], "a", 0, 0.1),
+        ]
+
+    def test_shell_batch_silent_commands(self, native_adb: ADB):
+        results = native_adb.shell_batch([["true"], ["echo", "a"]], timeout=10)
+        assert [(r.output, r.exit_code) for r in results] == [("", 0), ("a", 0)]
+
+        # The first command of the second invocation prints nothing too.
+        results = native_adb.shell_batch(
+            [["echo", "x"], ["true"], ["echo", "b"]], timeout=10, max_length=10
+        )
+        assert [result.output for result in results] == ["x", "", "b"]
+
+    def test_shell_batch_invalid_command(self, native_adb: ADB):
+        with pytest.raises(TypeError):
+            native_adb.shell_batch([["echo", "a"], "echo b"])  # type: ignore[list-item]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import io
+import subprocess
+
+import pytest
+
+from ..adb.adb import ADB
+from .fake_adb_server import FakeAdbServer
+
+
+class TestExecOut:
+    def test_exec_out_bytes(self, native_adb: ADB, fake_server: FakeAdbServer):
+        result = native_adb.exec_out(["printf", "'\\000\\377\\r\\n'"])
+        assert result == b"\x00\xff\r\n"
+        assert fake_server.opened_services == ["exec:printf '\\000\\377\\r\\n'"]
+
+    def test_exec_out_large_output(self, native_adb: ADB):
+        result = native_adb.exec_out(["head", "-c", "3000000", "/dev/zero"])
+        assert isinstance(result, bytes)
+        assert result == bytes(3000000)
+
+    def test_exec_out_file_object(self, native_adb: ADB):
+        output = io.BytesIO()
+        size = native_adb.exec_out(
+            ["head", "-c", "200000", "/dev/zero"], output, chunk_size=4096
+        )
+        assert size == 200000
+        assert output.getvalue() == bytes(200000)
+
+    def test_exec_out_buffer(self, native_adb: ADB):
+        buffer = bytearray(10)
+        assert native_adb.exec_out(["printf", "binary"], memoryview(buffer)) == 6
+        assert buffer[:6] == b"binary"
+
+    def test_exec_out_buffer_too_small(self, native_adb: ADB):
+        with pytest.raises(RuntimeError):
+            native_adb.exec_out(["printf", "binary"], bytearray(3))
+
+    def test_exec_out_device_not_found(self, fake_server: FakeAdbServer):
+        adb = ADB("unknown", backend="native", server_port=fake_server.port)
+        with pytest.raises(subprocess.CalledProcessError):
+            adb.exec_out(["echo", "test"])
+
+    def test_exec_out_subprocess_error(self, stub_adb: str):
+        # A command failing before the timeout is not reported as timed out.
+        adb = ADB(debug=True)
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            adb.exec_out(["exit", "3"], timeout=10)
+        assert error.value.returncode == 3
+
+    def test_exec_out_subprocess_timeout(self, stub_adb: str):
+        adb = ADB(debug=True)
+        with pytest.raises(subprocess.TimeoutExpired):
+            adb.exec_out(["exec", "sleep", "5"], timeout=1)
+
+    def test_exec_out_invalid_command(self, native_adb: ADB):
+        with pytest.raises(TypeError):
+            native_adb.exec_out("not a list of strings")  # type: ignore
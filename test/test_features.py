@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import pathlib
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.commands import parse_features, pull_command, push_command
+from ..adb.features import choose_compression, is_compressible
+from .fake_adb_server import FakeAdbServer
+
+COMPRESSION_FEATURES = ["sendrecv_v2", "sendrecv_v2_brotli", "sendrecv_v2_lz4"]
+
+
+@pytest.fixture
+def adb_calls(native_adb: ADB, tmp_path: pathlib.Path) -> pathlib.Path:
+    # Fake adb executable used for the compressed transfers (every call is logged
+    # in a file).
+    calls = tmp_path / "calls"
+    calls.touch()
+    adb_executable = tmp_path / "adb"
+    adb_executable.write_text(
+        '#!/bin/sh\necho "$*" >> {0}\necho "1 file $1ed, 0 skipped."\n'.format(calls)
+    )
+    adb_executable.chmod(0o755)
+    native_adb.adb_path = str(adb_executable)
+    return calls
+
+
+class TestFeatures:
+    def test_parse_features(self):
+        assert parse_features("shell_v2,cmd") == ["shell_v2", "cmd"]
+        assert parse_features("shell_v2\ncmd\n") == ["shell_v2", "cmd"]
+        assert parse_features("") == []
+
+    def test_choose_compression(self):
+        assert is_compressible("/data/local/tmp/logcat.txt")
+        assert is_compressible("/data/data/app/databases/")
+        assert not is_compressible("/path/to/App.APK")
+
+        features = COMPRESSION_FEATURES + ["sendrecv_v2_zstd"]
+        assert choose_compression(["app.db"], features) == "zstd"
+        assert choose_compression(["app.db"], COMPRESSION_FEATURES) == "lz4"
+        assert choose_compression(["app.apk", "photo.jpg"], features) == "none"
+        assert choose_compression(["app.apk", "trace.log"], features) == "zstd"
+        assert choose_compression(["app.db"], ["shell_v2"]) is None
+        assert choose_compression(["app.apk"], [], "brotli") == "brotli"
+        assert choose_compression(["app.db"], features, "none") == "none"
+        with pytest.raises(ValueError):
+            choose_compression(["app.db"], features, "invalid")
+
+    def test_compression_commands(self, tmp_path: pathlib.Path):
+        source = tmp_path / "file.txt"
+        source.touch()
+        assert push_command(str(source), "/sdcard/", "zstd") == [
+            "push",
+            "-z",
+            "zstd",
+            str(source),
+            "/sdcard/",
+        ]
+        assert pull_command("/sdcard/file.txt", str(tmp_path), "none") == [
+            "pull",
+            "-Z",
+            "/sdcard/file.txt",
+            str(tmp_path),
+        ]
+        assert push_command(str(source), "/sdcard/") == [
+            "push",
+            str(source),
+            "/sdcard/",
+        ]
+
+    def test_get_features(self, native_adb: ADB, fake_server: FakeAdbServer):
+        fake_server.features += ["sendrecv_v2", "sendrecv_v2_zstd"]
+        fake_server.host_features += ["sendrecv_v2", "track_app"]
+        assert native_adb.get_features() == [
+            "cmd",
+            "sendrecv_v2",
+            "shell_v2",
+            "stat_v2",
+        ]
+        native_adb.get_features()
+        assert fake_server.requests.count("host:features") == 1
+        assert native_adb.get_features(refresh=True)
+        assert fake_server.requests.count("host:features") == 2
+
+    def test_reboot_invalidates_features(
+        self, native_adb: ADB, fake_server: FakeAdbServer
+    ):
+        native_adb.get_features(device="emulator-5554")
+        native_adb.reboot(device="emulator-5554")
+        native_adb.get_features(device="emulator-5554")
+        assert fake_server.requests.count("host-serial:emulator-5554:features") == 2
+
+    def test_push_compression(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        fake_server.features += COMPRESSION_FEATURES
+        fake_server.host_features += COMPRESSION_FEATURES
+        (tmp_path / "trace.log").write_text("log line\n" * 100)
+        (tmp_path / "app.apk").write_bytes(b"PK\x03\x04")
+        destination = tmp_path / "device"
+        destination.mkdir()
+
+        native_adb.push_file(
+            str(tmp_path / "trace.log"), str(destination), compression="auto"
+        )
+        native_adb.push_file(
+            str(tmp_path / "trace.log"), str(destination), compression="brotli"
+        )
+        assert adb_calls.read_text().splitlines() == [
+            "push -z lz4 {0} {1}".format(tmp_path / "trace.log", destination),
+            "push -z brotli {0} {1}".format(tmp_path / "trace.log", destination),
+        ]
+
+        # Not compressed, copied with the file sync protocol.
+        native_adb.push_file(
+            str(tmp_path / "app.apk"), str(destination), compression="auto"
+        )
+        native_adb.push_file(
+            str(tmp_path / "trace.log"), str(destination), compression="none"
+        )
+        native_adb.push_file(
+            str(tmp_path / "trace.log"),
+            str(destination),
+            progress=lambda *_: None,
+            compression="zstd",
+        )
+        assert len(adb_calls.read_text().splitlines()) == 2
+        assert (destination / "app.apk").read_bytes() == b"PK\x03\x04"
+        assert (destination / "trace.log").exists()
+
+    def test_pull_compression(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        fake_server.features += COMPRESSION_FEATURES
+        fake_server.host_features += COMPRESSION_FEATURES
+        (tmp_path / "app.db").write_bytes(b"SQLite format 3\x00")
+
+        native_adb.pull_file(
+            str(tmp_path / "app.db"), str(tmp_path / "copy.db"), compression="auto"
+        )
+        assert adb_calls.read_text().splitlines() == [
+            "pull -z lz4 {0} {1}".format(tmp_path / "app.db", tmp_path / "copy.db")
+        ]
+
+    def test_no_compression_support(
+        self,
+        native_adb: ADB,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        # An older adb server (or device) doesn't report the compression features.
+        (tmp_path / "trace.log").write_text("log line\n")
+        native_adb.pull_file(
+            str(tmp_path / "trace.log"), str(tmp_path / "copy.log"), compression="auto"
+        )
+        assert (tmp_path / "copy.log").read_text() == "log line\n"
+        assert adb_calls.read_text() == ""
+
+    def test_compression_not_requested(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        fake_server.features += COMPRESSION_FEATURES
+        fake_server.host_features += COMPRESSION_FEATURES
+        (tmp_path / "trace.log").write_text("log line\n")
+
+        # By default, the features are not queried and the file is copied as usual.
+        native_adb.pull_file(str(tmp_path / "trace.log"), str(tmp_path / "copy.log"))
+        assert (tmp_path / "copy.log").read_text() == "log line\n"
+        assert adb_calls.read_text() == ""
+        assert not any(request.endswith("features") for request in fake_server.requests)
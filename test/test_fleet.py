@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.fleet import BulkConnector, backoff_delay, normalize_endpoint
+from .fake_adb_server import FakeAdbServer
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class TestFleet:
+    def test_normalize_endpoint(self):
+        assert normalize_endpoint("10.0.0.1") == "10.0.0.1:5555"
+        assert normalize_endpoint("10.0.0.1:5556") == "10.0.0.1:5556"
+        assert normalize_endpoint("device.local") == "device.local:5555"
+        assert normalize_endpoint("::1") == "[::1]:5555"
+        assert normalize_endpoint("[::1]:5556") == "[::1]:5556"
+
+    def test_backoff_delay(self):
+        for attempt, delay in ((1, 1.0), (2, 2.0), (3, 4.0), (10, 5.0)):
+            assert delay / 2 <= backoff_delay(attempt, 1.0, 5.0) <= delay
+
+    def test_connect_many(self, native_adb: ADB, fake_server: FakeAdbServer):
+        hosts = ["10.0.0.{0}".format(index) for index in range(1, 21)]
+        fake_server.unreachable_hosts.append("10.0.0.7")
+
+        report = native_adb.connect_many(hosts + ["unknown"], retries=1, backoff=0)
+
+        assert not report.ok
+        assert [status.host for status in report.hosts] == hosts + ["unknown"]
+        assert [status.host for status in report.failed] == ["10.0.0.7", "unknown"]
+        for status in report.failed:
+            assert isinstance(status.error, RuntimeError)
+            assert status.output is None and status.attempts == 2
+        connected = report.hosts[0]
+        assert connected.serial == "10.0.0.1:5555"
+        assert connected.output == "connected to 10.0.0.1:5555"
+        assert connected.attempts == 1
+        assert len(native_adb.get_available_devices()) == 1 + 19
+
+    def test_bulk_connector(self):
+        # The first attempts of the flaky host fail, the other hosts are connected
+        # while it waits.
+        failures: Dict[str, int] = {"flaky": 2}
+        active: List[int] = [0, 0]
+        lock = threading.Lock()
+
+        def connect(host: str, timeout: Optional[int]) -> str:
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+                if failures.get(host, 0) > 0:
+                    failures[host] -= 1
+                    raise RuntimeError("failed to connect to {0}".format(host))
+            return "connected to {0}".format(host)
+
+        connector = BulkConnector(connect, max_workers=3, retries=2, backoff=0.01)
+        report = connector.run(["flaky"] + ["host{0}".format(i) for i in range(8)])
+
+        assert report.ok
+        assert report.hosts[0].attempts == 3
+        assert all(status.attempts == 1 for status in report.hosts[1:])
+        # Never more than max_workers connections at the same time.
+        assert active[1] <= 3
+
+        with pytest.raises(ValueError):
+            connector.run(["host", ""])
+        with pytest.raises(ValueError):
+            BulkConnector(connect, max_workers=0)
+
+    def test_keep_alive(self, native_adb: ADB, fake_server: FakeAdbServer):
+        tracker = native_adb.track_devices()
+        hosts = ["10.0.0.1:5555", "10.0.0.2"]
+
+        # A long interval: the dropped device is noticed through the tracker.
+        with native_adb.keep_alive(hosts, interval=60, backoff=0) as monitor:
+            assert wait_until(lambda: "10.0.0.2:5555" in tracker.devices())
+            assert monitor.reconnections == {"10.0.0.1:5555": 1, "10.0.0.2": 1}
+
+            fake_server.devices.remove("10.0.0.2:5555")
+            assert wait_until(
+                lambda: monitor.reconnections == {"10.0.0.1:5555": 1, "10.0.0.2": 2}
+            )
+            assert "10.0.0.2:5555" in fake_server.devices
+        assert not monitor.running
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import pathlib
+import zipfile
+
+import pytest
+
+from ..adb import adb as adb_module
+from ..adb.adb import ADB
+from ..adb.commands import install_command
+from ..adb.install import parse_apk_manifest
+from .fake_adb_server import FakeAdbServer
+
+TEST_APK = pathlib.Path(__file__).parent / "test_resources" / "test.apk"
+
+
+def make_apk(path: pathlib.Path, package: str, extra: bytes = b"") -> pathlib.Path:
+    # Copy of the test apk with a different package name (with the same length,
+    # so that the binary manifest is still valid) and an optional extra file.
+    with zipfile.ZipFile(TEST_APK) as source, zipfile.ZipFile(path, "w") as apk:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename == "AndroidManifest.xml":
+                for encoding in ("utf-8", "utf-16-le"):
+                    data = data.replace(
+                        "com.test.pythonadb".encode(encoding), package.encode(encoding)
+                    )
+            apk.writestr(item, data)
+        if extra:
+            apk.writestr("assets/extra", extra)
+    return path
+
+
+@pytest.fixture
+def device_dir(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # The commands sent to the fake devices run on the local machine, so a fake pm
+    # executable is added to the PATH: the apk files "installed" in device_dir
+    # belong to the package at the beginning of their names.
+    device_dir = tmp_path / "device"
+    device_dir.mkdir()
+    pm = tmp_path / "pm"
+    pm.write_text(
+        '#!/bin/sh\nfor f in {0}/$2*.apk; do [ -f "$f" ] && echo "package:$f"; '
+        "done\nexit 0\n".format(device_dir)
+    )
+    pm.chmod(0o755)
+    monkeypatch.setenv("PATH", "{0}:{1}".format(tmp_path, os.environ["PATH"]))
+    return device_dir
+
+
+@pytest.fixture
+def adb_calls(tmp_path: pathlib.Path, device_dir: pathlib.Path) -> pathlib.Path:
+    # Fake adb executable used for the installations (every call is logged in a
+    # file), copying the apk files into device_dir.
+    calls = tmp_path / "calls"
+    calls.touch()
+    adb_executable = tmp_path / "adb"
+    adb_executable.write_text(
+        '#!/bin/sh\necho "$*" >> {0}\nfor arg in "$@"; do case "$arg" in *.apk) '
+        'cp "$arg" {1}/ ;; esac; done\necho Success\n'.format(calls, device_dir)
+    )
+    adb_executable.chmod(0o755)
+    return calls
+
+
+@pytest.fixture
+def cmd_calls(tmp_path: pathlib.Path, device_dir: pathlib.Path) -> pathlib.Path:
+    # Fake cmd executable of the device (every call is logged in a file), saving
+    # the apk files streamed into the package manager in device_dir.
+    calls = tmp_path / "cmd_calls"
+    calls.touch()
+    cmd = tmp_path / "cmd"
+    cmd.write_text(
+        "#!/bin/sh\n"
+        'echo "$*" >> {0}\n'
+        'case "$2" in\n'
+        "install) cat > {1}/streamed.apk; echo Success ;;\n"
+        'install-create) echo "Success: created install session [42]" ;;\n'
+        'install-write) cat > {1}/"$6"; echo "Success: streamed $4 bytes" ;;\n'
+        "install-commit) echo Success ;;\n"
+        "esac\n".format(calls, device_dir)
+    )
+    cmd.chmod(0o755)
+    return calls
+
+
+@pytest.fixture
+def native_adb(
+    fake_server: FakeAdbServer, adb_calls: pathlib.Path, tmp_path: pathlib.Path
+) -> ADB:
+    adb = ADB(
+        debug=True,
+        backend="native",
+        server_port=fake_server.port,
+        install_cache=str(tmp_path / "install_cache.json"),
+    )
+    adb.adb_path = str(tmp_path / "adb")
+    return adb
+
+
+class TestInstall:
+    def test_parse_apk_manifest(self, tmp_path: pathlib.Path):
+        assert parse_apk_manifest(str(TEST_APK)) == ("com.test.pythonadb", 1)
+        other = make_apk(tmp_path / "other.apk", "com.test.pythonadc")
+        assert parse_apk_manifest(str(other)) == ("com.test.pythonadc", 1)
+
+        invalid = tmp_path / "invalid.apk"
+        invalid.write_text("not an apk")
+        with pytest.raises(ValueError):
+            parse_apk_manifest(str(invalid))
+
+    def test_install_commands(self):
+        assert install_command(["base.apk", "split.apk"], replace_existing=True) == [
+            "install-multiple",
+            "-r",
+            "base.apk",
+            "split.apk",
+        ]
+        assert install_command(["a.apk", "b.apk"], multi_package=True) == [
+            "install-multi-package",
+            "a.apk",
+            "b.apk",
+        ]
+
+    def test_skip_identical(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        apk = make_apk(tmp_path / "com.test.pythonadb.apk", "com.test.pythonadb")
+
+        assert native_adb.install_app(str(apk), skip_identical=True) == "Success"
+        assert native_adb.install_app(str(apk), skip_identical=True).startswith(
+            "Skipped"
+        )
+        assert len(adb_calls.read_text().splitlines()) == 1
+        # The installed files were remembered, they are never hashed on the device.
+        assert not any("md5sum" in request for request in fake_server.requests)
+
+        # A new build of the application.
+        make_apk(apk, "com.test.pythonadb", extra=b"new build")
+        assert native_adb.install_app(str(apk), skip_identical=True) == "Success"
+        assert len(adb_calls.read_text().splitlines()) == 2
+
+        # Without skip_identical, the application is always installed.
+        native_adb.install_app(str(apk))
+        assert len(adb_calls.read_text().splitlines()) == 3
+
+    def test_install_without_parsing(
+        self,
+        native_adb: ADB,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+        monkeypatch,
+        caplog,
+    ):
+        # Without skip_identical, the apk file is left to adb as before (its
+        # manifest is not read, even if adb could install it anyway).
+        def parse_apk_manifest(apk_path: str):
+            raise AssertionError("Unexpected parsing of {0}".format(apk_path))
+
+        monkeypatch.setattr(adb_module, "parse_apk_manifest", parse_apk_manifest)
+        unreadable = tmp_path / "unreadable.apk"
+        unreadable.write_text("not a zip file")
+
+        assert native_adb.install_app(str(unreadable)) == "Success"
+        assert adb_calls.read_text().splitlines() == ["install {0}".format(unreadable)]
+        assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+
+    def test_skip_identical_checksum(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        device_dir: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        apk = make_apk(tmp_path / "com.test.pythonadb.apk", "com.test.pythonadb")
+
+        # Installed without using the cache: the files are hashed on the device.
+        native_adb.install_app(str(apk))
+        assert native_adb.install_app(str(apk), skip_identical=True).startswith(
+            "Skipped"
+        )
+        assert any("md5sum" in request for request in fake_server.requests)
+
+        # Changed on the device (same size), the cached information is not valid.
+        installed = device_dir / apk.name
+        installed.write_bytes(installed.read_bytes()[::-1])
+        os.utime(installed, (0, 0))
+        assert native_adb.install_app(str(apk), skip_identical=True) == "Success"
+        assert len(adb_calls.read_text().splitlines()) == 2
+
+    def test_persistent_cache(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        apk = make_apk(tmp_path / "com.test.pythonadb.apk", "com.test.pythonadb")
+        native_adb.install_app(str(apk), skip_identical=True)
+
+        adb = ADB(
+            backend="native",
+            server_port=fake_server.port,
+            install_cache=str(tmp_path / "install_cache.json"),
+        )
+        assert adb.install_app(str(apk), skip_identical=True).startswith("Skipped")
+        assert len(adb_calls.read_text().splitlines()) == 1
+        assert not any("md5sum" in request for request in fake_server.requests)
+
+    def test_install_packages(
+        self, native_adb: ADB, adb_calls: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        app = make_apk(tmp_path / "com.test.pythonadb.apk", "com.test.pythonadb")
+        test_app = make_apk(tmp_path / "com.test.pythonadc.apk", "com.test.pythonadc")
+
+        results = native_adb.install_packages(
+            [str(app), str(test_app)], skip_identical=True
+        )
+        assert [(r.package, r.skipped) for r in results] == [
+            ("com.test.pythonadb", False),
+            ("com.test.pythonadc", False),
+        ]
+        assert adb_calls.read_text().splitlines() == [
+            "install-multi-package {0} {1}".format(app, test_app)
+        ]
+
+        make_apk(test_app, "com.test.pythonadc", extra=b"new build")
+        results = native_adb.install_packages(
+            [str(app), str(test_app)], skip_identical=True
+        )
+        assert [(r.package, r.skipped) for r in results] == [
+            ("com.test.pythonadb", True),
+            ("com.test.pythonadc", False),
+        ]
+        assert adb_calls.read_text().splitlines()[-1] == "install {0}".format(test_app)
+
+    def test_install_multiple(
+        self, native_adb: ADB, adb_calls: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        base = make_apk(tmp_path / "com.test.pythonadb.apk", "com.test.pythonadb")
+        split = make_apk(
+            tmp_path / "com.test.pythonadb-config.apk",
+            "com.test.pythonadb",
+            extra=b"split",
+        )
+
+        result = native_adb.install_multiple(
+            [str(base), str(split)], skip_identical=True
+        )
+        assert not result.skipped
+        assert native_adb.install_multiple(
+            [str(base), str(split)], skip_identical=True
+        ).skipped
+        assert adb_calls.read_text().splitlines() == [
+            "install-multiple {0} {1}".format(base, split)
+        ]
+
+    def test_streamed_install(
+        self,
+        native_adb: ADB,
+        adb_calls: pathlib.Path,
+        cmd_calls: pathlib.Path,
+        device_dir: pathlib.Path,
+    ):
+        size = TEST_APK.stat().st_size
+        progress = []
+
+        result = native_adb.install_app(
+            str(TEST_APK),
+            replace_existing=True,
+            streamed=True,
+            progress=lambda *args: progress.append(args),
+        )
+        assert result == "Success"
+        assert cmd_calls.read_text().splitlines() == [
+            "package install -r -S {0}".format(size)
+        ]
+        assert (device_dir / "streamed.apk").read_bytes() == TEST_APK.read_bytes()
+        assert progress[-1] == (str(TEST_APK), size, size)
+        assert adb_calls.read_text() == ""
+
+    def test_streamed_install_multiple(
+        self,
+        native_adb: ADB,
+        cmd_calls: pathlib.Path,
+        device_dir: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        split = make_apk(tmp_path / "split.apk", "com.test.pythonadb", extra=b"split")
+        sizes = [TEST_APK.stat().st_size, split.stat().st_size]
+
+        result = native_adb.install_multiple([str(TEST_APK), str(split)], streamed=True)
+        assert result.output == "Success"
+        assert cmd_calls.read_text().splitlines() == [
+            "package install-create -S {0}".format(sum(sizes)),
+            "package install-write -S {0} 42 0_test.apk -".format(sizes[0]),
+            "package install-write -S {0} 42 1_split.apk -".format(sizes[1]),
+            "package install-commit 42",
+        ]
+        assert (device_dir / "1_split.apk").read_bytes() == split.read_bytes()
+
+    def test_streamed_install_fallback(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        adb_calls: pathlib.Path,
+        cmd_calls: pathlib.Path,
+    ):
+        fake_server.features = ["shell_v2"]
+        assert native_adb.install_app(str(TEST_APK), streamed=True) == "Success"
+        assert adb_calls.read_text().splitlines() == ["install {0}".format(TEST_APK)]
+        assert cmd_calls.read_text() == ""
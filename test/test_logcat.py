@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import pathlib
+import struct
+from typing import Iterator, List
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.logcat import (
+    LogBuffer,
+    LogEntry,
+    LogFilter,
+    LogWriter,
+    parse_binary,
+    parse_threadtime,
+)
+
+THREADTIME = (
+    b"--------- beginning of main\n"
+    b"01-02 03:04:05.678  1234  5678 I ActivityManager: Start proc\n"
+    b"01-02 03:04:05.679  1234  5679 D Tag with spaces: a: b\r\n"
+    b"01-02 03:04:05.680   999   999 E Crash   : \n"
+)
+
+
+def binary_entry(pid: int, priority: int, tag: bytes, message: bytes) -> bytes:
+    # struct logger_entry (version 4) followed by the payload.
+    payload = bytes([priority]) + tag + b"\0" + message + b"\0"
+    return struct.pack("<HHiIIIII", len(payload), 28, pid, pid, 0, 5000000, 0, 0) + (
+        payload
+    )
+
+
+def entries(batches: Iterator[List[LogEntry]]) -> List[LogEntry]:
+    return [entry for batch in batches for entry in batch]
+
+
+@pytest.fixture
+def fake_logcat(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # The commands sent to the fake devices run on the local machine, so a fake
+    # logcat executable (printing the content of a file) is added to the PATH.
+    log = tmp_path / "log"
+    logcat = tmp_path / "logcat"
+    logcat.write_text('#!/bin/sh\ncat {0}\n[ "$1" = -B ] && cat {0}.bin\n'.format(log))
+    logcat.chmod(0o755)
+    monkeypatch.setenv("PATH", "{0}:{1}".format(tmp_path, os.environ["PATH"]))
+    return log
+
+
+class TestLogcat:
+    def test_parse_threadtime(self):
+        # Split in chunks in the middle of the lines.
+        chunks = [THREADTIME[i : i + 7] for i in range(0, len(THREADTIME), 7)]
+        assert entries(parse_threadtime(chunks)) == [
+            LogEntry(
+                "01-02 03:04:05.678", 1234, 5678, "I", "ActivityManager", "Start proc"
+            ),
+            LogEntry("01-02 03:04:05.679", 1234, 5679, "D", "Tag with spaces", "a: b"),
+            LogEntry("01-02 03:04:05.680", 999, 999, "E", "Crash", ""),
+        ]
+
+        log_filter = LogFilter(min_priority="I", pids=[1234])
+        assert [
+            entry.tag for entry in entries(parse_threadtime([THREADTIME], log_filter))
+        ] == ["ActivityManager"]
+
+    def test_parse_binary(self):
+        data = (
+            binary_entry(10, 4, b"Tag", b"hello")
+            + binary_entry(11, 3, b"Other", b"debug")
+            # Entry of the events buffer, without a tag.
+            + struct.pack("<HHiIIIII", 4, 28, 12, 12, 0, 0, 2, 0)
+            + b"\x01\x02\x03\x04"
+        )
+        chunks = [data[i : i + 5] for i in range(0, len(data), 5)]
+        parsed = entries(parse_binary(chunks))
+        assert [(e.pid, e.priority, e.tag, e.message) for e in parsed] == [
+            (10, "I", "Tag", "hello"),
+            (11, "D", "Other", "debug"),
+        ]
+        assert parsed[0].timestamp.endswith(".005")
+
+        log_filter = LogFilter(tags=["Other"])
+        assert [e.tag for e in entries(parse_binary([data], log_filter))] == ["Other"]
+
+    def test_buffer_and_writer(self, tmp_path: pathlib.Path):
+        buffer = LogBuffer(3)
+        records = [LogEntry("t", i, i, "I", "Tag", str(i)) for i in range(5)]
+        buffer.extend(records[:2])
+        buffer.extend(records[2:])
+        assert buffer.snapshot() == records[2:]
+        assert buffer.evicted == 2
+        assert buffer.drain() == records[2:] and len(buffer) == 0
+
+        path = tmp_path / "logcat.jsonl"
+        with LogWriter(
+            str(path), max_bytes=100, backup_count=1, batch_size=2
+        ) as writer:
+            for record in records:
+                writer.write([record])
+        assert writer.written == 5
+        # Rotated after every batch, the oldest file was deleted.
+        lines = (tmp_path / "logcat.jsonl.1").read_text().splitlines()
+        lines += path.read_text().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == ["2", "3", "4"]
+        assert not (tmp_path / "logcat.jsonl.2").exists()
+
+    def test_collector(
+        self, native_adb: ADB, fake_logcat: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        count = 50000
+        fake_logcat.write_bytes(
+            b"".join(
+                b"01-02 03:04:05.678 %5d %5d %s Tag%d: message %d\n"
+                % (i, i, b"DI"[i % 2 : i % 2 + 1], i % 3, i)
+                for i in range(count)
+            )
+        )
+        output = tmp_path / "logcat.jsonl"
+
+        with native_adb.logcat(
+            tags=["Tag0", "Tag1"],
+            min_priority="I",
+            buffer_size=1000,
+            output=str(output),
+            max_bytes=0,
+        ) as collector:
+            assert collector.wait(30)
+        stats = collector.stats()
+
+        assert collector.error is None
+        assert stats.entries == count
+        kept = [i for i in range(count) if i % 2 and i % 3 != 2]
+        assert stats.filtered == count - len(kept)
+        assert stats.written == len(kept)
+        assert stats.evicted == len(kept) - 1000
+        assert collector.buffer.snapshot()[-1].message == "message {0}".format(kept[-1])
+        with open(output) as output_file:
+            assert sum(1 for _ in output_file) == len(kept)
+
+    def test_collector_binary(self, native_adb: ADB, fake_logcat: pathlib.Path):
+        fake_logcat.write_bytes(b"")
+        fake_logcat.with_suffix(".bin").write_bytes(
+            b"".join(binary_entry(i, 4, b"Tag", b"%d" % i) for i in range(1000))
+        )
+
+        with native_adb.logcat(binary=True) as collector:
+            assert collector.wait(30)
+        assert [entry.message for entry in collector.buffer.snapshot()] == [
+            str(i) for i in range(1000)
+        ]
+
+    def test_invalid_priority(self):
+        with pytest.raises(ValueError):
+            LogFilter(min_priority="X")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import pathlib
+import subprocess
+from typing import List
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.metrics import CommandMetric, MetricsRegistry
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def native_adb(fake_server: FakeAdbServer) -> ADB:
+    return ADB(
+        backend="native", server_port=fake_server.port, metrics=MetricsRegistry()
+    )
+
+
+class TestMetrics:
+    def test_native_commands(self, native_adb: ADB):
+        metrics: List[CommandMetric] = []
+        native_adb.metrics.add_hook(metrics.append)  # type: ignore[union-attr]
+
+        native_adb.shell(["echo", "hello"], timeout=5)
+        native_adb.shell(["echo", "world"], timeout=5, device="emulator-5554")
+        with pytest.raises(subprocess.CalledProcessError):
+            native_adb.shell(["exit", "1"], timeout=5)
+        with pytest.raises(subprocess.TimeoutExpired):
+            native_adb.shell(["sleep", "5"], timeout=1)
+
+        assert [(m.command, m.device, m.outcome) for m in metrics] == [
+            ("shell", "", "ok"),
+            ("shell", "emulator-5554", "ok"),
+            ("shell", "", "error"),
+            ("shell", "", "timeout"),
+        ]
+        assert metrics[0].bytes_in == len("hello\n")
+        assert metrics[0].bytes_out == len("shell echo hello ")
+        assert set(metrics[0].phases) == {"run", "decode", "settle"}
+
+        snapshot = json.loads(native_adb.metrics.to_json())  # type: ignore[union-attr]
+        assert [(s["device"], s["count"]) for s in snapshot] == [
+            ("", 3),
+            ("emulator-5554", 1),
+        ]
+        assert snapshot[0]["errors"] == 1
+        assert snapshot[0]["timeouts"] == 1
+        assert snapshot[0]["buckets"]["+Inf"] == 3
+        assert snapshot[0]["buckets"]["0.005"] <= snapshot[0]["buckets"]["1.0"]
+
+    def test_subprocess_commands(self, tmp_path: pathlib.Path, monkeypatch):
+        adb_executable = tmp_path / "adb"
+        adb_executable.write_text("#!/bin/sh\necho output\n")
+        adb_executable.chmod(0o755)
+        monkeypatch.setenv("ADB_PATH", str(adb_executable))
+
+        adb = ADB(device="serial", metrics=MetricsRegistry())
+        adb.shell(["ls"])
+        (series,) = adb.metrics.snapshot()  # type: ignore[union-attr]
+        assert (series["command"], series["device"], series["count"]) == (
+            "shell",
+            "serial",
+            1,
+        )
+        assert set(series["phase_seconds"]) == {"spawn", "run", "decode", "settle"}
+
+    def test_debug_messages_not_formatted(
+        self, native_adb: ADB, tmp_path: pathlib.Path, monkeypatch
+    ):
+        # Without debug logging, the debug messages are not even built.
+        messages: List[str] = []
+        level = native_adb.logger.level
+        native_adb.logger.setLevel(logging.INFO)
+        monkeypatch.setattr(native_adb.logger, "debug", messages.append)
+        try:
+            (tmp_path / "file.txt").write_text("content")
+            native_adb.shell(["echo", "hello"])
+            with native_adb.stream(["shell", "echo", "hello"]) as stream:
+                assert list(stream) == ["hello"]
+            assert native_adb.exec_out(["echo", "hello"]) == b"hello\n"
+            native_adb.pull_file(
+                os.fspath(tmp_path / "file.txt"), os.fspath(tmp_path / "copy.txt")
+            )
+        finally:
+            native_adb.logger.setLevel(level)
+        assert messages == []
+
+    def test_prometheus(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.record(
+            CommandMetric("shell", 'dev"1', 0.5, {"run": 0.4}, 10, 20, "ok")
+        )
+        registry.record(CommandMetric("shell", 'dev"1', 2.0, {}, 0, 20, "timeout"))
+
+        lines = registry.to_prometheus().splitlines()
+        labels = 'command="shell",device="dev\\"1"'
+        assert "# TYPE adb_command_duration_seconds histogram" in lines
+        assert (
+            'adb_command_duration_seconds_bucket{{{0},le="0.1"}} 0'.format(labels)
+            in lines
+        )
+        assert (
+            'adb_command_duration_seconds_bucket{{{0},le="1.0"}} 1'.format(labels)
+            in lines
+        )
+        assert (
+            'adb_command_duration_seconds_bucket{{{0},le="+Inf"}} 2'.format(labels)
+            in lines
+        )
+        assert "adb_command_duration_seconds_count{{{0}}} 2".format(labels) in lines
+        assert (
+            'adb_command_phase_seconds_total{{{0},phase="run"}} 0.4'.format(labels)
+            in lines
+        )
+        assert "adb_sent_bytes_total{{{0}}} 40".format(labels) in lines
+        assert "adb_command_timeouts_total{{{0}}} 1".format(labels) in lines
+
+    def test_disabled(self, fake_server: FakeAdbServer):
+        adb = ADB(backend="native", server_port=fake_server.port)
+        assert adb.metrics is None
+        assert adb.shell(["echo", "hello"], timeout=5) == "hello"
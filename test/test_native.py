@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import logging
+import socket
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ..adb.adb import ADB
+from .fake_adb_server import FakeAdbServer
+
+
+class TestNativeBackend:
+    def test_native_invalid_backend(self):
+        with pytest.raises(ValueError):
+            ADB(backend="invalid")
+
+    def test_native_version(self, native_adb: ADB):
+        assert native_adb.get_version() == "1.0.41"
+
+    def test_native_devices(self, native_adb: ADB, fake_server: FakeAdbServer):
+        fake_server.devices.append("192.168.1.10:5555")
+        assert native_adb.get_available_devices() == [
+            "emulator-5554",
+            "192.168.1.10:5555",
+        ]
+
+    def test_native_shell(self, native_adb: ADB, fake_server: FakeAdbServer):
+        assert native_adb.shell(["echo", "Hello", "World"]) == "Hello World"
+        assert fake_server.requests[-2:] == [
+            "host:transport-any",
+            "shell,v2,raw:echo Hello World",
+        ]
+
+    def test_native_shell_target_device(
+        self, native_adb: ADB, fake_server: FakeAdbServer
+    ):
+        native_adb.target_device = "emulator-5554"
+        assert native_adb.shell(["echo", "ok"]) == "ok"
+        assert "host:transport:emulator-5554" in fake_server.requests
+
+    def test_native_shell_device_override(self, fake_server: FakeAdbServer):
+        fake_server.devices.append("emulator-5556")
+        adb = ADB("emulator-5554", backend="native", server_port=fake_server.port)
+        command = ["echo", "ok"]
+        assert adb.shell(command, device="emulator-5556") == "ok"
+        assert adb.shell(command) == "ok"
+        assert command == ["echo", "ok"]
+        assert adb.target_device == "emulator-5554"
+        assert [r for r in fake_server.requests if r.startswith("host:transport")] == [
+            "host:transport:emulator-5556",
+            "host:transport:emulator-5554",
+        ]
+
+    def test_native_shared_between_threads(self, fake_server: FakeAdbServer):
+        devices = ["emulator-{0}".format(5554 + 2 * i) for i in range(8)]
+        fake_server.devices[:] = devices
+        adb = ADB(backend="native", server_port=fake_server.port)
+        command = ["echo"]
+        with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+            results = list(
+                executor.map(
+                    lambda device: adb.shell(command + [device], device=device),
+                    devices * 5,
+                )
+            )
+        assert results == devices * 5
+        assert command == ["echo"]
+
+    def test_native_shell_exit_code(self, native_adb: ADB):
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            native_adb.shell(["exit", "3"])
+        assert e.value.returncode == 3
+
+    def test_native_shell_legacy(self, native_adb: ADB, fake_server: FakeAdbServer):
+        fake_server.shell_v2 = False
+        assert native_adb.shell(["echo", "legacy"]) == "legacy"
+        assert native_adb.shell(["echo", "again"]) == "again"
+        assert fake_server.requests.count("shell,v2,raw:echo legacy") == 1
+        assert "shell,v2,raw:echo again" not in fake_server.requests
+
+    def test_native_shell_timeout(self, native_adb: ADB):
+        with pytest.raises(subprocess.TimeoutExpired):
+            native_adb.shell(["sleep", "5"], timeout=1)
+
+    def test_native_async_shell(self, native_adb: ADB):
+        assert native_adb.shell(["true"], is_async=True) is None
+
+    def test_native_device_not_found(self, native_adb: ADB):
+        native_adb.target_device = "missing"
+        with pytest.raises(subprocess.CalledProcessError):
+            native_adb.shell(["true"])
+
+    def test_native_connect(self, native_adb: ADB):
+        assert native_adb.connect("10.0.0.1:5555") == "connected to 10.0.0.1:5555"
+        assert native_adb.connect() == ""
+
+    def test_native_connection_error(self, native_adb: ADB):
+        with pytest.raises(RuntimeError):
+            native_adb.connect("unknown")
+
+    def test_native_wait_for_device(self, native_adb: ADB, fake_server: FakeAdbServer):
+        native_adb.target_device = "emulator-5554"
+        native_adb.wait_for_device()
+        assert "host-serial:emulator-5554:wait-for-any-device" in fake_server.requests
+
+    def test_native_remount(self, native_adb: ADB):
+        assert native_adb.remount() == "remount succeeded"
+
+    def test_native_kill_server(self, native_adb: ADB, fake_server: FakeAdbServer):
+        native_adb.kill_server()
+        assert fake_server.killed
+
+    def test_native_server_not_running(self, monkeypatch):
+        monkeypatch.setenv("ADB_PATH", "fake adb path")
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        native_adb = ADB(backend="native", server_port=port)
+        with pytest.raises(ConnectionRefusedError):
+            native_adb.get_version()
+        # Nothing to kill if the adb server is not running.
+        native_adb.kill_server()
+
+    def test_native_reboot(self, native_adb: ADB, fake_server: FakeAdbServer):
+        assert native_adb.reboot() == ""
+        assert fake_server.offline
+
+    def test_native_quiet_polling(
+        self, native_adb: ADB, fake_server: FakeAdbServer, caplog
+    ):
+        fake_server.offline = True
+        assert native_adb.get_state() == ""
+        # The remount waits for the device to be online again, at most for the
+        # timeout of the command.
+        with caplog.at_level(logging.ERROR):
+            with pytest.raises(subprocess.TimeoutExpired):
+                native_adb.remount(timeout=1)
+        # The failures while polling the offline device are not errors.
+        assert not [r for r in caplog.records if "get-state" in r.getMessage()]
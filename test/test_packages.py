@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.packages import (
+    PackageDiff,
+    PackageInfo,
+    diff_packages,
+    parse_dumpsys_packages,
+    parse_package_list,
+)
+from .fake_adb_server import FakeAdbServer
+
+TEST_APK = pathlib.Path(__file__).parent / "test_resources" / "test.apk"
+
+PACKAGES = (
+    "package:/system/app/Settings/Settings.apk=com.android.settings "
+    "versionCode:34 uid:1000\n"
+    "package:/data/app/~~a1b2==/com.example-c3d4==/base.apk=com.example "
+    "versionCode:7 uid:10100\n"
+)
+
+DUMPSYS = """Packages:
+  Package [com.example] (f00ba4):
+    userId=10100
+    codePath=/data/app/~~a1b2==/com.example-c3d4==
+    versionCode=7 minSdk=21 targetSdk=34
+    versionName=1.2.3
+    firstInstallTime=2024-01-02 03:04:05
+    lastUpdateTime=2024-02-03 04:05:06
+
+Hidden system packages:
+  Package [com.example] (c0ffee):
+    versionName=0.1
+"""
+
+
+@pytest.fixture
+def device_dir(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # The commands sent to the fake devices run on the local machine, so fake pm
+    # and dumpsys executables are added to the PATH: the installed packages are
+    # listed in the packages file and every call of pm is logged in the calls file.
+    device_dir = tmp_path / "device"
+    device_dir.mkdir()
+    (device_dir / "packages").write_text(PACKAGES)
+    (device_dir / "calls").touch()
+    pm = tmp_path / "pm"
+    pm.write_text(
+        "#!/bin/sh\n"
+        'echo "$*" >> {0}/calls\n'
+        'if [ -f {0}/legacy ]; then case "$*" in *-U*) '
+        'echo "Error: Unknown option: -U"; exit 1 ;; esac; fi\n'
+        'filter=""\n'
+        'for arg in "$@"; do case "$arg" in -*|list|packages) ;; *) filter="$arg" ;; '
+        "esac; done\n"
+        'grep -F -- "$filter" {0}/packages | '
+        "if [ -f {0}/legacy ]; then sed 's/ .*//'; else cat; fi\n"
+        "exit 0\n".format(device_dir)
+    )
+    pm.chmod(0o755)
+    dumpsys = tmp_path / "dumpsys"
+    dumpsys.write_text("#!/bin/sh\ncat <<'EOF'\n{0}EOF\n".format(DUMPSYS))
+    dumpsys.chmod(0o755)
+    monkeypatch.setenv("PATH", "{0}:{1}".format(tmp_path, os.environ["PATH"]))
+    return device_dir
+
+
+@pytest.fixture
+def native_adb(
+    fake_server: FakeAdbServer, device_dir: pathlib.Path, tmp_path: pathlib.Path
+) -> ADB:
+    # Fake adb executable used for the (un)installations, updating the packages
+    # file of the fake device.
+    adb_executable = tmp_path / "adb"
+    adb_executable.write_text(
+        "#!/bin/sh\n"
+        'case "$1" in\n'
+        "install) echo 'package:/data/app/com.test.pythonadb-1/base.apk="
+        "com.test.pythonadb versionCode:1 uid:10200' >> {0}/packages ;;\n"
+        'uninstall) grep -v "=$2 " {0}/packages > {0}/packages.new; '
+        "mv {0}/packages.new {0}/packages ;;\n"
+        "esac\n"
+        "echo Success\n".format(device_dir)
+    )
+    adb_executable.chmod(0o755)
+    adb = ADB(debug=True, backend="native", server_port=fake_server.port)
+    adb.adb_path = str(adb_executable)
+    return adb
+
+
+class TestPackageIndex:
+    def test_parse_package_list(self):
+        packages = parse_package_list(PACKAGES + "package:/system/app/A.apk=com.a\n")
+        assert packages["com.example"] == PackageInfo(
+            "com.example",
+            "/data/app/~~a1b2==/com.example-c3d4==/base.apk",
+            7,
+            10100,
+        )
+        assert packages["com.a"] == PackageInfo("com.a", "/system/app/A.apk")
+
+    def test_parse_dumpsys_packages(self):
+        assert parse_dumpsys_packages(DUMPSYS)["com.example"] == {
+            "userId": "10100",
+            "codePath": "/data/app/~~a1b2==/com.example-c3d4==",
+            "versionCode": "7",
+            "minSdk": "21",
+            "targetSdk": "34",
+            "versionName": "1.2.3",
+            "firstInstallTime": "2024-01-02 03:04:05",
+            "lastUpdateTime": "2024-02-03 04:05:06",
+        }
+
+    def test_diff_packages(self):
+        old = parse_package_list(PACKAGES)
+        new = dict(old)
+        new["com.example"] = new["com.example"]._replace(version_code=8)
+        new["com.new"] = PackageInfo("com.new", "/data/app/new.apk")
+        del new["com.android.settings"]
+        assert diff_packages(old, new) == PackageDiff(
+            ["com.new"], ["com.android.settings"], ["com.example"]
+        )
+
+    def test_lookups(self, native_adb: ADB, device_dir: pathlib.Path):
+        assert native_adb.packages.get("com.example").version_code == 7  # type: ignore[union-attr]
+        assert native_adb.packages.is_installed("com.android.settings")
+        assert not native_adb.packages.is_installed("com.missing")
+        # A single pm command for all the lookups.
+        assert len((device_dir / "calls").read_text().splitlines()) == 1
+
+        details = native_adb.packages.load(details=True)
+        assert details["com.example"].version_name == "1.2.3"
+        assert details["com.example"].target_sdk == 34
+        assert details["com.android.settings"].version_name is None
+
+    def test_incremental_update(self, native_adb: ADB, device_dir: pathlib.Path):
+        snapshot = native_adb.packages.snapshot()
+
+        native_adb.install_app(str(TEST_APK))
+        assert native_adb.packages.get("com.test.pythonadb") == PackageInfo(
+            "com.test.pythonadb", "/data/app/com.test.pythonadb-1/base.apk", 1, 10200
+        )
+        native_adb.uninstall_app("com.example")
+        assert not native_adb.packages.is_installed("com.example")
+
+        assert diff_packages(snapshot, native_adb.packages.snapshot()) == PackageDiff(
+            ["com.test.pythonadb"], ["com.example"], []
+        )
+        # Only the installed package was listed again, the uninstalled package
+        # was just removed from the index.
+        assert (device_dir / "calls").read_text().splitlines() == [
+            "list packages -f -U --show-versioncode",
+            "list packages -f -U --show-versioncode com.test.pythonadb",
+        ]
+
+    def test_legacy_devices(self, native_adb: ADB, device_dir: pathlib.Path):
+        (device_dir / "legacy").touch()
+        assert native_adb.packages.get("com.example") == PackageInfo(
+            "com.example", "/data/app/~~a1b2==/com.example-c3d4==/base.apk"
+        )
+        native_adb.packages.refresh(["com.example"])
+        assert (device_dir / "calls").read_text().splitlines()[-1] == (
+            "list packages -f com.example"
+        )
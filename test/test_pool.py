@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+from typing import Iterator
+
+import pytest
+
+from ..adb.pool import DevicePool
+from .fake_adb_server import FakeAdbServer
+
+DEVICES = ("emulator-5554", "emulator-5556", "emulator-5558", "emulator-5560")
+
+
+@pytest.fixture
+def fake_server(stub_adb: str) -> Iterator[FakeAdbServer]:
+    with FakeAdbServer(devices=DEVICES) as server:
+        yield server
+
+
+@pytest.fixture
+def pool(fake_server: FakeAdbServer) -> Iterator[DevicePool]:
+    with DevicePool(debug=True, backend="native", server_port=fake_server.port) as p:
+        yield p
+
+
+class TestDevicePool:
+    def test_pool_discover_devices(self, pool: DevicePool):
+        assert pool.devices == list(DEVICES)
+
+    def test_pool_shell(self, pool: DevicePool):
+        command = ["echo", "test"]
+        assert pool.shell(command) == {device: "test" for device in DEVICES}
+        assert command == ["echo", "test"]
+
+    def test_pool_shell_concurrent(self, pool: DevicePool):
+        start = time.monotonic()
+        results = pool.shell(["sleep", "1"])
+        assert all(result == "" for result in results.values())
+        assert time.monotonic() - start < 2
+
+    def test_pool_max_workers(self, fake_server: FakeAdbServer):
+        with DevicePool(
+            list(DEVICES[:2]),
+            max_workers=1,
+            backend="native",
+            server_port=fake_server.port,
+        ) as pool:
+            start = time.monotonic()
+            pool.shell(["sleep", "1"])
+            assert time.monotonic() - start >= 2
+
+    def test_pool_device_error(self, fake_server: FakeAdbServer):
+        with DevicePool(
+            ["emulator-5554", "unknown"], backend="native", server_port=fake_server.port
+        ) as pool:
+            results = pool.shell(["echo", "test"])
+        assert results["emulator-5554"] == "test"
+        assert isinstance(results["unknown"], subprocess.CalledProcessError)
+
+    def test_pool_as_completed(self, pool: DevicePool):
+        def operation(adb, device):
+            delay = "1" if device == DEVICES[0] else "0"
+            return adb.shell(["sleep", delay, ";", "echo", device], device=device)
+
+        completed = list(pool.as_completed(operation))
+        assert sorted(completed) == sorted((d, d) for d in DEVICES)
+        assert completed[-1][0] == DEVICES[0]
+
+    def test_pool_invalid_max_workers(self, fake_server: FakeAdbServer):
+        with pytest.raises(ValueError):
+            DevicePool(list(DEVICES), max_workers=0, backend="native")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+import time
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.commands import parse_properties
+from .fake_adb_server import FakeAdbServer
+
+GETPROP_OUTPUT = """[ro.build.version.sdk]: [30]
+[ro.product.model]: [Fake Device]
+[sys.boot_completed]: [1]
+[persist.sys.multiline]: [first
+second]
+[empty.property]: []
+"""
+
+
+@pytest.fixture
+def getprop_calls(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # The commands sent to the fake devices run on the local machine, so a fake
+    # getprop executable is added to the PATH (every call is logged in a file).
+    calls = tmp_path / "calls"
+    calls.touch()
+    getprop = tmp_path / "getprop"
+    getprop.write_text(
+        '#!/bin/sh\necho "$*" >> {0}\ncat << "EOF"\n{1}EOF\n'.format(
+            calls, GETPROP_OUTPUT
+        )
+    )
+    getprop.chmod(0o755)
+    monkeypatch.setenv("PATH", "{0}:{1}".format(tmp_path, os.environ["PATH"]))
+    return calls
+
+
+class TestPropertyCache:
+    def test_parse_properties(self):
+        assert parse_properties(GETPROP_OUTPUT) == {
+            "ro.build.version.sdk": "30",
+            "ro.product.model": "Fake Device",
+            "sys.boot_completed": "1",
+            "persist.sys.multiline": "first\nsecond",
+            "empty.property": "",
+        }
+
+    def test_parse_properties_crlf(self):
+        assert parse_properties(GETPROP_OUTPUT.replace("\n", "\r\n")) == {
+            "ro.build.version.sdk": "30",
+            "ro.product.model": "Fake Device",
+            "sys.boot_completed": "1",
+            "persist.sys.multiline": "first\nsecond",
+            "empty.property": "",
+        }
+
+    def test_get_properties(self, native_adb: ADB, getprop_calls: pathlib.Path):
+        properties = native_adb.get_properties()
+        assert properties["ro.product.model"] == "Fake Device"
+        assert properties["sys.boot_completed"] == "1"
+        assert getprop_calls.read_text() == "\n"
+
+    def test_single_getprop_call(self, native_adb: ADB, getprop_calls: pathlib.Path):
+        assert native_adb.get_device_sdk_version() == 30
+        assert native_adb.get_property("ro.product.model") == "Fake Device"
+        assert native_adb.get_property("sys.boot_completed") == "1"
+        assert native_adb.get_property("not.existing") == ""
+        assert len(getprop_calls.read_text().splitlines()) == 1
+
+    def test_mutable_properties_expire(
+        self, native_adb: ADB, getprop_calls: pathlib.Path
+    ):
+        native_adb.properties.ttl = 0.2
+        native_adb.get_property("sys.boot_completed")
+        time.sleep(0.3)
+        assert native_adb.get_property("sys.boot_completed") == "1"
+        assert native_adb.get_property("ro.product.model") == "Fake Device"
+        assert len(getprop_calls.read_text().splitlines()) == 2
+
+    def test_mutable_properties_not_cached(
+        self, fake_server: FakeAdbServer, getprop_calls: pathlib.Path
+    ):
+        adb = ADB(backend="native", server_port=fake_server.port, property_ttl=0)
+        adb.get_property("ro.product.model")
+        adb.get_property("sys.boot_completed")
+        adb.get_property("ro.build.version.sdk")
+        adb.get_property("sys.boot_completed")
+        assert getprop_calls.read_text().splitlines() == [
+            "",
+            "sys.boot_completed",
+            "sys.boot_completed",
+        ]
+
+    def test_reboot_invalidates_cache(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        getprop_calls: pathlib.Path,
+    ):
+        native_adb.get_device_sdk_version()
+        native_adb.reboot()
+        fake_server.offline = False
+        native_adb.get_device_sdk_version()
+        assert len(getprop_calls.read_text().splitlines()) == 2
+
+    def test_per_device_cache(
+        self, native_adb: ADB, fake_server: FakeAdbServer, getprop_calls: pathlib.Path
+    ):
+        fake_server.devices.append("emulator-5556")
+        native_adb.get_property("ro.product.model", device="emulator-5554")
+        native_adb.get_property("ro.product.model", device="emulator-5556")
+        native_adb.get_property("ro.product.model", device="emulator-5556")
+        native_adb.properties.invalidate("emulator-5554")
+        native_adb.get_property("ro.product.model", device="emulator-5554")
+        assert len(getprop_calls.read_text().splitlines()) == 3
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+import time
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.query_cache import QueryCache, QueryStats
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def calls(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    # The commands sent to the fake devices run on the local machine, so fake pm
+    # and settings executables are added to the PATH (every call is logged in the
+    # calls file).
+    calls = tmp_path / "calls"
+    calls.touch()
+    pm = tmp_path / "pm"
+    pm.write_text(
+        "#!/bin/sh\n"
+        'echo "pm $*" >> {0}\n'
+        '[ "$2" = com.example ] || exit 1\n'
+        "echo package:/data/app/com.example-1/base.apk\n"
+        "echo package:/data/app/com.example-1/split_config.en.apk\n".format(calls)
+    )
+    pm.chmod(0o755)
+    settings = tmp_path / "settings"
+    settings.write_text('#!/bin/sh\necho "settings $*" >> {0}\necho 1\n'.format(calls))
+    settings.chmod(0o755)
+    monkeypatch.setenv("PATH", "{0}:{1}".format(tmp_path, os.environ["PATH"]))
+    return calls
+
+
+@pytest.fixture
+def native_adb(fake_server: FakeAdbServer, tmp_path: pathlib.Path) -> ADB:
+    # Fake adb executable used for the uninstallations.
+    adb_executable = tmp_path / "adb"
+    adb_executable.write_text("#!/bin/sh\necho Success\n")
+    adb_executable.chmod(0o755)
+    adb = ADB(
+        debug=True,
+        backend="native",
+        server_port=fake_server.port,
+        query_cache=QueryCache(),
+    )
+    adb.adb_path = str(adb_executable)
+    return adb
+
+
+class TestQueryCache:
+    def test_ttl(self):
+        cache = QueryCache({"query": 0.05})
+        loads = []
+
+        def load() -> int:
+            loads.append(1)
+            return len(loads)
+
+        assert cache.get("query", None, [], load) == 1
+        assert cache.get("query", None, [], load) == 1
+        time.sleep(0.06)
+        assert cache.get("query", None, [], load) == 2
+        # The methods without a ttl are never cached.
+        assert cache.get("other", None, [], load) == 3
+        assert cache.get("other", None, [], load) == 4
+        assert cache.stats("query") == QueryStats(1, 2, 0)
+        assert cache.stats("other") == QueryStats(0, 0, 0)
+
+    def test_lru_eviction(self):
+        cache = QueryCache({"query": 60}, max_entries=2)
+        cache.get("query", "device", ["a"], lambda: "a")
+        cache.get("query", "device", ["b"], lambda: "b")
+        # The most recently used result is kept.
+        cache.get("query", "device", ["a"], lambda: "not cached")
+        cache.get("query", "device", ["c"], lambda: "c")
+
+        assert len(cache) == 2
+        assert cache.get("query", "device", ["a"], lambda: "not cached") == "a"
+        assert cache.get("query", "device", ["b"], lambda: "b again") == "b again"
+        assert cache.stats() == QueryStats(2, 4, 2)
+        cache.reset_stats()
+        assert cache.stats().hit_ratio == 0.0
+
+        with pytest.raises(ValueError):
+            QueryCache(max_entries=0)
+
+    def test_invalidate(self):
+        cache = QueryCache({"query": 60})
+        for device in ("device1", "device2", None):
+            cache.get("query", device, [], lambda: device)
+
+        cache.invalidate("device1")
+        assert len(cache) == 1
+        cache.invalidate()
+        assert len(cache) == 0
+
+        # A result loaded while the cache was invalidated is not stored.
+        def load() -> str:
+            cache.invalidate("device1")
+            return "stale"
+
+        cache.get("query", "device1", [], load)
+        assert len(cache) == 0
+
+    def test_cached_queries(
+        self, native_adb: ADB, fake_server: FakeAdbServer, calls: pathlib.Path
+    ):
+        for _ in range(3):
+            assert native_adb.get_version() == "1.0.41"
+            assert native_adb.get_available_devices() == ["emulator-5554"]
+            assert native_adb.get_package_path("com.example") == [
+                "/data/app/com.example-1/base.apk",
+                "/data/app/com.example-1/split_config.en.apk",
+            ]
+            assert native_adb.get_package_path("com.missing") == []
+            assert native_adb.get_setting("global", "adb_enabled") == "1"
+
+        assert fake_server.requests.count("host:version") == 1
+        assert fake_server.requests.count("host:devices") == 1
+        assert calls.read_text().splitlines() == [
+            "pm path com.example",
+            "pm path com.missing",
+            "settings get global adb_enabled",
+        ]
+        assert native_adb.query_cache.stats() == QueryStats(10, 5, 0)  # type: ignore[union-attr]
+        assert native_adb.query_cache.stats("get_package_path") == QueryStats(4, 2, 0)  # type: ignore[union-attr]
+
+        with pytest.raises(ValueError):
+            native_adb.get_setting("invalid", "adb_enabled")
+
+    def test_automatic_invalidation(
+        self, native_adb: ADB, fake_server: FakeAdbServer, calls: pathlib.Path
+    ):
+        native_adb.get_package_path("com.example")
+        native_adb.uninstall_app("com.example")
+        native_adb.get_package_path("com.example")
+        assert len(calls.read_text().splitlines()) == 2
+
+        native_adb.get_version()
+        native_adb.connect("10.0.0.1:5555")
+        assert native_adb.get_available_devices() == ["emulator-5554", "10.0.0.1:5555"]
+        native_adb.kill_server()
+        native_adb.get_version()
+        assert fake_server.requests.count("host:version") == 2
+
+    def test_disabled(self, fake_server: FakeAdbServer):
+        adb = ADB(backend="native", server_port=fake_server.port)
+        adb.get_version()
+        adb.get_version()
+        assert adb.query_cache is None
+        assert fake_server.requests.count("host:version") == 2
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+
+import pytest
+
+from ..adb.settle import FixedDelay, NoWait, PollUntil, SettlePolicy, WaitForExit
+
+
+class TestSettlePolicies:
+    def test_no_wait(self):
+        start = time.monotonic()
+        NoWait().settle(None, ["shell", "true"])  # type: ignore[arg-type]
+        assert time.monotonic() - start < 0.5
+
+    def test_wait_for_exit(self):
+        process = subprocess.Popen(["sleep", "0.2"])
+        WaitForExit().settle(None, ["shell", "true"], process)  # type: ignore[arg-type]
+        assert process.returncode == 0
+
+    def test_fixed_delay(self):
+        start = time.monotonic()
+        FixedDelay(0.2).settle(None, ["shell", "true"])  # type: ignore[arg-type]
+        assert time.monotonic() - start >= 0.2
+
+    def test_poll_until_ready(self):
+        checks = []
+        policy = PollUntil(
+            lambda adb, device: len(checks.append((adb, device)) or checks) >= 3, 0.01
+        )
+        policy.settle("adb", ["reboot"], device="emulator-5554")  # type: ignore[arg-type]
+        assert checks == [("adb", "emulator-5554")] * 3
+
+    def test_poll_until_timeout(self):
+        policy = PollUntil(lambda adb, device: False, interval=0.01, timeout=0.1)
+        with pytest.raises(subprocess.TimeoutExpired):
+            policy.settle(None, ["reboot"])  # type: ignore[arg-type]
+
+    def test_poll_until_command_timeout(self):
+        # Without its own timeout, the policy waits as long as the command timeout.
+        policy = PollUntil(lambda adb, device: False, interval=0.01)
+        start = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            policy.settle(None, ["reboot"], timeout=0.1)  # type: ignore[arg-type]
+        assert time.monotonic() - start < 5
+
+    def test_abstract_policy(self):
+        with pytest.raises(TypeError):
+            SettlePolicy()  # type: ignore[abstract]
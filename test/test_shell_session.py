@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import subprocess
+import threading
+import time
+from typing import Iterator
+
+import pytest
+
+from ..adb.adb import ADB
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture(params=[True, False], ids=["shell_v2", "legacy_shell"])
+def fake_server(request, stub_adb: str) -> Iterator[FakeAdbServer]:
+    with FakeAdbServer(shell_v2=request.param) as server:
+        yield server
+
+
+class TestShellSession:
+    def test_shell_session_multiple_commands(
+        self, native_adb: ADB, fake_server: FakeAdbServer
+    ):
+        with native_adb.shell_session() as session:
+            assert session.run(["echo", "first"]) == "first"
+            assert session.run(["printf", "no-newline"]) == "no-newline"
+            assert session.run(["echo", "a;", "echo", "b"]) == "a\nb"
+            assert session.run(["true"]) == ""
+        # A single remote shell was used for all the commands.
+        assert fake_server.opened_services[-1].endswith(":sh")
+        assert len(fake_server.opened_services) == 1
+
+    def test_shell_session_stderr(self, native_adb: ADB):
+        with native_adb.shell_session() as session:
+            assert session.run(["echo", "error", ">&2"]) == "error"
+
+    def test_shell_session_exit_code(self, native_adb: ADB):
+        with native_adb.shell_session() as session:
+            with pytest.raises(subprocess.CalledProcessError) as e:
+                session.run(["echo", "failed;", "exit", "3"])
+            assert e.value.returncode == 3
+            assert e.value.output == b"failed"
+            # The session is still usable.
+            assert session.run(["echo", "ok"]) == "ok"
+
+    def test_shell_session_timeout(self, native_adb: ADB):
+        with native_adb.shell_session() as session:
+            with pytest.raises(subprocess.TimeoutExpired):
+                session.run(["sleep", "5"], timeout=1)
+            assert not session.is_open
+            assert session.run(["echo", "reopened"]) == "reopened"
+
+    def test_shell_session_reopen_after_drop(
+        self, native_adb: ADB, fake_server: FakeAdbServer
+    ):
+        with native_adb.shell_session() as session:
+            assert session.run(["echo", "first"]) == "first"
+            # Simulate a device disconnection between two commands.
+            fake_server.disconnect()
+            time.sleep(0.5)
+            assert session.run(["echo", "second"]) == "second"
+        assert len(fake_server.opened_services) == 2
+
+    def test_shell_session_drop_during_command(
+        self, native_adb: ADB, fake_server: FakeAdbServer
+    ):
+        with native_adb.shell_session() as session:
+            threading.Timer(0.5, fake_server.disconnect).start()
+            with pytest.raises(RuntimeError):
+                session.run(["sleep", "5"])
+            assert session.run(["echo", "reopened"]) == "reopened"
+
+    def test_shell_session_invalid_command(self, native_adb: ADB):
+        with native_adb.shell_session() as session:
+            with pytest.raises(TypeError):
+                session.run("not a list of strings")  # type: ignore
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+
+import pytest
+
+from ..adb.adb import ADB
+from .fake_adb_server import FakeAdbServer
+
+
+class TestStream:
+    def test_shell_stream_lines(self, native_adb: ADB):
+        with native_adb.shell_stream(["printf", "'a\\nb\\r\\nc'"]) as stream:
+            assert list(stream) == ["a", "b", "c"]
+            assert stream.returncode == 0
+
+    def test_shell_stream_raw(self, native_adb: ADB):
+        with native_adb.shell_stream(["head", "-c", "200000", "/dev/zero"], True) as s:
+            chunks = list(s)
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert sum(len(chunk) for chunk in chunks) == 200000
+
+    def test_shell_stream_endless_output(self, native_adb: ADB):
+        start = time.monotonic()
+        with native_adb.shell_stream(["yes"]) as stream:
+            for index, line in enumerate(stream):
+                assert line == "y"
+                if index == 1000:
+                    break
+        assert stream.closed
+        assert time.monotonic() - start < 5
+
+    def test_shell_stream_first_line_before_exit(self, native_adb: ADB):
+        with native_adb.shell_stream(["echo", "first;", "sleep", "10"]) as stream:
+            start = time.monotonic()
+            assert next(stream) == "first"
+            assert time.monotonic() - start < 5
+
+    def test_shell_stream_error(self, native_adb: ADB):
+        with native_adb.shell_stream(["echo", "output;", "exit", "2"]) as stream:
+            assert next(stream) == "output"
+            with pytest.raises(subprocess.CalledProcessError):
+                next(stream)
+
+    def test_exec_out_stream(self, native_adb: ADB, fake_server: FakeAdbServer):
+        with native_adb.stream(["exec-out", "echo", "raw"], raw=True) as stream:
+            assert b"".join(stream) == b"raw\n"
+        assert fake_server.opened_services == ["exec:echo raw"]
+
+    def test_shell_stream_invalid_command(self, native_adb: ADB):
+        with pytest.raises(TypeError):
+            native_adb.shell_stream("not a list of strings")  # type: ignore
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+import socket
+import subprocess
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.protocol import AdbProtocolError
+from ..adb.sync import SYNC_DATA_MAX, TransferResult
+from ..adb.transfer import FileTransfer, shard_transfers
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def source_tree(tmp_path: pathlib.Path) -> pathlib.Path:
+    source = tmp_path / "source"
+    (source / "nested").mkdir(parents=True)
+    (source / "small.txt").write_text("small file\n")
+    (source / "nested" / "large.bin").write_bytes(os.urandom(3 * SYNC_DATA_MAX + 10))
+    (source / "nested" / "empty").touch()
+    return source
+
+
+class TestSync:
+    def test_sync_stat(self, native_adb: ADB, source_tree: pathlib.Path):
+        with native_adb.sync() as sync:
+            file_stat = sync.stat(os.fspath(source_tree / "small.txt"))
+            assert file_stat.exists and not file_stat.is_dir
+            assert file_stat.size == 11
+            assert sync.stat(os.fspath(source_tree)).is_dir
+            assert not sync.stat(os.fspath(source_tree / "missing")).exists
+
+    def test_sync_listdir(self, native_adb: ADB, source_tree: pathlib.Path):
+        with native_adb.sync() as sync:
+            entries = dict(sync.listdir(os.fspath(source_tree)))
+        assert sorted(entries) == ["nested", "small.txt"]
+        assert entries["nested"].is_dir
+
+    def test_sync_push_file_chunks(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        source_tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        source = source_tree / "nested" / "large.bin"
+        progress = []
+        with native_adb.sync() as sync:
+            result = sync.push_file(
+                os.fspath(source),
+                os.fspath(tmp_path / "device" / "large.bin"),
+                lambda *args: progress.append(args),
+            )
+        assert isinstance(result, TransferResult)
+        assert result.size == 3 * SYNC_DATA_MAX + 10
+        assert result.throughput > 0
+        assert (tmp_path / "device" / "large.bin").read_bytes() == source.read_bytes()
+        assert [transferred for _, transferred, _ in progress] == [
+            SYNC_DATA_MAX,
+            2 * SYNC_DATA_MAX,
+            3 * SYNC_DATA_MAX,
+            3 * SYNC_DATA_MAX + 10,
+        ]
+        assert all(total == result.size for _, _, total in progress)
+        assert [request for request, _ in fake_server.sync_requests] == ["SEND"]
+
+    def test_sync_pull_file(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        source = source_tree / "nested" / "large.bin"
+        progress = []
+        with native_adb.sync() as sync:
+            result = sync.pull_file(
+                os.fspath(source),
+                os.fspath(tmp_path / "pulled.bin"),
+                lambda *args: progress.append(args),
+            )
+        assert result.size == source.stat().st_size
+        assert (tmp_path / "pulled.bin").read_bytes() == source.read_bytes()
+        assert progress[-1] == (os.fspath(source), result.size, result.size)
+
+    def test_sync_push_pull_directory(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        (tmp_path / "device").mkdir()
+        (tmp_path / "host").mkdir()
+        with native_adb.sync() as sync:
+            pushed = sync.push(os.fspath(source_tree), os.fspath(tmp_path / "device"))
+            pulled = sync.pull(
+                os.fspath(tmp_path / "device" / "source"), os.fspath(tmp_path / "host")
+            )
+        assert len(pushed) == len(pulled) == 3
+        for path in ("small.txt", "nested/large.bin", "nested/empty"):
+            assert (tmp_path / "host" / "source" / path).read_bytes() == (
+                source_tree / path
+            ).read_bytes()
+
+    def test_sync_pull_missing_file(self, native_adb: ADB, tmp_path: pathlib.Path):
+        with native_adb.sync() as sync:
+            with pytest.raises(AdbProtocolError):
+                sync.pull(os.fspath(tmp_path / "missing"), os.fspath(tmp_path))
+
+    def test_sync_pull_file_invalid_destination(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        destination = tmp_path / "missing" / "small.txt"
+        with native_adb.sync() as sync:
+            with pytest.raises(FileNotFoundError) as error:
+                sync.pull_file(
+                    os.fspath(source_tree / "small.txt"), os.fspath(destination)
+                )
+            assert error.value.filename == os.fspath(destination)
+            # Nothing was requested, the connection can still be used.
+            sync.pull_file(
+                os.fspath(source_tree / "small.txt"), os.fspath(tmp_path / "small.txt")
+            )
+        assert (tmp_path / "small.txt").read_text() == "small file\n"
+
+    def test_native_push_pull_file(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        (tmp_path / "device").mkdir()
+        result = native_adb.push_file(
+            os.fspath(source_tree / "small.txt"), os.fspath(tmp_path / "device")
+        )
+        assert "1 file pushed" in result
+        result = native_adb.pull_file(
+            [
+                os.fspath(tmp_path / "device" / "small.txt"),
+                os.fspath(source_tree / "nested"),
+            ],
+            os.fspath(tmp_path),
+        )
+        assert "3 files pulled" in result
+        assert (tmp_path / "small.txt").read_text() == "small file\n"
+
+    def test_native_pull_invalid_file(self, native_adb: ADB, tmp_path: pathlib.Path):
+        with pytest.raises(subprocess.CalledProcessError):
+            native_adb.pull_file("/invalid.file", os.fspath(tmp_path))
+
+
+class TestSyncDir:
+    def test_sync_dir_push_incremental(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        source_tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        device_dir = os.fspath(tmp_path / "device")
+        result = native_adb.sync_dir(os.fspath(source_tree), device_dir)
+        assert len(result.transferred) == 3
+        assert (tmp_path / "device" / "nested" / "large.bin").read_bytes() == (
+            source_tree / "nested" / "large.bin"
+        ).read_bytes()
+
+        fake_server.sync_requests.clear()
+        result = native_adb.sync_dir(os.fspath(source_tree), device_dir)
+        assert result.transferred == []
+        assert result.unchanged == ["nested/empty", "nested/large.bin", "small.txt"]
+        assert fake_server.sync_requests == []
+
+        (source_tree / "small.txt").write_text("changed\n")
+        result = native_adb.sync_dir(os.fspath(source_tree), device_dir)
+        assert [r.destination for r in result.transferred] == [
+            os.path.join(device_dir, "small.txt")
+        ]
+        assert (tmp_path / "device" / "small.txt").read_text() == "changed\n"
+
+    def test_sync_dir_push_delete(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        device_dir = os.fspath(tmp_path / "device with spaces")
+        native_adb.sync_dir(os.fspath(source_tree), device_dir)
+        (source_tree / "nested" / "large.bin").unlink()
+        result = native_adb.sync_dir(os.fspath(source_tree), device_dir, delete=True)
+        assert result.deleted == ["nested/large.bin"]
+        assert not (tmp_path / "device with spaces" / "nested" / "large.bin").exists()
+        assert (tmp_path / "device with spaces" / "small.txt").exists()
+
+    def test_sync_dir_checksum(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        device_dir = tmp_path / "device"
+        native_adb.sync_dir(os.fspath(source_tree), os.fspath(device_dir))
+        # Same size and different content, with the modification time preserved.
+        mtime = (device_dir / "small.txt").stat().st_mtime
+        (device_dir / "small.txt").write_text("SMALL FILE\n")
+        os.utime(device_dir / "small.txt", (mtime, mtime))
+
+        result = native_adb.sync_dir(os.fspath(source_tree), os.fspath(device_dir))
+        assert result.transferred == []
+        result = native_adb.sync_dir(
+            os.fspath(source_tree), os.fspath(device_dir), checksum=True
+        )
+        assert [os.path.basename(r.source) for r in result.transferred] == ["small.txt"]
+        assert (device_dir / "small.txt").read_text() == "small file\n"
+
+    def test_sync_dir_pull(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        host_dir = os.fspath(tmp_path / "host")
+        result = native_adb.sync_dir(host_dir, os.fspath(source_tree), "pull")
+        assert len(result.transferred) == 3
+        assert (tmp_path / "host" / "nested" / "large.bin").read_bytes() == (
+            source_tree / "nested" / "large.bin"
+        ).read_bytes()
+        (tmp_path / "host" / "extra").touch()
+
+        result = native_adb.sync_dir(
+            host_dir, os.fspath(source_tree), "pull", delete=True
+        )
+        assert result.transferred == []
+        assert result.deleted == ["extra"]
+        assert not (tmp_path / "host" / "extra").exists()
+
+    def test_sync_dir_pull_missing(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        host_dir = tmp_path / "host"
+        host_dir.mkdir()
+        (host_dir / "keep").touch()
+        with pytest.raises(FileNotFoundError):
+            native_adb.sync_dir(
+                os.fspath(host_dir),
+                os.fspath(source_tree / "missing"),
+                "pull",
+                delete=True,
+            )
+        assert (host_dir / "keep").exists()
+
+        # When pushing, a missing device directory is created.
+        result = native_adb.sync_dir(
+            os.fspath(host_dir), os.fspath(tmp_path / "device" / "new"), delete=True
+        )
+        assert [os.path.basename(r.source) for r in result.transferred] == ["keep"]
+
+    def test_sync_dir_invalid_direction(self, native_adb: ADB, tmp_path: pathlib.Path):
+        with pytest.raises(ValueError):
+            native_adb.sync_dir(os.fspath(tmp_path), "/sdcard", "invalid")
+
+
+class TestParallelTransfer:
+    def test_shard_transfers(self):
+        transfers = [
+            FileTransfer(str(size), str(size), size) for size in (1, 9, 5, 5, 4, 2)
+        ]
+        shards = shard_transfers(transfers, 2)
+        assert [sum(t.size for t in shard) for shard in shards] == [13, 13]
+        assert len(shard_transfers(transfers[:1], 4)) == 1
+
+    def test_push_files(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        source_tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        report = native_adb.push_files(
+            [os.fspath(source_tree), os.fspath(source_tree / "small.txt")],
+            os.fspath(tmp_path / "device"),
+            width=3,
+        )
+        assert report.ok
+        assert len(report.files) == 4
+        assert report.size == sum(
+            (source_tree / path).stat().st_size
+            for path in ("small.txt", "nested/large.bin", "nested/empty", "small.txt")
+        )
+        assert (
+            tmp_path / "device" / "source" / "nested" / "large.bin"
+        ).read_bytes() == (source_tree / "nested" / "large.bin").read_bytes()
+        assert (tmp_path / "device" / "small.txt").exists()
+        assert "sync:" in fake_server.opened_services
+
+    def test_push_files_failure(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        source_tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+    ):
+        report = native_adb.push_files(
+            [
+                os.fspath(source_tree / "small.txt"),
+                os.fspath(source_tree / "missing"),
+            ],
+            os.fspath(tmp_path / "device"),
+            retries=2,
+        )
+        assert not report.ok
+        assert [status.source for status in report.succeeded] == [
+            os.fspath(source_tree / "small.txt")
+        ]
+        failed = report.failed[0]
+        assert failed.source == os.fspath(source_tree / "missing")
+        assert isinstance(failed.error, FileNotFoundError)
+        assert failed.attempts == 3
+
+    def test_pull_files(
+        self, native_adb: ADB, source_tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        (tmp_path / "host").mkdir()
+        report = native_adb.pull_files(
+            [os.fspath(source_tree), "/invalid.file"], os.fspath(tmp_path / "host")
+        )
+        assert len(report.succeeded) == 3
+        assert [status.source for status in report.failed] == ["/invalid.file"]
+        assert isinstance(report.failed[0].error, AdbProtocolError)
+        assert (tmp_path / "host" / "source" / "nested" / "large.bin").read_bytes() == (
+            source_tree / "nested" / "large.bin"
+        ).read_bytes()
+
+    def test_pull_files_server_not_running(self, tmp_path: pathlib.Path, monkeypatch):
+        # Fake adb executable logging its commands, the adb server is not started.
+        calls = tmp_path / "calls"
+        adb_executable = tmp_path / "adb"
+        adb_executable.write_text('#!/bin/sh\necho "$*" >> {0}\n'.format(calls))
+        adb_executable.chmod(0o755)
+        monkeypatch.setenv("ADB_PATH", os.fspath(adb_executable))
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+
+        adb = ADB(server_port=port)
+        with pytest.raises(ConnectionRefusedError):
+            adb.pull_files(["/invalid.file"], os.fspath(tmp_path))
+        # The adb server is started before connecting again, as the other commands.
+        assert calls.read_text().splitlines() == ["start-server"]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import asyncio
+import subprocess
+import threading
+import time
+from typing import List
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.tracker import DeviceEvent, DeviceInfo, DeviceTracker, parse_device_list
+from .fake_adb_server import FakeAdbServer
+
+
+def wait_until(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class TestDeviceTracker:
+    def test_parse_device_list(self):
+        assert parse_device_list("emulator-5554\tdevice\nserial2\toffline\n") == {
+            "emulator-5554": DeviceInfo("emulator-5554", "device"),
+            "serial2": DeviceInfo("serial2", "offline"),
+        }
+        assert parse_device_list(
+            "0123456789ABCDEF       device usb:1-1 product:sdk model:Pixel_7 "
+            "device:panther transport_id:3\n"
+        ) == {
+            "0123456789ABCDEF": DeviceInfo(
+                "0123456789ABCDEF", "device", "sdk", "Pixel_7", "panther", 3
+            )
+        }
+
+    def test_registry(self, native_adb: ADB, fake_server: FakeAdbServer):
+        tracker = native_adb.track_devices(timeout=5)
+        assert native_adb.track_devices() is tracker
+        assert tracker.devices() == {
+            "emulator-5554": DeviceInfo(
+                "emulator-5554", "device", "fake", "Fake_Device", "generic", 1
+            )
+        }
+
+        fake_server.devices.append("emulator-5556")
+        wait_until(lambda: "emulator-5556" in tracker.devices())
+        requests = len(fake_server.requests)
+        assert native_adb.get_available_devices() == ["emulator-5554", "emulator-5556"]
+        assert len(fake_server.requests) == requests
+
+    def test_events(self, native_adb: ADB, fake_server: FakeAdbServer):
+        events: List[DeviceEvent] = []
+        tracker = native_adb.track_devices(timeout=5)
+        tracker.add_listener(events.append)
+
+        fake_server.devices.append("emulator-5556")
+        wait_until(lambda: len(events) == 1)
+        fake_server.offline = True
+        wait_until(lambda: len(events) == 3)
+        fake_server.devices.remove("emulator-5556")
+        wait_until(lambda: len(events) == 4)
+
+        assert [(event.serial, event.kind) for event in events] == [
+            ("emulator-5556", "added"),
+            ("emulator-5554", "changed"),
+            ("emulator-5556", "changed"),
+            ("emulator-5556", "removed"),
+        ]
+        assert events[1].new.state == "offline"  # type: ignore[union-attr]
+
+    def test_async_events(self, native_adb: ADB, fake_server: FakeAdbServer):
+        tracker = native_adb.track_devices(timeout=5)
+
+        async def first_event() -> DeviceEvent:
+            async for event in tracker.events():
+                return event
+            raise AssertionError("No device event")
+
+        threading.Timer(0.2, fake_server.devices.append, ["emulator-5556"]).start()
+        event = asyncio.run(asyncio.wait_for(first_event(), 5))
+        assert event.serial == "emulator-5556"
+        assert event.kind == "added"
+
+    def test_async_events_closed(self, native_adb: ADB):
+        tracker = native_adb.track_devices(timeout=5)
+
+        async def all_events() -> List[DeviceEvent]:
+            return [event async for event in tracker.events()]
+
+        threading.Timer(0.2, tracker.close).start()
+        assert asyncio.run(asyncio.wait_for(all_events(), 5)) == []
+
+    def test_wait_for_device(self, native_adb: ADB, fake_server: FakeAdbServer):
+        native_adb.track_devices(timeout=5)
+
+        threading.Timer(0.2, fake_server.devices.append, ["emulator-5556"]).start()
+        native_adb.wait_for_device(timeout=5, device="emulator-5556")
+        with pytest.raises(subprocess.TimeoutExpired):
+            native_adb.wait_for_device(timeout=1, device="emulator-5558")
+        assert not any("wait-for" in request for request in fake_server.requests)
+
+        # Without the tracker, the adb server is asked again.
+        native_adb.tracker.close()  # type: ignore[union-attr]
+        native_adb.wait_for_device(timeout=5, device="emulator-5556")
+        assert any("wait-for" in request for request in fake_server.requests)
+
+    def test_reconnect(self, fake_server: FakeAdbServer):
+        events: List[DeviceEvent] = []
+        with DeviceTracker(port=fake_server.port, reconnect_delay=0.1) as tracker:
+            tracker.add_listener(events.append)
+            fake_server.disconnect()
+            wait_until(lambda: len(events) == 2)
+            assert "emulator-5554" in tracker.devices()
+        assert [event.kind for event in events] == ["removed", "added"]
+        assert not tracker.running
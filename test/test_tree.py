@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.tree import is_selected
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def tree(tmp_path: pathlib.Path) -> pathlib.Path:
+    root = tmp_path / "tree"
+    for index in range(50):
+        path = root / "dir{0}".format(index % 5) / "file{0}.txt".format(index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("content {0}\n".format(index) * index)
+    (root / "image.jpg").write_bytes(os.urandom(100000))
+    (root / "cache").mkdir()
+    (root / "cache" / "data.tmp").write_text("temporary\n")
+    return root
+
+
+def tree_files(root: pathlib.Path):
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file()
+    }
+
+
+class TestTree:
+    def test_is_selected(self):
+        assert is_selected("a/b.jpg", False, ["*.jpg"])
+        assert not is_selected("a/b.txt", False, ["*.jpg"])
+        assert is_selected("a", True, ["*.jpg"])
+        assert not is_selected("cache/x.jpg", False, ["*.jpg"], ["cache"])
+        assert not is_selected("a/b.tmp", False, None, ["*.tmp"])
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_pull_tree(
+        self,
+        native_adb: ADB,
+        fake_server: FakeAdbServer,
+        tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+        compress: bool,
+    ):
+        extracted = native_adb.pull_tree(
+            os.fspath(tree), os.fspath(tmp_path / "host"), compress=compress
+        )
+        assert sorted(extracted) == sorted(tree_files(tree))
+        assert tree_files(tmp_path / "host") == tree_files(tree)
+        assert fake_server.opened_services[0].startswith("exec:tar")
+
+    def test_pull_tree_filters(
+        self, native_adb: ADB, tree: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        extracted = native_adb.pull_tree(
+            os.fspath(tree),
+            os.fspath(tmp_path / "host"),
+            include=["dir1/*", "*.tmp"],
+            exclude=["cache", "file11.txt"],
+        )
+        assert sorted(extracted) == sorted(
+            "dir1/" + name for name in tree_files(tree / "dir1") if name != "file11.txt"
+        )
+        assert not (tmp_path / "host" / "cache").exists()
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_push_tree(
+        self,
+        native_adb: ADB,
+        tree: pathlib.Path,
+        tmp_path: pathlib.Path,
+        compress: bool,
+    ):
+        device_dir = tmp_path / "device" / "nested"
+        added = native_adb.push_tree(
+            os.fspath(tree), os.fspath(device_dir), compress=compress, exclude=["*.tmp"]
+        )
+        expected = {k: v for k, v in tree_files(tree).items() if k != "cache/data.tmp"}
+        assert sorted(added) == sorted(expected)
+        assert tree_files(device_dir) == expected
+
+    def test_push_tree_missing_directory(self, native_adb: ADB, tmp_path: pathlib.Path):
+        with pytest.raises(NotADirectoryError):
+            native_adb.push_tree(os.fspath(tmp_path / "missing"), "/sdcard/")
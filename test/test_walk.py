@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import pathlib
+
+import pytest
+
+from ..adb.adb import ADB
+from ..adb.walk import parse_walk_output
+from .fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def device_dir(tmp_path: pathlib.Path) -> pathlib.Path:
+    # The fake device uses the files of the local machine.
+    device_dir = tmp_path / "device"
+    (device_dir / "databases" / "nested").mkdir(parents=True)
+    (device_dir / "top.txt").write_text("top")
+    (device_dir / "with space.txt").write_text("space")
+    (device_dir / "databases" / "app.db").write_bytes(b"\0" * 100)
+    (device_dir / "databases" / "nested" / "deep.db").write_bytes(b"\0" * 10)
+    (device_dir / "link").symlink_to(device_dir / "databases")
+    return device_dir
+
+
+class TestWalk:
+    def test_parse_walk_output(self):
+        assert [
+            (entry.relative_path, entry.is_dir, entry.size)
+            for entry in parse_walk_output(
+                [
+                    "41f8 4096 1700000000 /sdcard/dir",
+                    "81a4 12 1700000001 /sdcard/dir/a file.txt",
+                    "invalid line",
+                ],
+                "/sdcard/",
+            )
+        ] == [("dir", True, 4096), ("dir/a file.txt", False, 12)]
+
+    def test_walk(
+        self, native_adb: ADB, fake_server: FakeAdbServer, device_dir: pathlib.Path
+    ):
+        entries = {e.relative_path: e for e in native_adb.walk(str(device_dir))}
+
+        assert sorted(entries) == [
+            "databases",
+            "databases/app.db",
+            "databases/nested",
+            "databases/nested/deep.db",
+            "link",
+            "top.txt",
+            "with space.txt",
+        ]
+        assert entries["databases"].is_dir
+        assert entries["link"].is_link
+        app_db = entries["databases/app.db"]
+        assert app_db.is_file and app_db.name == "app.db"
+        assert app_db.path == str(device_dir / "databases" / "app.db")
+        assert (app_db.size, app_db.mtime) == (100, int(os.stat(app_db.path).st_mtime))
+        # A single command for the whole tree.
+        assert len(fake_server.opened_services) == 1
+
+    def test_walk_symlinked_root(
+        self, native_adb: ADB, device_dir: pathlib.Path, tmp_path: pathlib.Path
+    ):
+        # E.g., /sdcard is a symbolic link to /storage/self/primary.
+        root = tmp_path / "sdcard"
+        root.symlink_to(device_dir)
+
+        entries = {e.relative_path: e for e in native_adb.walk(str(root))}
+        assert len(entries) == 7
+        assert entries["databases/app.db"].path == str(root / "databases" / "app.db")
+        # The links under the directory are still not followed.
+        assert entries["link"].is_link
+        assert sorted(e.name for e in native_adb.listdir(str(root))) == [
+            "databases",
+            "link",
+            "top.txt",
+            "with space.txt",
+        ]
+        assert native_adb.index(str(root)).total_size() == 3 + 5 + 100 + 10
+
+    def test_listdir(self, native_adb: ADB, device_dir: pathlib.Path):
+        assert sorted(e.name for e in native_adb.listdir(str(device_dir))) == [
+            "databases",
+            "link",
+            "top.txt",
+            "with space.txt",
+        ]
+        with pytest.raises(FileNotFoundError):
+            native_adb.listdir(str(device_dir / "missing"))
+
+    def test_lazy_walk(self, native_adb: ADB, device_dir: pathlib.Path):
+        for index in range(2000):
+            (device_dir / "file{0}".format(index)).touch()
+        walker = native_adb.walk(str(device_dir))
+        assert next(walker).path.startswith(str(device_dir))
+        # Stopping the iteration stops the command.
+        walker.close()
+
+    def test_index(self, native_adb: ADB, device_dir: pathlib.Path):
+        index = native_adb.index(str(device_dir))
+        assert len(index) == 7 and "top.txt" in index
+        assert index.total_size() == 3 + 5 + 100 + 10
+        assert sorted(e.relative_path for e in index.files(include=["*.db"])) == [
+            "databases/app.db",
+            "databases/nested/deep.db",
+        ]
+        assert [
+            entry.relative_path
+            for entry in index.files(exclude=["*/nested/*", "*.txt"])
+        ] == ["databases/app.db"]
+
+        (device_dir / "top.txt").write_text("changed")
+        (device_dir / "new.txt").write_text("new")
+        changed = native_adb.index(str(device_dir)).changed(index)
+        assert sorted(entry.relative_path for entry in changed) == [
+            "new.txt",
+            "top.txt",
+        ]